@@ -1,57 +1,528 @@
+import asyncio
+import contextvars
 import json
 import logging
+import math
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from functools import wraps
-from typing import Callable, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
 import redis.asyncio as redis
+from fastapi import Response
 
 from apps.backend.app.core.config import settings
+from apps.backend.app.core.cache_codec import codec, to_jsonable
 
 logger = logging.getLogger(__name__)
 
 # Single Redis pool
 redis_client = redis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
+# Cached entries are binary (see cache_codec), read and written without decoding
+redis_binary = redis.from_url(settings.REDIS_URL, decode_responses=False)
 
-def cache(expire: int = 60):
+# Every entry depends on this tag, bumping it invalidates the whole cache
+ALL_TAG = "all"
+GENERATION_PREFIX = "cache:gen:"
+TAG_SET_PREFIX = "cache:tagset:"
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Per-worker L1 tier in front of Redis
+L1_SIZE = int(os.getenv("CACHE_L1_SIZE", "512"))
+# How long an L1 entry is trusted before its tag generations are re-checked in Redis.
+# Invalidations are also pushed to every worker over pub/sub; this bounds staleness if one is lost.
+L1_REVALIDATE_SECONDS = float(os.getenv("CACHE_L1_REVALIDATE_SECONDS", "5"))
+
+# Single-flight recomputation: lock lifetime, how long losers wait for the winner, poll interval
+LOCK_PREFIX = "cache:lock:"
+LOCK_TTL = float(os.getenv("CACHE_LOCK_TTL_SECONDS", "15"))
+LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT_SECONDS", "10"))
+LOCK_POLL_SECONDS = 0.05
+# Probabilistic early expiration (XFetch): higher beta refreshes earlier
+EARLY_EXPIRY_BETA = float(os.getenv("CACHE_EARLY_EXPIRY_BETA", "1.0"))
+# Extra random share of the hard TTL
+TTL_JITTER = 0.1
+
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+_MISSING = object()
+
+def _lock_key(cache_key: str) -> str:
+    return f"{LOCK_PREFIX}{cache_key}"
+
+async def _release_lock(cache_key: str, token: str) -> None:
+    """Deletes the lock only if this caller still owns it."""
+    try:
+        await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, _lock_key(cache_key), token)
+    except Exception as e:
+        logger.error(f"Redis Error (Unlock): {e}")
+
+def _generation_key(tag: str) -> str:
+    return f"{GENERATION_PREFIX}{tag}"
+
+def _tag_set_key(tag: str) -> str:
+    return f"{TAG_SET_PREFIX}{tag}"
+
+@dataclass
+class _Entry:
+    # Encoded JSON response body
+    body: bytes
+    generations: List[int]
+    stored_at: float
+    tags: Set[str] = field(default_factory=set)
+    # Seconds the value took to compute, drives early expiration
+    delta: float = 0.0
+    checked_at: float = field(default_factory=time.monotonic)
+
+def _decode_entry(data: bytes) -> Optional[_Entry]:
+    """Entry stored in Redis, with the generations it was built under; None for unreadable entries."""
+    unpacked = codec.unpack_meta(data)
+    if unpacked is None:
+        return None
+    meta, compression_id, offset = unpacked
+    return _Entry(
+        codec.unpack_body(data, compression_id, offset),
+        meta.get("gen", []),
+        meta.get("at", 0.0),
+        set(meta.get("tags", ())),
+        meta.get("delta", 0.0),
+    )
+
+def _expires_early(entry: _Entry, expire: int) -> bool:
+    """
+    XFetch: refresh before the soft TTL with a probability that grows as expiry
+    nears and with the cost of the computation, so keys written at the same
+    moment do not all go stale on the same second.
+    """
+    if entry.delta <= 0:
+        return False
+    jitter = -entry.delta * EARLY_EXPIRY_BETA * math.log(1.0 - random.random())
+    return time.time() + jitter >= entry.stored_at + expire
+
+class _LocalTier:
+    """Bounded LRU of encoded entries, indexed by tag for local invalidation."""
+
+    def __init__(self, size: int = L1_SIZE):
+        self.size = size
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_tag: Dict[str, Set[str]] = {}
+
+    def get(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: _Entry) -> None:
+        self.discard(key)
+        self._entries[key] = entry
+        for tag in entry.tags:
+            self._by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.size:
+            self.discard(next(iter(self._entries)))
+
+    def discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def invalidate(self, tags: Iterable[str]) -> None:
+        if ALL_TAG in tags:
+            self._entries.clear()
+            self._by_tag.clear()
+            return
+        for tag in tags:
+            for key in list(self._by_tag.get(tag, ())):
+                self.discard(key)
+
+_l1 = _LocalTier()
+# Background refreshes in flight in this worker, by cache key
+_refreshing: Dict[str, asyncio.Task] = {}
+# Recomputations in flight in this worker, by cache key
+_inflight: Dict[str, asyncio.Future] = {}
+_listener_task: Optional[asyncio.Task] = None
+stats = {
+    "l1_hits": 0, "l2_hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+    "refreshes": 0, "early_refreshes": 0, "provisional": 0,
+}
+# Set while a cached endpoint computes its value, see refresh_when_done
+_pending_refresh: contextvars.ContextVar[Optional[List[Awaitable]]] = contextvars.ContextVar(
+    "cache_pending_refresh", default=None
+)
+
+def refresh_when_done(awaitable: Awaitable) -> None:
+    """
+    Marks the value being computed by a @cache endpoint as provisional (e.g. a
+    search answered without its semantic stage): it is served and stored as usual,
+    and recomputed in the background once `awaitable` completes, replacing the entry.
+    No-op outside a cached computation and inside such a background recomputation.
+    """
+    pending = _pending_refresh.get()
+    if pending is not None:
+        pending.append(awaitable)
+
+def cache_stats() -> Dict[str, object]:
+    return {**stats, "l1_entries": len(_l1._entries), "refreshing": len(_refreshing)}
+
+async def invalidate_tags(tags: Iterable[str]) -> int:
+    """
+    Invalidates every entry carrying one of the tags, without scanning the keyspace:
+    bumps the tag's generation (entries whose key-level tags are stale are treated
+    as misses), deletes the keys recorded in the tag's set and tells every worker
+    to drop matching L1 entries.
+    Returns the number of keys deleted.
+    """
+    tags = list(dict.fromkeys(t for t in tags if t))
+    if not tags:
+        return 0
+    _l1.invalidate(tags)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(_generation_key(tag))
+            pipe.smembers(_tag_set_key(tag))
+        results = await pipe.execute()
+
+        keys = set()
+        for members in results[1::2]:
+            keys.update(members)
+        keys.update(_tag_set_key(tag) for tag in tags)
+        deleted = await redis_client.delete(*keys)
+        await redis_client.publish(INVALIDATION_CHANNEL, json.dumps(tags))
+        logger.info(f"Cache invalidated tags {tags}: {deleted} keys")
+        return deleted
+    except Exception as e:
+        logger.error(f"Redis Error (Invalidate): {e}")
+        return 0
+
+async def _listen_for_invalidations() -> None:
+    while True:
+        try:
+            pubsub = redis_client.pubsub()
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _l1.invalidate(json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Cache invalidation listener error: {e}")
+            # L1 entries may have missed an invalidation, drop them all
+            _l1.invalidate([ALL_TAG])
+            await asyncio.sleep(1)
+
+def start_invalidation_listener() -> None:
+    """Subscribes this worker's L1 tier to invalidations from the other workers."""
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.get_running_loop().create_task(_listen_for_invalidations())
+
+async def stop_invalidation_listener() -> None:
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _listener_task = None
+
+def _detached_kwargs(kwargs: dict):
+    """
+    Copies kwargs for a background refresh: the request's DB session is closed
+    when the response is sent, so the refresh gets its own. Returns (kwargs, cleanup).
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+    from apps.backend.app.core.database import AsyncSessionLocal, SessionLocal
+
+    sessions = []
+    detached = dict(kwargs)
+    for name, value in kwargs.items():
+        if isinstance(value, AsyncSession):
+            detached[name] = AsyncSessionLocal()
+            sessions.append(detached[name])
+        elif isinstance(value, Session):
+            detached[name] = SessionLocal()
+            sessions.append(detached[name])
+
+    async def cleanup():
+        for session in sessions:
+            if isinstance(session, AsyncSession):
+                await session.close()
+            else:
+                session.close()
+    return detached, cleanup
+
+def cache(
+    expire: int = 60,
+    stale: Optional[int] = None,
+    tags: Optional[Callable[[Dict[str, Any]], Iterable[str]]] = None,
+    item_tags: Optional[Callable[[Any], Iterable[str]]] = None,
+    raw_response: bool = True,
+):
     """
     Async cache decorator for FastAPI endpoints.
     Keys are generated based on function name and **kwargs.
+
+    Lookup goes through a per-worker LRU (L1) and then Redis (L2).
+    `expire` is the soft TTL: an older entry is still served for up to `stale`
+    more seconds (hard TTL, default 4 * expire) while one background task per
+    worker recomputes it, so callers never wait on a recomputation of a known key.
+    Fresh entries are also refreshed early with a probability that grows near
+    expiry (XFetch), and hard TTLs are jittered.
+
+    Missing or invalidated keys are recomputed once: concurrent callers in a worker
+    share one computation, and across workers a short Redis lock picks the one that
+    computes while the rest serve the invalidated value or wait for the new one.
+
+    Invalidation is tag based (see invalidate_tags):
+    - `tags(kwargs)` gives tags known from the request (endpoint, category, ...).
+      Their generations are stored in the entry and checked on every Redis read,
+      in the same round trip as the entry itself.
+    - `item_tags(result)` gives tags of what the response contains (product IDs).
+      The key is added to each tag's set, so invalidation deletes exactly those keys.
+    Every entry is also tagged with its endpoint name and ALL_TAG.
+
+    Values are encoded once (see cache_codec) and kept as JSON bytes in both tiers
+    (compressed in Redis above a size threshold).
+    With `raw_response` the endpoint returns them as a Response directly, so
+    response_model filtering does not apply; without it the decoded value is returned.
     """
+    stale_for = 4 * expire if stale is None else stale
+    hard_ttl = expire + stale_for
+
     def decorator(func: Callable):
+        async def compute_and_store(cache_key, key_tags, generations, args, kwargs, provisional=True) -> bytes:
+            started = time.monotonic()
+            pending: Optional[List[Awaitable]] = [] if provisional else None
+            token = _pending_refresh.set(pending)
+            try:
+                result = await func(*args, **kwargs)
+            finally:
+                _pending_refresh.reset(token)
+            delta = time.monotonic() - started
+
+            # Encoded once: the same bytes go to Redis, L1 and the client
+            to_cache = to_jsonable(result)
+            body = codec.dumps(to_cache)
+            stored_at = time.time()
+            entry_tags = set(key_tags)
+            if item_tags is not None:
+                entry_tags.update(item_tags(to_cache))
+            _l1.put(cache_key, _Entry(body, generations, stored_at, entry_tags, delta))
+
+            try:
+                # Jitter keeps keys written together (e.g. after a flush) from expiring together
+                ttl = int(hard_ttl * (1 + random.uniform(0, TTL_JITTER)))
+                meta = {"gen": generations, "at": stored_at, "delta": delta, "tags": sorted(entry_tags)}
+                pipe = redis_binary.pipeline(transaction=False)
+                pipe.set(cache_key, codec.pack(meta, body), ex=ttl)
+                for tag in entry_tags - set(key_tags):
+                    # The set lives as long as the entries it points to
+                    pipe.sadd(_tag_set_key(tag), cache_key)
+                    pipe.expire(_tag_set_key(tag), ttl)
+                await pipe.execute()
+            except Exception as e:
+                logger.error(f"Redis Error (Set): {e}")
+
+            if pending:
+                stats["provisional"] += 1
+                schedule_refresh(cache_key, key_tags, args, kwargs, after=pending)
+            return body
+
+        async def wait_for_entry(cache_key, generations) -> Any:
+            """Polls for the value another worker is computing; _MISSING if it gives up or fails."""
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_SECONDS)
+                pipe = redis_binary.pipeline(transaction=False)
+                pipe.get(cache_key)
+                pipe.exists(_lock_key(cache_key))
+                cached_val, locked = await pipe.execute()
+                entry = _decode_entry(cached_val) if cached_val else None
+                if entry is not None and entry.generations == generations:
+                    _l1.put(cache_key, entry)
+                    return entry.body
+                if not locked:
+                    break
+            return _MISSING
+
+        async def recompute(cache_key, key_tags, generations, stale_entry, args, kwargs):
+            """
+            Cross-worker single flight: the worker holding the Redis lock computes,
+            the others serve the stale value if there is one or wait for the new one.
+            """
+            token = uuid.uuid4().hex
+            try:
+                acquired = await redis_client.set(_lock_key(cache_key), token, nx=True, px=int(LOCK_TTL * 1000))
+            except Exception as e:
+                logger.error(f"Redis Error (Lock): {e}")
+                acquired = True
+            if not acquired:
+                if stale_entry is not None:
+                    stats["stale_hits"] += 1
+                    return stale_entry.body
+                try:
+                    value = await wait_for_entry(cache_key, generations)
+                    if value is not _MISSING:
+                        stats["coalesced"] += 1
+                        return value
+                except Exception as e:
+                    logger.error(f"Redis Error (Wait): {e}")
+                return await compute_and_store(cache_key, key_tags, generations, args, kwargs)
+
+            try:
+                return await compute_and_store(cache_key, key_tags, generations, args, kwargs)
+            finally:
+                await _release_lock(cache_key, token)
+
+        async def single_flight(cache_key, key_tags, generations, stale_entry, args, kwargs):
+            """In-worker single flight: concurrent callers of one key share the leader's result."""
+            waiter = _inflight.get(cache_key)
+            if waiter is not None:
+                stats["coalesced"] += 1
+                outcome = await asyncio.shield(waiter)
+                if outcome is not _MISSING:
+                    return outcome
+                # The leader failed, compute for this caller
+                return await compute_and_store(cache_key, key_tags, generations, args, kwargs)
+
+            waiter = asyncio.get_running_loop().create_future()
+            _inflight[cache_key] = waiter
+            outcome = _MISSING
+            try:
+                outcome = await recompute(cache_key, key_tags, generations, stale_entry, args, kwargs)
+                return outcome
+            finally:
+                _inflight.pop(cache_key, None)
+                waiter.set_result(outcome)
+
+        def schedule_refresh(cache_key, key_tags, args, kwargs, after: Optional[List[Awaitable]] = None):
+            """
+            Recomputes the key in a background task. With `after` the task first waits
+            for those awaitables, so the recomputation sees what they produced.
+            """
+            if cache_key in _refreshing or (cache_key in _inflight and not after):
+                return
+
+            async def refresh():
+                token = uuid.uuid4().hex
+                detached, cleanup = _detached_kwargs(kwargs)
+                try:
+                    if after:
+                        await asyncio.gather(*after, return_exceptions=True)
+                    # Only one worker refreshes a key; the others keep serving the current value
+                    if not await redis_client.set(_lock_key(cache_key), token, nx=True, px=int(LOCK_TTL * 1000)):
+                        return
+                    try:
+                        generations = await read_generations(key_tags)
+                        # A refresh never chains another one, even if it is provisional again
+                        await compute_and_store(cache_key, key_tags, generations, args, detached, provisional=False)
+                        stats["refreshes"] += 1
+                    finally:
+                        await _release_lock(cache_key, token)
+                except Exception as e:
+                    logger.error(f"Cache refresh of {cache_key} failed: {e}")
+                finally:
+                    await cleanup()
+                    _refreshing.pop(cache_key, None)
+
+            _refreshing[cache_key] = asyncio.get_running_loop().create_task(refresh())
+
+        async def read_generations(key_tags) -> List[int]:
+            values = await redis_client.mget([_generation_key(t) for t in key_tags])
+            return [int(g or 0) for g in values]
+
+        def serve(entry: _Entry, cache_key, key_tags, args, kwargs):
+            age = time.time() - entry.stored_at
+            if age > expire:
+                stats["stale_hits"] += 1
+                schedule_refresh(cache_key, key_tags, args, kwargs)
+            elif _expires_early(entry, expire):
+                stats["early_refreshes"] += 1
+                schedule_refresh(cache_key, key_tags, args, kwargs)
+            return entry.body
+
+        async def lookup(cache_key, key_tags, args, kwargs) -> bytes:
+            # 1. L1, trusted for L1_REVALIDATE_SECONDS after its last generation check
+            entry = _l1.get(cache_key)
+            if entry is not None and time.time() - entry.stored_at > hard_ttl:
+                _l1.discard(cache_key)
+                entry = None
+            if entry is not None and time.monotonic() - entry.checked_at < L1_REVALIDATE_SECONDS:
+                stats["l1_hits"] += 1
+                return serve(entry, cache_key, key_tags, args, kwargs)
+
+            # 2. Redis: entry (or just its existence, to revalidate L1) and current tag generations in one round trip
+            generation_keys = [_generation_key(t) for t in key_tags]
+            generations: List[int] = [0] * len(key_tags)
+            stale_entry: Optional[_Entry] = None
+            try:
+                pipe = redis_binary.pipeline(transaction=False)
+                if entry is not None:
+                    pipe.exists(cache_key)
+                else:
+                    pipe.get(cache_key)
+                pipe.mget(generation_keys)
+                cached_val, current = await pipe.execute()
+                generations = [int(g or 0) for g in current]
+
+                if entry is not None:
+                    if cached_val and entry.generations == generations:
+                        # L1 entry is still valid (and not deleted by an item tag)
+                        entry.checked_at = time.monotonic()
+                        stats["l1_hits"] += 1
+                        return serve(entry, cache_key, key_tags, args, kwargs)
+                    _l1.discard(cache_key)
+                elif cached_val:
+                    entry = _decode_entry(cached_val)
+                    if entry is not None and entry.generations == generations:
+                        _l1.put(cache_key, entry)
+                        stats["l2_hits"] += 1
+                        return serve(entry, cache_key, key_tags, args, kwargs)
+                    # Invalidated: only served to callers that lose the recompute lock
+                    stale_entry = entry
+            except Exception as e:
+                logger.error(f"Redis Error (Get): {e}")
+
+            # 3. Miss: one caller per key recomputes, the others wait for it
+            stats["misses"] += 1
+            return await single_flight(cache_key, key_tags, generations, stale_entry, args, kwargs)
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # 1. Generate Key
+            # Generate Key
             # We skip 'request', 'db', 'user' args for key generation to keep it pure
             # Simple approach: use path params and query params from kwargs
             key_parts = [func.__name__]
             for k, v in sorted(kwargs.items()):
                 if k not in ['db', 'current_user', 'request']:
                     key_parts.append(f"{k}={v}")
-            
+
             cache_key = ":".join(key_parts)
-            
-            # 2. Try Get from Cache
-            try:
-                cached_val = await redis_client.get(cache_key)
-                if cached_val:
-                    # logger.info(f"Cache HIT: {cache_key}")
-                    return json.loads(cached_val)
-            except Exception as e:
-                logger.error(f"Redis Error (Get): {e}")
+            key_tags: List[str] = [ALL_TAG, f"endpoint:{func.__name__}"]
+            if tags is not None:
+                key_tags.extend(t for t in tags(kwargs) if t)
 
-            # 3. Call Original Function
-            result = await func(*args, **kwargs)
-            
-            # 4. Save to Cache
-            # 4. Save to Cache
-            try:
-                # Use FastAPI's jsonable_encoder to safely convert Pydantic models, UUIDs, datetimes
-                from fastapi.encoders import jsonable_encoder
-                to_cache = jsonable_encoder(result)
-                
-                await redis_client.set(cache_key, json.dumps(to_cache), ex=expire)
-            except Exception as e:
-                logger.error(f"Redis Error (Set): {e}")
-                
-            return result
+            body = await lookup(cache_key, key_tags, args, kwargs)
+            if raw_response:
+                # Already-encoded JSON goes out as is, without a decode/re-encode cycle
+                return Response(content=body, media_type="application/json")
+            return codec.loads(body)
         return wrapper
     return decorator
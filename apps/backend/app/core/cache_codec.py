@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import struct
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used instead
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is used instead
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Entry layout: magic, format version, compression id, meta length, meta JSON, body
+MAGIC = b"DC"
+VERSION = 1
+_HEADER = struct.Struct(">2sBBI")
+
+COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+
+class JsonSerializer:
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+class OrjsonSerializer:
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+class NoCompression:
+    id = 0
+    name = "none"
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+class ZlibCompression:
+    id = 1
+    name = "zlib"
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, 6)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+class ZstdCompression:
+    id = 2
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+def _serializer(name: str):
+    if name in ("orjson", "auto") and orjson is not None:
+        return OrjsonSerializer()
+    if name == "orjson":
+        logger.warning("orjson is not installed, cache falls back to json")
+    return JsonSerializer()
+
+def _compressors() -> Dict[int, Any]:
+    available = {NoCompression.id: NoCompression(), ZlibCompression.id: ZlibCompression()}
+    if zstandard is not None:
+        available[ZstdCompression.id] = ZstdCompression()
+    return available
+
+class CacheCodec:
+    """
+    Encodes cache entries as bytes: a small JSON meta block (tag generations,
+    timestamps) and the response body, itself already-encoded JSON so a hit can
+    be sent to the client as is. Bodies above `min_size` are compressed.
+    Entries are decodable whatever the current settings, as long as the
+    compression library they were written with is installed.
+    """
+
+    def __init__(self, serializer: str = "auto", compression: str = "auto", min_size: int = COMPRESS_MIN_BYTES):
+        self.serializer = _serializer(serializer)
+        self._compressors = _compressors()
+        if compression == "auto":
+            compression = "zstd" if zstandard is not None else "zlib"
+        by_name = {c.name: c for c in self._compressors.values()}
+        if compression not in by_name:
+            logger.warning(f"Cache compression '{compression}' is not available, falling back to zlib")
+            compression = "zlib"
+        self.compressor = by_name[compression]
+        self.min_size = min_size
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.serializer.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.serializer.loads(data)
+
+    def pack(self, meta: Dict[str, Any], body: bytes) -> bytes:
+        compressor = self.compressor if len(body) >= self.min_size else self._compressors[NoCompression.id]
+        meta_bytes = self.serializer.dumps(meta)
+        return _HEADER.pack(MAGIC, VERSION, compressor.id, len(meta_bytes)) + meta_bytes + compressor.compress(body)
+
+    def unpack_meta(self, data: bytes) -> Optional[Tuple[Dict[str, Any], int, int]]:
+        """(meta, compression id, body offset), or None for entries in another format."""
+        if len(data) < _HEADER.size:
+            return None
+        magic, version, compression_id, meta_len = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or compression_id not in self._compressors:
+            return None
+        offset = _HEADER.size + meta_len
+        return self.serializer.loads(data[_HEADER.size:offset]), compression_id, offset
+
+    def unpack_body(self, data: bytes, compression_id: int, offset: int) -> bytes:
+        return self._compressors[compression_id].decompress(data[offset:])
+
+def to_jsonable(obj: Any) -> Any:
+    """
+    jsonable_encoder equivalent with a fast path for Pydantic models
+    (model_dump in JSON mode runs in pydantic-core instead of pure Python).
+    Aliases are applied like jsonable_encoder does, so the payload keeps its shape.
+    """
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", by_alias=True)
+    if isinstance(obj, dict):
+        return {str(k): to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(v) for v in obj]
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    from fastapi.encoders import jsonable_encoder
+    return jsonable_encoder(obj)
+
+codec = CacheCodec(
+    serializer=os.getenv("CACHE_SERIALIZER", "auto"),
+    compression=os.getenv("CACHE_COMPRESSION", "auto"),
+)
@@ -1,13 +1,61 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, Session
 from apps.backend.app.core.config import settings
+from packages.database.instrumentation import echo_enabled, instrument_engine
+
+# Pool sizing per worker process. Async routes share POOL_SIZE connections,
+# MAX_OVERFLOW more are opened under bursts; waiters give up after POOL_TIMEOUT.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
 
-engine = create_engine(settings.DATABASE_URL, echo=True)
+# Sync engine: scripts, background index rebuilds and the routers not yet moved to AsyncSession
+engine = create_engine(settings.DATABASE_URL, echo=echo_enabled())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def async_database_url(url: str) -> str:
+    """Same database through the asyncpg driver."""
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+    pool_recycle=POOL_RECYCLE,
+    pool_pre_ping=True,
+    echo=echo_enabled(),
+)
+
+# Per-request query counts and timings, N+1 warnings and the slow-query log
+instrument_engine(engine)
+instrument_engine(async_engine)
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _register_vector_type(dbapi_connection, connection_record):
+    # asyncpg needs the pgvector codec registered per connection
+    from pgvector.asyncpg import register_vector
+    dbapi_connection.run_async(register_vector)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False
+)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as session:
+        yield session
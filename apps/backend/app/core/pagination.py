@@ -0,0 +1,113 @@
+import base64
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Exact totals are cached per filter for this long, so deep pages never re-count
+TOTAL_CACHE_SECONDS = int(os.getenv("PAGINATION_TOTAL_CACHE_SECONDS", "60"))
+MAX_PAGE_SIZE = int(os.getenv("PAGINATION_MAX_PAGE_SIZE", "100"))
+
+@dataclass
+class Page:
+    rows: List[Any]
+    next_cursor: Optional[str]
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    return value
+
+def _decode_value(column, raw: Any) -> Any:
+    if raw is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return raw
+    if python_type is datetime:
+        return datetime.fromisoformat(raw)
+    if python_type is date:
+        return date.fromisoformat(raw)
+    if python_type is uuid.UUID:
+        return uuid.UUID(raw)
+    if python_type is Decimal:
+        return Decimal(raw)
+    return raw
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor: the sort key values of the last row of a page."""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, keys: Sequence) -> Tuple[Any, ...]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError("key count mismatch")
+        return tuple(_decode_value(key, value) for key, value in zip(keys, values))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def clamp_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+async def keyset_page(
+    db: AsyncSession,
+    stmt,
+    keys: Sequence,
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = False,
+    offset: int = 0,
+) -> Page:
+    """
+    One page of `stmt` ordered by `keys` (unique together, e.g. (name, id)), all in
+    the same direction so a composite index can serve both the ORDER BY and the
+    row comparison. With a cursor the page starts right after the row it encodes,
+    so page N costs the same as page 1. `offset` is only honoured without a cursor,
+    for clients that still page by offset.
+    """
+    labels = [f"_key{i}" for i in range(len(keys))]
+    stmt = stmt.add_columns(*[key.label(label) for key, label in zip(keys, labels)])
+    if cursor:
+        row, last = tuple_(*keys), tuple_(*decode_cursor(cursor, keys))
+        stmt = stmt.where(row < last if descending else row > last)
+    elif offset:
+        stmt = stmt.offset(offset)
+    stmt = stmt.order_by(*[key.desc() if descending else key.asc() for key in keys]).limit(limit + 1)
+
+    rows = (await db.execute(stmt)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], label) for label in labels])
+    return Page(rows=rows, next_cursor=next_cursor)
+
+_totals: Dict[str, Tuple[float, int]] = {}
+
+async def cached_count(db: AsyncSession, key: str, stmt) -> int:
+    """
+    Exact row count of `stmt`, cached in-process for TOTAL_CACHE_SECONDS under `key`
+    (which must identify the filters). Counts lag writes by at most that long.
+    """
+    now = time.monotonic()
+    cached = _totals.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+    total = (await db.execute(select(func.count()).select_from(stmt.order_by(None).subquery()))).scalar() or 0
+    if len(_totals) > 1000:
+        _totals.clear()
+    _totals[key] = (now + TOTAL_CACHE_SECONDS, total)
+    return total
@@ -0,0 +1,85 @@
+import re
+from typing import Any, List
+
+# Latin -> Cyrillic mapping for common technical characters
+HOMOGLYPHS = {
+    'M': 'М', 'm': 'м',
+    'H': 'Н', 'h': 'н',
+    'A': 'А', 'a': 'а',
+    'C': 'С', 'c': 'с',
+    'T': 'Т', 't': 'т',
+    'K': 'К', 'k': 'к',
+    'X': 'Х', 'x': 'х',
+    'O': 'О', 'o': 'о',
+    'P': 'Р', 'p': 'р',
+    'E': 'Е', 'e': 'е',
+    'B': 'В', 'b': 'в',
+    'y': 'у', 'Y': 'У',
+    'u': 'у', 'U': 'У',
+    'i': 'и', 'I': 'И',
+}
+
+# Precompiled once: a single str.translate pass instead of one str.replace per mapping
+_HOMOGLYPH_TABLE = str.maketrans(HOMOGLYPHS)
+# Folding of already lower-cased text: homoglyphs plus ё -> е
+_FOLD_TABLE = str.maketrans({**{lat: cyr for lat, cyr in HOMOGLYPHS.items() if lat.islower()}, "ё": "е"})
+
+def normalize_query(q: str) -> str:
+    """
+    Normalizes query by converting common Latin homoglyphs to Cyrillic
+    to ensure better matching for industrial model numbers.
+    """
+    if not q:
+        return ""
+    return q.strip().translate(_HOMOGLYPH_TABLE)
+
+def fold_text(text: str) -> str:
+    """
+    Case-folds text and maps homoglyphs so that '16k20', '16К20' and '16к20'
+    compare equal. Used for index keys, never for display.
+    """
+    if not text:
+        return ""
+    return text.lower().strip().translate(_FOLD_TABLE)
+
+# Anything but digits and folded letters; the key columns in Postgres use the same
+# explicit class (POSIX classes do not survive the migration runner's text())
+_SEPARATORS = re.compile(r"[^0-9a-zа-я]+")
+
+def model_key(text: str) -> str:
+    """
+    Folded text with every separator removed ('16K-20' -> '16к20').
+    Same as the model_key column computed in Postgres.
+    """
+    return _SEPARATORS.sub("", fold_text(text))
+
+_INNER_SEPARATORS = re.compile(r"[^0-9a-zа-я\s]+")
+_SPACES = re.compile(r"\s+")
+
+def name_key(text: str) -> str:
+    """
+    Folded text with separators inside words removed and whitespace collapsed
+    ('Станок 16K-20' -> 'станок 16к20'). Same as the name_key column computed in Postgres.
+    """
+    return _SPACES.sub(" ", _INNER_SEPARATORS.sub("", fold_text(text))).strip()
+
+def model_number_keys(q: str) -> List[str]:
+    """model_key of each query word that looks like a model number (contains a digit)."""
+    keys = [model_key(word) for word in q.split() if any(c.isdigit() for c in word)]
+    return list(dict.fromkeys(k for k in keys if len(k) >= 3))
+
+def flatten_specs(specs: Any) -> str:
+    """
+    Flattens a specs value (JSONB dict, Directus repeater list or plain text)
+    into a 'key: value, key: value' string.
+    """
+    if not specs:
+        return ""
+    if isinstance(specs, str):
+        return specs
+    if isinstance(specs, dict):
+        return ", ".join([f"{k}: {v}" for k, v in specs.items()])
+    if isinstance(specs, list):
+        # Handle Directus repeater format [{key: ..., value: ...}]
+        return ", ".join([f"{s.get('key')}: {s.get('value')}" for s in specs if isinstance(s, dict)])
+    return str(specs)
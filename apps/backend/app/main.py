@@ -5,13 +5,60 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from apps.backend.app.core.config import settings
-from apps.backend.app.core.database import engine, get_db
+from apps.backend.app.core.database import async_engine, engine, get_db
+from apps.backend.app.core.cache import cache_stats, start_invalidation_listener, stop_invalidation_listener
+from packages.database.instrumentation import query_scope, sql_stats
 from apps.backend.app.routers import catalog, journal, projects, service_v2, diagnostics, integrations, leads, auth, webhooks
+from apps.backend.app.services.search_engine import search_engine
+from apps.backend.app.services.suggest_index import suggest_index
+from apps.backend.app.services.local_vector_index import local_vector_index
+from apps.backend.services.ai_client import ai_clients
+from contextlib import asynccontextmanager
+from fastapi.concurrency import run_in_threadpool
+import logging
+
+def _load_precomputed_expansions():
+    from apps.backend.app.core.database import SessionLocal
+    from apps.backend.services.expansion_cache import expansion_cache
+    from apps.backend.services.expansion_dictionary import expansion_dictionary
+    db = SessionLocal()
+    try:
+        count = expansion_cache.load_precomputed(db)
+        logging.getLogger("uvicorn").info(f"Loaded {count} precomputed query expansions")
+    except Exception as e:
+        logging.getLogger("uvicorn").error(f"Failed to load precomputed query expansions: {e}")
+        db.rollback()
+    try:
+        words = expansion_dictionary.load(db)
+        logging.getLogger("uvicorn").info(f"Loaded query expansion dictionary: {words} catalog words")
+    except Exception as e:
+        logging.getLogger("uvicorn").error(f"Failed to load query expansion dictionary: {e}")
+    finally:
+        db.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the in-process catalog search index without blocking startup
+    search_engine.schedule_rebuild()
+    suggest_index.schedule_rebuild()
+    local_vector_index.schedule_rebuild()
+    await run_in_threadpool(_load_precomputed_expansions)
+    # One keep-alive connection pool to the AI provider for the whole worker
+    ai_clients.start()
+    # Keep this worker's L1 cache in sync with invalidations from the others
+    start_invalidation_listener()
+    yield
+    from apps.backend.services.expansion_cache import expansion_cache
+    await expansion_cache.flush_popularity()
+    await stop_invalidation_listener()
+    await ai_clients.close()
+    await async_engine.dispose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Legacy Lead Redirects
@@ -19,16 +66,14 @@ app = FastAPI(
 @app.post("/leads/leads")
 async def lead_legacy_redirect(request: Request, background_tasks: BackgroundTasks):
     from apps.backend.app.routers.leads import create_lead, LeadCreate
-    from apps.backend.app.core.database import SessionLocal
+    from apps.backend.app.core.database import AsyncSessionLocal
     body = await request.json()
-    db = SessionLocal()
-    try:
-        res = await create_lead(LeadCreate(**body), background_tasks, db)
-        return {"status": "ok", "lead_id": res.get("lead_id")}
-    except Exception as e:
-        return {"status": "error", "detail": str(e)}
-    finally:
-        db.close()
+    async with AsyncSessionLocal() as db:
+        try:
+            res = await create_lead(LeadCreate(**body), background_tasks, db)
+            return {"status": "ok", "lead_id": res.get("lead_id")}
+        except Exception as e:
+            return {"status": "error", "detail": str(e)}
 
 # Logging Middleware
 @app.middleware("http")
@@ -54,6 +99,14 @@ async def log_requests(request: Request, call_next):
         
     return response
 
+# SQL instrumentation: statements and DB time of each request, also sent to the browser
+@app.middleware("http")
+async def sql_timing(request: Request, call_next):
+    with query_scope(f"{request.method} {request.url.path}") as stats:
+        response = await call_next(request)
+    response.headers["Server-Timing"] = stats.server_timing()
+    return response
+
 from fastapi.staticfiles import StaticFiles
 import os
 
@@ -101,3 +154,24 @@ def health_check():
         return {"status": "ok", "db": "connected"}
     except Exception:
         return {"status": "error", "db": "disconnected"}
+
+@app.get("/health/cache")
+def cache_health():
+    """Hit/miss counters of the read-model caches in this worker."""
+    from apps.backend.app.services.passport_cache import passport_cache
+    from apps.backend.services.expansion_dictionary import expansion_dictionary
+    return {
+        "passport": passport_cache.stats(),
+        "endpoints": cache_stats(),
+        "expansion_dictionary": expansion_dictionary.stats(),
+    }
+
+@app.get("/health/db")
+def db_health():
+    """Statement counts, DB time, slow queries and N+1 detections in this worker, plus pool usage."""
+    return {"queries": sql_stats(), "pool": {"sync": engine.pool.status(), "async": async_engine.pool.status()}}
+
+@app.get("/health/ai")
+def ai_health():
+    """Concurrency, connection pool saturation, circuit breaker state and bulkhead rejections of the shared AI client."""
+    return ai_clients.stats()
@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import select, func, or_
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from typing import Optional, List
 
-from apps.backend.app.core.database import get_db
-from apps.backend.app.core.cache import cache, redis_client
+from apps.backend.app.core.database import get_db, get_async_db
+from apps.backend.app.core.cache import cache, invalidate_tags, refresh_when_done
+from apps.backend.app.core.pagination import cached_count, clamp_limit, keyset_page
+from apps.backend.app.services.cache_tags import category_tag, item_cache_tags
+from apps.backend.app.services.search_engine import search_engine, KIND_MODELS
+from apps.backend.app.services.suggest_index import suggest_index
+from apps.backend.app.services.hybrid_search import hybrid_search, load_page
+from apps.backend.app.services.local_vector_index import local_vector_index
+from apps.backend.app.services.passport_cache import passport_cache
+from apps.backend.app.services.projections import load_options
+from apps.backend.app.services.recommendations import recommended_spares, refresh_products, refresh_spares
 from packages.database.models import Product, ProductImage, SparePart, SparePartImage, MachineInstance
-from apps.backend.app.schemas import ProductSchema, SparePartSchema, MachineInstanceSchema
+from apps.backend.app.schemas import (
+    ProductListSchema, ProductSchema, SparePartListSchema, SparePartSchema, MachineInstanceSchema,
+)
 
-from apps.backend.services.ai_service import AIService
+from apps.backend.services.ai_service import get_ai_service
 
 router = APIRouter()
 
@@ -53,305 +65,113 @@ async def get_filters(db: Session = Depends(get_db)):
             
     return FiltersResponse(groups=groups)
 
-def normalize_query(q: str) -> str:
-    """
-    Normalizes query by converting common Latin homoglyphs to Cyrillic
-    to ensure better matching for industrial model numbers.
-    """
-    if not q:
-        return ""
-    
-    # Latin -> Cyrillic mapping for common technical characters
-    mapping = {
-        'M': 'М', 'm': 'м',
-        'H': 'Н', 'h': 'н',
-        'A': 'А', 'a': 'а',
-        'C': 'С', 'c': 'с',
-        'T': 'Т', 't': 'т',
-        'K': 'К', 'k': 'к',
-        'X': 'Х', 'x': 'х',
-        'O': 'О', 'o': 'о',
-        'P': 'Р', 'p': 'р',
-        'E': 'Е', 'e': 'е',
-        'B': 'В', 'b': 'в',
-        'y': 'у', 'Y': 'У',
-        'u': 'у', 'U': 'У',
-        'i': 'и', 'I': 'И',
-    }
-    
-    # Also standardize some common variations
-    norm = q.strip()
-    for lat, cyr in mapping.items():
-        norm = norm.replace(lat, cyr)
-    
-    return norm
+def search_cache_tags(params: dict) -> List[str]:
+    kind = "spares" if params.get("type") == "spares" else "machines"
+    tags = []
+    if params.get("category"):
+        tags.append(category_tag(params["category"]))
+    if not params.get("q") or not params["q"].strip():
+        # Plain listings can change with any item of the kind
+        tags.append(f"listing:{kind}")
+    return tags
+
+def search_result_tags(result: dict) -> List[str]:
+    return [f"item:{item['id']}" for item in result.get("results", [])]
+
+async def invalidate_item_cache(db: Session, kind: str, item_id, category: Optional[str]) -> None:
+    """Drops cached search pages containing the item, listings of its kind and of its category (by name and slug)."""
+    await invalidate_tags(await run_in_threadpool(item_cache_tags, db, kind, [item_id], category))
 
 @router.get("/search")
-@cache(expire=60) # 1 minute cache for faster content updates
+@cache(expire=60, tags=search_cache_tags, item_tags=search_result_tags) # 1 minute cache for faster content updates
 async def search_products(
     q: Optional[str] = None,
     type: str = "machines", # "machines" or "spares"
     category: Optional[str] = None,  # Filter by category
     limit: int = 20,
     offset: int = 0,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,  # Listing only: next_cursor of the previous page
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Search products or spare parts.
-    Returns { results: [], total: int }
+    Returns { results: [], total: int, next_cursor: str | null }
+    Plain listings are keyset-paginated by (name, id); search results are ranked
+    and paged by offset.
     """
-    total_count = 0
-    
+    kind = "spares" if type == "spares" else "machines"
+    model = KIND_MODELS[kind]
+    item_schema = SparePartListSchema if kind == "spares" else ProductListSchema
+    # limit=0 or a negative limit/offset would break the LIMIT/OFFSET arithmetic below
+    limit, offset = clamp_limit(limit), max(offset, 0)
+
     # Resolve category slug to name once if it exists
     category_name = None
     if category:
-        cat_obj = await run_in_threadpool(lambda: db.execute(select(Category).where(func.lower(Category.slug) == category.lower())).scalar_one_or_none())
+        cat_obj = (await db.execute(select(Category).where(func.lower(Category.slug) == category.lower()))).scalar_one_or_none()
         category_name = cat_obj.name if cat_obj else category
 
-    # SPARE PARTS MODE
-    if type == "spares":
-        norm_q = normalize_query(q)
-        kw_query = select(SparePart).where(SparePart.is_published == True)
-        if q:
-            # Tokenized search: all words in query (or normalized) must match
-            words = [w.strip() for w in q.split() if len(w.strip()) > 1]
-            norm_words = [w.strip() for w in norm_q.split() if len(w.strip()) > 1]
-            
-            # Combine words from both original and normalized to catch homoglyphs per token
-            from sqlalchemy import and_
-            
-            # For each word position, try original or normalized
-            clauses = []
-            for i in range(min(len(words), len(norm_words))):
-                w = words[i]
-                nw = norm_words[i]
-                clauses.append(or_(
-                    SparePart.name.ilike(f"%{w}%"),
-                    SparePart.name.ilike(f"%{nw}%")
-                ))
-            
-            if clauses:
-                kw_query = kw_query.where(and_(*clauses))
-            else:
-                # Fallback to simple ILIKE if split failed
-                kw_query = kw_query.where(
-                    (SparePart.name.ilike(f"%{q}%")) | 
-                    (SparePart.name.ilike(f"%{norm_q}%"))
-                )
+    # Plain listing without a query
+    if not q or not q.strip():
+        listing = select(model.id).where(model.is_published == True)
         if category_name:
-            kw_query = kw_query.where(SparePart.category.ilike(category_name))
-        
-        kw_results = await run_in_threadpool(lambda: db.execute(kw_query.options(joinedload(SparePart.images))).unique().scalars().all())
-        
-        # 2. Semantic search
-        semantic_results = []
-        if q and len(q.split()) > 0:
-            try:
-                ai_service = AIService()
-                # Query Expansion for better semantic matching
-                expanded_q = await ai_service.expand_query(q)
-                print(f"DEBUG: Expanded spare query '{q}' -> '{expanded_q}'")
-                
-                # Use expanded keywords for better recall in ILIKE if semantic fails
-                # This handles singular/plural and synonyms better
-                import re
-                exp_keywords = re.split(r'[,\s\'\"]+', expanded_q)
-                # Filter noise words and short tokens
-                noise_words = {'станок', 'запчасти', 'модель', 'оборудование', 'инструмент'}
-                exp_keywords = [k.strip() for k in exp_keywords if len(k.strip()) > 2 and k.strip().lower() not in noise_words]
-                
-                if exp_keywords:
-                    # Search for top 8 keywords found in expansion
-                    kw_clauses = [SparePart.name.ilike(f"%{k}%") for k in exp_keywords[:8]]
-                    kw_secondary = select(SparePart).where(SparePart.is_published == True).where(or_(*kw_clauses))
-                    if category_name:
-                        kw_secondary = kw_secondary.where(SparePart.category.ilike(category_name))
-                    
-                    secondary_results = await run_in_threadpool(lambda: db.execute(kw_secondary.options(joinedload(SparePart.images))).unique().scalars().all())
-                    kw_results.extend(secondary_results)
-
-                query_embedding = await ai_service.get_embedding(expanded_q)
-                
-                distance_expr = SparePart.embedding.cosine_distance(query_embedding).label("distance")
-                sem_stmt = select(SparePart, distance_expr).options(
-                    joinedload(SparePart.images)
-                ).where(SparePart.is_published == True)
-                
-                if category_name:
-                    sem_stmt = sem_stmt.where(SparePart.category.ilike(category_name))
-                
-                sem_stmt = sem_stmt.order_by(distance_expr).limit(limit)
-                sem_raw = await run_in_threadpool(lambda: db.execute(sem_stmt).unique().all())
-                
-                for spare, dist in sem_raw:
-                    if dist is not None and dist < 0.52: # Further increased threshold for better recall
-                        semantic_results.append(spare)
-            except Exception as e:
-                print(f"Semantic search for spares failed: {e}")
-
-        # 3. Merge and Deduplicate
-        seen_ids = set()
-        merged_results = []
-        
-        for p in kw_results:
-            if p.id not in seen_ids:
-                merged_results.append(p)
-                seen_ids.add(p.id)
-                
-        for p in semantic_results:
-            if p.id not in seen_ids:
-                merged_results.append(p)
-                seen_ids.add(p.id)
-                
-        total_count = len(merged_results)
-        paged_results = merged_results[offset : offset + limit]
-
+            listing = listing.where(model.category.ilike(category_name))
+        page = await keyset_page(db, listing, [model.name, model.id], limit, cursor=cursor, offset=offset)
+        total_count = await cached_count(db, f"listing:{kind}:{(category_name or '').lower()}", listing)
+        results = await load_page(db, model, [row.id for row in page.rows])
         return {
-            "results": [SparePartSchema.model_validate(p) for p in paged_results],
-            "total": total_count
+            "results": [item_schema.model_validate(p) for p in results],
+            "total": total_count,
+            "next_cursor": page.next_cursor,
         }
 
-    # MACHINES MODE (Default)
-    if not q:
-        query = select(Product).where(Product.is_published == True)
-        
-        # Apply category filter
-        if category_name:
-            query = query.where(Product.category.ilike(category_name))
-        
-        # Count
-        count_stmt = select(func.count()).select_from(query.subquery())
-        total_count = await run_in_threadpool(lambda: db.execute(count_stmt).scalar()) or 0
-
-        # Data
-        query = query.options(joinedload(Product.images)).limit(limit).offset(offset)
-        
-        # Async DB Execution
-        results = await run_in_threadpool(lambda: db.execute(query).unique().scalars().all())
-        return {
-            "results": [ProductSchema.model_validate(p) for p in results],
-            "total": total_count
-        }
-
-    # HYBRID SEARCH (MACHINES)
-    # We combine Keyword match (ILIKE) and Semantic match (pgvector)
-    
-    # 1. Keyword search (always performed as it's fast and precise for model numbers)
-    norm_q = normalize_query(q)
-    kw_query = select(Product).where(Product.is_published == True)
-    if q:
-        # Tokenized search: all words in query (or normalized) must match
-        words = [w.strip() for w in q.split() if len(w.strip()) > 1]
-        norm_words = [w.strip() for w in norm_q.split() if len(w.strip()) > 1]
-        
-        from sqlalchemy import and_
-        clauses = []
-        for i in range(min(len(words), len(norm_words))):
-            w = words[i]
-            nw = norm_words[i]
-            clauses.append(or_(
-                Product.name.ilike(f"%{w}%"),
-                Product.name.ilike(f"%{nw}%")
-            ))
-        
-        if clauses:
-            kw_query = kw_query.where(and_(*clauses))
-        else:
-            kw_query = kw_query.where(
-                (Product.name.ilike(f"%{q}%")) | 
-                (Product.name.ilike(f"%{norm_q}%"))
-            )
-    if category_name:
-        kw_query = kw_query.where(Product.category.ilike(category_name))
-    
-    kw_results = await run_in_threadpool(lambda: db.execute(kw_query.options(joinedload(Product.images))).unique().scalars().all())
-    
-    # 2. Semantic search (if q is meaningful)
-    semantic_results = []
-    if q and len(q.split()) > 0:
-        try:
-            ai_service = AIService()
-            # Query Expansion for better semantic matching
-            expanded_q = await ai_service.expand_query(q)
-            print(f"DEBUG: Expanded product query '{q}' -> '{expanded_q}'")
-            
-            # Add multi-keyword matching to fallback
-            import re
-            exp_keywords = re.split(r'[,\s\'\"]+', expanded_q)
-            # Filter noise words and short tokens
-            noise_words = {'станок', 'запчасти', 'модель', 'оборудование', 'инструмент'}
-            exp_keywords = [k.strip() for k in exp_keywords if len(k.strip()) > 2 and k.strip().lower() not in noise_words]
-            
-            if exp_keywords:
-                kw_clauses = [Product.name.ilike(f"%{k}%") for k in exp_keywords[:8]]
-                kw_secondary = select(Product).where(Product.is_published == True).where(or_(*kw_clauses))
-                if category_name:
-                    kw_secondary = kw_secondary.where(Product.category.ilike(category_name))
-                
-                secondary_results = await run_in_threadpool(lambda: db.execute(kw_secondary.options(joinedload(Product.images))).unique().scalars().all())
-                kw_results.extend(secondary_results)
-
-            query_embedding = await ai_service.get_embedding(expanded_q)
-            
-            distance_expr = Product.embedding.cosine_distance(query_embedding).label("distance")
-            
-            sem_stmt = select(Product, distance_expr).options(
-                joinedload(Product.images)
-            ).where(Product.is_published == True)
-            
-            if category_name:
-                sem_stmt = sem_stmt.where(Product.category.ilike(category_name))
-                
-            sem_stmt = sem_stmt.order_by(distance_expr).limit(limit)
-            
-            sem_raw = await run_in_threadpool(lambda: db.execute(sem_stmt).unique().all())
-            
-            # Threshold for semantic relevance
-            for product, dist in sem_raw:
-                if dist is not None and dist < 0.52: # Further increased threshold for better recall
-                    semantic_results.append(product)
-                    
-        except Exception as e:
-            print(f"Semantic search failed: {e}")
-            
-    # 3. Merge and Deduplicate
-    # Keyword results go first (more precise for specific models), then semantic (similar items)
-    seen_ids = set()
-    merged_results = []
-    
-    for p in kw_results:
-        if p.id not in seen_ids:
-            merged_results.append(p)
-            seen_ids.add(p.id)
-            
-    for p in semantic_results:
-        if p.id not in seen_ids:
-            merged_results.append(p)
-            seen_ids.add(p.id)
-            
-    total_count = len(merged_results)
-    # Apply pagination to merged results
-    paged_results = merged_results[offset : offset + limit]
-    
+    # HYBRID SEARCH
+    paged_results, total_count, pending = await hybrid_search(db, kind, q, category_name, limit, offset)
+    if pending is not None:
+        # Semantic stage missed its deadline: the cached page is replaced once it lands
+        refresh_when_done(pending)
     return {
-        "results": [ProductSchema.model_validate(p) for p in paged_results],
-        "total": total_count
+        "results": [item_schema.model_validate(p) for p in paged_results],
+        "total": total_count,
+        "next_cursor": None,
     }
 
+@router.get("/suggest")
+async def suggest(
+    q: str = "",
+    type: Optional[str] = None, # "machines", "spares" or both when omitted
+    limit: int = Query(8, ge=1, le=20),
+):
+    """
+    Typeahead completions for the search box, served from the in-memory suggest
+    index: no database or AI call per keystroke.
+    Returns { suggestions: [{ text, kind, id, slug }] }
+    """
+    suggest_index.ensure_fresh()
+    kind = type if type in KIND_MODELS else None
+    return {"suggestions": [vars(s) for s in suggest_index.suggest(q, limit=limit, kind=kind)]}
+
 @router.get("/instances/{serial_number}")
-def get_instance_by_serial(serial_number: str, db: Session = Depends(get_db)):
+async def get_instance_by_serial(serial_number: str, db: AsyncSession = Depends(get_async_db)):
     """
     Get a unique machine instance by serial number (for Digital Passport).
+    Served as pre-serialized JSON from the passport cache.
     """
+    cached, generation = await passport_cache.get(serial_number)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
     stmt = select(MachineInstance).options(
-        joinedload(MachineInstance.product).joinedload(Product.images)
+        joinedload(MachineInstance.product).options(*load_options(Product, "detail"))
     ).where(MachineInstance.serial_number == serial_number)
-    
-    instance = db.execute(stmt).unique().scalar_one_or_none()
+    instance = (await db.execute(stmt)).unique().scalar_one_or_none()
     if not instance:
         return {"error": "Instance not found"}
-        
-    return MachineInstanceSchema.model_validate(instance)
+
+    payload = MachineInstanceSchema.model_validate(instance).model_dump_json(by_alias=True)
+
+    await passport_cache.set(serial_number, payload, generation)
+    return Response(content=payload, media_type="application/json")
 
 @router.get("/instances-featured")
 def get_featured_instance(db: Session = Depends(get_db)):
@@ -377,41 +197,29 @@ def get_featured_instance(db: Session = Depends(get_db)):
         
     return MachineInstanceSchema.model_validate(instance)
 
-from apps.backend.app.schemas import SparePartSchema
-
 @router.get("/instances/{serial_number}/recommended-spares")
 async def get_recommended_spares(serial_number: str, db: Session = Depends(get_db)):
     """
     Find recommended spare parts for a machine using semantic similarity.
+    Served from the materialized product_spare_recommendations table.
     """
     from packages.database.models import SparePart
-    
-    # 1. Get Instance and Product
-    stmt = select(MachineInstance).where(MachineInstance.serial_number == serial_number)
-    instance = db.execute(stmt).scalar_one_or_none()
-    if not instance:
+
+    spares = await run_in_threadpool(lambda: recommended_spares(db, serial_number))
+    if spares:
+        return [SparePartListSchema.model_validate(s) for s in spares]
+
+    # Nothing stored for the product: it has no embedding yet or no spare is close enough.
+    # The table is filled by the /reindex hooks and scripts/build_spare_recommendations.py,
+    # never from a GET
+    stmt = select(MachineInstance.id).where(MachineInstance.serial_number == serial_number)
+    if db.execute(stmt).scalar_one_or_none() is None:
         return {"error": "Instance not found"}
-        
-    product_stmt = select(Product).where(Product.id == instance.product_id)
-    product = db.execute(product_stmt).scalar_one_or_none()
-    
-    # 2. Semantic Search if product has embedding
-    if product and hasattr(product, 'embedding') and product.embedding is not None:
-        try:
-            # We use product embedding as a query for spares
-            distance_expr = SparePart.embedding.cosine_distance(product.embedding).label("distance")
-            spares_stmt = select(SparePart, distance_expr).order_by(distance_expr).limit(6)
-            
-            spares_raw = await run_in_threadpool(lambda: db.execute(spares_stmt).all())
-            
-            return [SparePartSchema.model_validate(s) for s, dist in spares_raw]
-        except Exception as e:
-            print(f"Recommended spares search failed: {e}")
-            
+
     # Fallback: Get some default popular spares
-    spares_stmt = select(SparePart).limit(6)
+    spares_stmt = select(SparePart).options(*load_options(SparePart, "list")).limit(6)
     spares = db.execute(spares_stmt).scalars().all()
-    return [SparePartSchema.model_validate(s) for s in spares]
+    return [SparePartListSchema.model_validate(s) for s in spares]
 
 
 @router.get("/debug/migrations")
@@ -515,15 +323,9 @@ def get_product(id_or_slug: str, db: Session = Depends(get_db)):
 
     # 1. Try Machines
     if is_uuid:
-        stmt = select(Product).options(
-            joinedload(Product.images),
-            joinedload(Product.compatible_parts).joinedload(SparePart.images)
-        ).where(Product.id == uid)
+        stmt = select(Product).options(*load_options(Product, "detail")).where(Product.id == uid)
     else:
-        stmt = select(Product).options(
-            joinedload(Product.images),
-            joinedload(Product.compatible_parts).joinedload(SparePart.images)
-        ).where(Product.slug == id_or_slug)
+        stmt = select(Product).options(*load_options(Product, "detail")).where(Product.slug == id_or_slug)
     
     product = db.execute(stmt).unique().scalar_one_or_none()
     if product:
@@ -531,15 +333,9 @@ def get_product(id_or_slug: str, db: Session = Depends(get_db)):
             
     # 2. Try Spares
     if is_uuid:
-        stmt = select(SparePart).options(
-            joinedload(SparePart.images),
-            joinedload(SparePart.compatible_products).joinedload(Product.images)
-        ).where(SparePart.id == uid)
+        stmt = select(SparePart).options(*load_options(SparePart, "detail")).where(SparePart.id == uid)
     else:
-        stmt = select(SparePart).options(
-            joinedload(SparePart.images),
-            joinedload(SparePart.compatible_products).joinedload(Product.images)
-        ).where(SparePart.slug == id_or_slug)
+        stmt = select(SparePart).options(*load_options(SparePart, "detail")).where(SparePart.slug == id_or_slug)
         
     spare = db.execute(stmt).unique().scalar_one_or_none()
     if spare:
@@ -553,12 +349,12 @@ async def reindex_product(product_id: str, db: Session = Depends(get_db)):
     Triggered by Directus hook to update embeddings for a product.
     """
     try:
-        stmt = select(Product).where(Product.id == product_id)
+        stmt = select(Product).options(*load_options(Product, "internal")).where(Product.id == product_id)
         product = await run_in_threadpool(lambda: db.execute(stmt).scalar_one_or_none())
         if not product:
             return {"error": "Product not found"}
             
-        ai_service = AIService()
+        ai_service = get_ai_service()
         specs = product.specs or {}
         if isinstance(specs, str):
             specs_str = specs
@@ -572,14 +368,13 @@ async def reindex_product(product_id: str, db: Session = Depends(get_db)):
         product.embedding = embedding
         
         await run_in_threadpool(lambda: db.commit())
+        await run_in_threadpool(lambda: search_engine.refresh(db, "machines", [product.id]))
+        await run_in_threadpool(lambda: suggest_index.refresh(db, "machines", [product.id]))
+        await run_in_threadpool(lambda: local_vector_index.refresh(db, "machines", [product.id]))
+        await run_in_threadpool(lambda: refresh_products(db, [product.id]))
         
-        # Clear search cache to reflect changes immediately
-        try:
-            keys = await redis_client.keys("search_products:*")
-            if keys:
-                await redis_client.delete(*keys)
-        except Exception as cache_err:
-            print(f"Failed to clear cache during product reindex: {cache_err}")
+        # Clear affected search cache entries to reflect changes immediately
+        await invalidate_item_cache(db, "machines", product.id, product.category)
 
         return {"status": "success", "message": f"Product {product_id} reindexed"}
     except Exception as e:
@@ -591,12 +386,12 @@ async def reindex_spare(spare_id: str, db: Session = Depends(get_db)):
     Triggered by Directus hook to update embeddings for a spare part.
     """
     try:
-        stmt = select(SparePart).where(SparePart.id == spare_id)
+        stmt = select(SparePart).options(*load_options(SparePart, "internal")).where(SparePart.id == spare_id)
         spare = await run_in_threadpool(lambda: db.execute(stmt).scalar_one_or_none())
         if not spare:
             return {"error": "Spare part not found"}
             
-        ai_service = AIService()
+        ai_service = get_ai_service()
         specs = spare.specs or {}
         if isinstance(specs, str):
             specs_str = specs
@@ -612,14 +407,13 @@ async def reindex_spare(spare_id: str, db: Session = Depends(get_db)):
         spare.embedding = embedding
         
         await run_in_threadpool(lambda: db.commit())
+        await run_in_threadpool(lambda: search_engine.refresh(db, "spares", [spare.id]))
+        await run_in_threadpool(lambda: suggest_index.refresh(db, "spares", [spare.id]))
+        await run_in_threadpool(lambda: local_vector_index.refresh(db, "spares", [spare.id]))
+        await run_in_threadpool(lambda: refresh_spares(db, [spare.id]))
 
-        # Clear search cache to reflect changes immediately
-        try:
-            keys = await redis_client.keys("search_products:*")
-            if keys:
-                await redis_client.delete(*keys)
-        except Exception as cache_err:
-            print(f"Failed to clear cache during spare reindex: {cache_err}")
+        # Clear affected search cache entries to reflect changes immediately
+        await invalidate_item_cache(db, "spares", spare.id, spare.category)
 
         return {"status": "success", "message": f"Spare part {spare_id} reindexed"}
     except Exception as e:
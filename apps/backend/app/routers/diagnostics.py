@@ -30,8 +30,8 @@ async def analyze_machine(request: DiagnosticsRequest):
     try:
         # Try AI-powered analysis
         try:
-            from apps.backend.services.ai_service import AIService
-            ai_service = AIService()
+            from apps.backend.services.ai_service import get_ai_service
+            ai_service = get_ai_service()
             
             result = await ai_service.generate_diagnosis_recommendation(
                 machine_type=request.machine_type,
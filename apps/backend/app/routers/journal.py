@@ -1,22 +1,41 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from apps.backend.app.core.database import get_db
+from apps.backend.app.core.database import get_db, get_async_db
+from apps.backend.app.core.pagination import cached_count, clamp_limit, keyset_page
 from packages.database.models import Article
 from apps.backend.app.schemas import ArticleSchema
 
 router = APIRouter()
 
 @router.get("")
-def get_journal(db: Session = Depends(get_db)):
+async def get_journal(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
     """
-    Get list of articles.
+    Get list of articles, newest first.
+    Without `limit` every article is returned; with it, pages are keyset-paginated:
+    pass the returned `next_cursor` back as `cursor` for the next page.
     """
-    query = select(Article).order_by(Article.created_at.desc())
-    results = db.execute(query).scalars().all()
-    data = [ArticleSchema.model_validate(a) for a in results]
-    return {"articles": data}
+    keys = [Article.created_at, Article.id]
+    if limit is None:
+        query = select(Article).order_by(*[k.desc() for k in keys])
+        results = (await db.execute(query)).scalars().all()
+        return {"articles": [ArticleSchema.model_validate(a) for a in results], "next_cursor": None}
+
+    page = await keyset_page(db, select(Article), keys, clamp_limit(limit), cursor=cursor, descending=True)
+    total = await cached_count(db, "journal", select(Article.id))
+    return {
+        "articles": [ArticleSchema.model_validate(row.Article) for row in page.rows],
+        "next_cursor": page.next_cursor,
+        "total": total,
+    }
 
 @router.get("/{id_or_slug}")
 def get_article(id_or_slug: str, db: Session = Depends(get_db)):
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.orm import Session
-from apps.backend.app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from apps.backend.app.core.database import get_async_db
 from packages.database.models import Lead, LeadSource
 from pydantic import BaseModel, EmailStr, field_validator
 import re
@@ -148,7 +148,7 @@ async def sync_task(lead_id: str):
         background_db.close()
 
 @router.post("/leads")
-async def create_lead(lead_in: LeadCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def create_lead(lead_in: LeadCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db)):
     """
     Ingest a new lead from any source (Site/Bot).
     """
@@ -163,17 +163,9 @@ async def create_lead(lead_in: LeadCreate, background_tasks: BackgroundTasks, db
             status="new"
         )
         
-        # Async DB Execution
-        from fastapi.concurrency import run_in_threadpool
-        
-        def save_lead():
-            db.add(new_lead)
-            db.commit()
-            # Explicitly expire to force reload on next access if needed, 
-            # but we won't refresh here to avoid thread-safety issues with the session
-            # db.refresh(new_lead) 
-            
-        await run_in_threadpool(save_lead)
+        # expire_on_commit=False keeps the attributes readable below without a reload
+        db.add(new_lead)
+        await db.commit()
         
         # --- Notification Logic ---
         try:
@@ -8,6 +8,11 @@ import time
 import asyncio
 from apps.backend.app.services.image_service import image_service
 from apps.backend.app.core.config import settings
+from apps.backend.app.core.database import get_db
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from apps.backend.app.core.cache import invalidate_tags, ALL_TAG
+from apps.backend.app.services.cache_tags import item_cache_tags
 
 router = APIRouter()
 logger = logging.getLogger("uvicorn")
@@ -16,11 +21,37 @@ logger = logging.getLogger("uvicorn")
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 r = redis.from_url(REDIS_URL)
 
+# Directus collections -> cache tags of the entries built from them
+COLLECTION_KINDS = {"products": "machines", "spare_parts": "spares"}
+
+def directus_cache_tags(payload: dict, db: Session) -> list:
+    """
+    Maps a Directus flow trigger ({collection, key | keys, payload}) to cache tags.
+    Only products and spare parts have item-level tags; a change in any other
+    collection (articles, services, pages, ...) invalidates everything.
+    On create/update `payload` holds the changed fields, on delete the list of
+    deleted keys; pages of the old category contain the item and go with its item tag.
+    """
+    collection = payload.get("collection")
+    if not collection:
+        return [ALL_TAG]
+    kind = COLLECTION_KINDS.get(collection)
+    if kind is None:
+        return [ALL_TAG]
+
+    changes = payload.get("payload")
+    keys = payload.get("keys") or ([payload["key"]] if payload.get("key") else [])
+    if not keys and isinstance(changes, list):
+        keys = changes
+    category = changes.get("category") if isinstance(changes, dict) else None
+    return item_cache_tags(db, kind, keys, str(category) if category else None)
+
 @router.post("/clear-cache")
-async def clear_cache(x_webhook_secret: str = Header(None)):
+async def clear_cache(request: Request, x_webhook_secret: str = Header(None), db: Session = Depends(get_db)):
     """
-    Endpoint to clear Redis cache. 
-    Triggered by Directus Flow when content changes.
+    Endpoint to invalidate the Redis cache.
+    Triggered by Directus Flow when content changes; with the trigger data as body
+    only the entries built from the changed items are dropped, without a body everything is.
     """
     # Simple secret verification
     secret = os.getenv("DIRECTUS_WEBHOOK_SECRET", "rss-secret-2026")
@@ -29,17 +60,13 @@ async def clear_cache(x_webhook_secret: str = Header(None)):
         raise HTTPException(status_code=401, detail="Invalid secret")
 
     try:
-        # Clear all keys (or specific patterns if needed)
-        # Fastapi-cache usually uses a specific prefix, e.g., 'fastapi-cache:'
-        keys = r.keys("fastapi-cache:*")
-        if keys:
-            r.delete(*keys)
-            logger.info(f"Cleared {len(keys)} cache keys")
-        
-        return {"status": "ok", "cleared_keys": len(keys)}
-    except Exception as e:
-        logger.error(f"Error clearing cache: {e}")
-        raise HTTPException(status_code=500, detail="Cache clear failed")
+        payload = await request.json()
+    except Exception:
+        payload = {}
+
+    tags = await run_in_threadpool(directus_cache_tags, payload if isinstance(payload, dict) else {}, db)
+    cleared = await invalidate_tags(tags)
+    return {"status": "ok", "tags": tags, "cleared_keys": cleared}
 
 from fastapi import Request
 from apps.backend.app.services.amocrm_sync_service import amocrm_sync_service
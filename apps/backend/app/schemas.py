@@ -47,7 +47,8 @@ class ProductImageSchema(BaseModel):
     image_file: Optional[UUID] = None
     is_primary: bool = False
     order: Optional[int] = 0
-    db_url: Optional[str] = Field(None, alias="url")
+    # Read from the row's `url` column, only ever serialized through the computed `url`
+    db_url: Optional[str] = Field(None, validation_alias="url", exclude=True)
 
     @computed_field
     @property
@@ -63,7 +64,8 @@ class SparePartImageSchema(BaseModel):
     image_file: Optional[UUID] = None
     is_primary: bool = False
     order: Optional[int] = 0
-    db_url: Optional[str] = Field(None, alias="url")
+    # Read from the row's `url` column, only ever serialized through the computed `url`
+    db_url: Optional[str] = Field(None, validation_alias="url", exclude=True)
 
     @computed_field
     @property
@@ -122,21 +124,19 @@ class SparePartMiniSchema(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
-class ProductSchema(BaseModel):
+class ProductListSchema(BaseModel):
+    """A product as a search/listing row, what the catalog card shows."""
     id: UUID
     name: str
     slug: Optional[str] = None
     description: Optional[str] = None
     category: Optional[str] = None
-    manufacturer: Optional[str] = None
     specs: Optional[Any] = None
     price: Optional[float] = None
     currency: Optional[str] = "RUB"
     is_published: bool = True
     image_file: Optional[UUID] = None
     images: List[ProductImageSchema] = Field(default=[])
-    compatible_parts: List["SparePartMiniSchema"] = []
-    video_url: Optional[str] = None
     
     @computed_field
     @property
@@ -169,6 +169,12 @@ class ProductSchema(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class ProductSchema(ProductListSchema):
+    """The product page: the list row plus the fields only the detail view shows."""
+    manufacturer: Optional[str] = None
+    compatible_parts: List["SparePartMiniSchema"] = []
+    video_url: Optional[str] = None
+
 class ArticleSchema(BaseModel):
     id: UUID
     title: str
@@ -199,7 +205,8 @@ class ArticleSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
-class SparePartSchema(BaseModel):
+class SparePartListSchema(BaseModel):
+    """A spare part as a search/listing row, what the catalog card shows."""
     id: UUID
     name: str
     slug: Optional[str] = None
@@ -211,7 +218,6 @@ class SparePartSchema(BaseModel):
     is_published: bool = True
     image_file: Optional[UUID] = None
     images: List[SparePartImageSchema] = Field(default=[])
-    compatible_products: List[ProductMiniSchema] = []
     
     @computed_field
     @property
@@ -245,6 +251,10 @@ class SparePartSchema(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class SparePartSchema(SparePartListSchema):
+    """The spare part page: the list row plus its compatible machines."""
+    compatible_products: List[ProductMiniSchema] = []
+
 class CategorySchema(BaseModel):
     name: str
     slug: Optional[str] = None
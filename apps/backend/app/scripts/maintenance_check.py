@@ -2,6 +2,7 @@ import asyncio
 import logging
 from apps.backend.app.core.database import SessionLocal
 from apps.backend.app.services.maintenance_service import MaintenanceService
+from packages.database.instrumentation import query_scope
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,8 +16,9 @@ async def run_check():
     try:
         service = MaintenanceService(db)
         # Check for 30 days ahead
-        await service.check_upcoming_maintenance(days_ahead=30)
-        logger.info("Maintenance check completed successfully.")
+        with query_scope("maintenance_check") as stats:
+            await service.check_upcoming_maintenance(days_ahead=30)
+        logger.info(f"Maintenance check completed successfully ({stats.count} queries, {stats.duration_ms:.0f} ms in DB).")
     except Exception as e:
         logger.error(f"Error during maintenance check: {e}")
     finally:
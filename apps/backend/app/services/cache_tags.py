@@ -0,0 +1,24 @@
+from typing import Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from packages.database.models import Category
+
+def category_tag(category: str) -> str:
+    """Tag of cached pages filtered by a category, as /search received it (name or slug)."""
+    return f"category:{category.lower()}"
+
+def item_cache_tags(db: Session, kind: str, item_ids: Iterable, category: Optional[str]) -> List[str]:
+    """
+    Tags of the cached pages an item change can affect: pages containing the items,
+    listings of their kind and the pages filtered by their category. /search accepts
+    the category by name or by slug, so both are tagged.
+    """
+    tags = [f"item:{item_id}" for item_id in item_ids] + [f"listing:{kind}"]
+    if category:
+        tags.append(category_tag(category))
+        slug = db.execute(select(Category.slug).where(Category.name == category)).scalar()
+        if slug:
+            tags.append(category_tag(slug))
+    return tags
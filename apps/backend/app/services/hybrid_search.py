@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, cast, func, literal, literal_column, select, union_all
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.backend.app.core.text import model_number_keys, name_key
+from apps.backend.app.services.search_engine import search_engine, KIND_MODELS
+from apps.backend.app.services.local_vector_index import local_vector_index
+from apps.backend.app.services.model_numbers import apply_model_match_settings, model_number_stage
+from apps.backend.app.services.projections import load_options
+from apps.backend.app.services.vector_index import apply_search_settings_async
+from apps.backend.services.ai_service import get_ai_service
+
+logger = logging.getLogger(__name__)
+
+NOISE_WORDS = {'станок', 'запчасти', 'модель', 'оборудование', 'инструмент'}
+SEMANTIC_DISTANCE_THRESHOLD = 0.52 # Further increased threshold for better recall
+# Latency budget of the AI calls (expansion + embedding) within one search
+SEMANTIC_DEADLINE_SECONDS = float(os.getenv("SEARCH_SEMANTIC_DEADLINE_SECONDS", "1.5"))
+
+# Stage order of the ranked union: keyword hits first (more precise for
+# specific models), then fuzzy model number hits, then stemmed full-text hits,
+# then expansion keyword hits, then semantic neighbours
+STAGE_KEYWORD = 0
+STAGE_MODEL_NUMBER = 1
+STAGE_FULLTEXT = 2
+STAGE_EXPANSION = 3
+STAGE_SEMANTIC = 4
+
+# Text search config of the generated search_vector columns
+TS_CONFIG = literal_column("'russian'::regconfig")
+
+def keyword_fallback_clause(model, q: str):
+    """
+    Keyword predicate, used only until the in-process search index is built.
+    Every token is folded the same way as the persisted name_key column, so each
+    one is a single LIKE the trigram index can answer. Keys contain only letters
+    and digits, so they never carry LIKE wildcards.
+    """
+    keys = [key for key in (name_key(w) for w in q.split()) if len(key) > 1]
+    if not keys:
+        keys = [name_key(q)]
+    return and_(*[model.name_key.like(f"%{key}%") for key in keys])
+
+def id_list_stage(ids: Sequence, stage: int):
+    """
+    Ranked stage from an ID list computed in Python (e.g. by the search engine).
+    Rank is the position in the list.
+    """
+    id_array = cast(literal(list(ids), ARRAY(PG_UUID(as_uuid=True))), ARRAY(PG_UUID(as_uuid=True)))
+    ranked_ids = func.unnest(id_array).table_valued("id", with_ordinality="rank").render_derived()
+    return select(ranked_ids.c.id, literal(stage).label("stage"), ranked_ids.c.rank)
+
+def filter_stage(model, clause, category_name: Optional[str], stage: int):
+    """Ranked stage from a SQL predicate, ordered by name."""
+    stmt = select(
+        model.id,
+        literal(stage).label("stage"),
+        func.row_number().over(order_by=model.name).label("rank"),
+    ).where(model.is_published == True).where(clause)
+    if category_name:
+        stmt = stmt.where(model.category.ilike(category_name))
+    return stmt
+
+def fulltext_query(words: Sequence[str], match_all: bool = True):
+    """
+    tsquery in the Russian config, so inflected forms ('ролики') match the stem
+    ('ролик'). All words must match, or any of them with match_all=False.
+    """
+    if match_all:
+        return func.plainto_tsquery(TS_CONFIG, " ".join(words))
+    query = None
+    for word in words:
+        term = func.plainto_tsquery(TS_CONFIG, word)
+        query = term if query is None else query.op("||")(term)
+    return query
+
+def fulltext_stage(model, tsquery, category_name: Optional[str], stage: int):
+    """Ranked stage from the GIN-indexed search_vector column, ordered by ts_rank."""
+    rank = func.ts_rank(model.search_vector, tsquery)
+    stmt = select(
+        model.id,
+        literal(stage).label("stage"),
+        func.row_number().over(order_by=(rank.desc(), model.name)).label("rank"),
+    ).where(model.is_published == True).where(model.search_vector.op("@@")(tsquery))
+    if category_name:
+        stmt = stmt.where(model.category.ilike(category_name))
+    return stmt
+
+def semantic_stage(model, query_embedding: List[float], category_name: Optional[str], depth: int, stage: int):
+    """
+    Ranked stage of the `depth` nearest neighbours under the relevance threshold.
+    The threshold is applied outside the ORDER BY ... LIMIT so the ANN index stays usable.
+    """
+    distance_expr = model.embedding.cosine_distance(query_embedding).label("distance")
+    nearest = select(model.id, distance_expr).where(model.is_published == True)
+    if category_name:
+        nearest = nearest.where(model.category.ilike(category_name))
+    nearest = nearest.order_by(distance_expr).limit(depth).subquery("nearest")
+
+    return select(
+        nearest.c.id,
+        literal(stage).label("stage"),
+        func.row_number().over(order_by=nearest.c.distance).label("rank"),
+    ).where(nearest.c.distance < SEMANTIC_DISTANCE_THRESHOLD)
+
+async def ranked_page(db: AsyncSession, stages: list, limit: int, offset: int) -> Tuple[List, int]:
+    """
+    Runs the ranked union of all stages as one statement: dedupes by ID keeping
+    the best (stage, rank), counts the total with a window function and
+    returns only the IDs of the requested page.
+    """
+    if not stages:
+        return [], 0
+
+    ranked = union_all(*stages).subquery("ranked")
+    deduped = select(
+        ranked.c.id,
+        ranked.c.stage,
+        ranked.c.rank,
+        func.row_number().over(partition_by=ranked.c.id, order_by=(ranked.c.stage, ranked.c.rank)).label("dup"),
+    ).subquery("deduped")
+
+    stmt = (
+        select(deduped.c.id, func.count().over().label("total"))
+        .where(deduped.c.dup == 1)
+        .order_by(deduped.c.stage, deduped.c.rank)
+        .limit(limit)
+        .offset(offset)
+    )
+    rows = (await db.execute(stmt)).all()
+    if rows:
+        return [row.id for row in rows], rows[0].total
+
+    # Page past the end: the window total is not available, count separately
+    if offset > 0:
+        total = (await db.execute(select(func.count()).select_from(deduped).where(deduped.c.dup == 1))).scalar() or 0
+        return [], total
+    return [], 0
+
+async def load_page(db: AsyncSession, model, ids: List) -> List:
+    """
+    Hydrates only the requested page, preserving ranking order, with only the
+    columns the list schema serializes.
+    """
+    if not ids:
+        return []
+    stmt = select(model).options(*load_options(model, "list")).where(model.id.in_(ids))
+    rows = (await db.execute(stmt)).unique().scalars().all()
+    by_id = {row.id: row for row in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+async def semantic_inputs(q: str) -> Tuple[str, List[str], List[float]]:
+    """The AI part of a search: LLM expansion, its keywords and the query embedding."""
+    ai_service = get_ai_service()
+    # Query Expansion for better semantic matching
+    expanded_q = await ai_service.expand_query(q)
+    logger.debug(f"Expanded query '{q}' -> '{expanded_q}'")
+
+    # Use expanded keywords for better recall (singular/plural, synonyms)
+    exp_keywords = re.split(r'[,\s\'\"]+', expanded_q)
+    # Filter noise words and short tokens
+    exp_keywords = [k.strip() for k in exp_keywords if len(k.strip()) > 2 and k.strip().lower() not in NOISE_WORDS]
+
+    query_embedding = await ai_service.get_embedding(expanded_q)
+    return expanded_q, exp_keywords, query_embedding
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # A late AI task may fail after its request is gone; keep it out of "never retrieved" warnings
+    if not task.cancelled():
+        task.exception()
+
+async def hybrid_search(db: AsyncSession, kind: str, q: str, category_name: Optional[str], limit: int, offset: int):
+    """
+    Keyword match (in-process index) + stemmed full-text match (tsvector) +
+    semantic match (in-process vectors or pgvector).
+    The AI calls start first and run while the keyword stages are built; the
+    semantic stages are only included if they are ready within
+    SEMANTIC_DEADLINE_SECONDS of the start, otherwise the keyword results go out
+    alone. Stages are merged, deduped, counted and paginated in a single SQL
+    statement; only the page rows are hydrated.
+    Returns (page rows, total, pending): `pending` is the still-running AI task
+    when the deadline cut it off, None otherwise.
+    """
+    started = time.monotonic()
+    ai_task = asyncio.get_running_loop().create_task(semantic_inputs(q))
+    ai_task.add_done_callback(_retrieve_exception)
+    # Let the AI requests go out before the CPU-bound keyword stages
+    await asyncio.sleep(0)
+
+    model = KIND_MODELS[kind]
+    search_engine.ensure_fresh()
+    local_vector_index.ensure_fresh()
+    stages = []
+
+    # 1. Keyword search (always performed as it's fast and precise for model numbers)
+    if search_engine.is_ready:
+        kw_ids = search_engine.search(kind, q, category=category_name)
+        if kw_ids:
+            stages.append(id_list_stage(kw_ids, STAGE_KEYWORD))
+    else:
+        stages.append(filter_stage(model, keyword_fallback_clause(model, q), category_name, STAGE_KEYWORD))
+
+    # Model numbers typed with homoglyphs or separators: trigram match on the folded model_key
+    model_keys = model_number_keys(q)
+    if model_keys:
+        stages.append(model_number_stage(model, model_keys, category_name, STAGE_MODEL_NUMBER))
+
+    # Full-text search: Russian morphology in one GIN-indexed query, no LLM round trip needed
+    words = q.split()
+    if words:
+        stages.append(fulltext_stage(model, fulltext_query(words), category_name, STAGE_FULLTEXT))
+
+    # 2. Semantic search (in-process vector index, pgvector until it is built), within the deadline
+    pending = None
+    pgvector_stage = False
+    try:
+        remaining = max(0.0, SEMANTIC_DEADLINE_SECONDS - (time.monotonic() - started))
+        expanded_q, exp_keywords, query_embedding = await asyncio.wait_for(asyncio.shield(ai_task), remaining)
+
+        if exp_keywords:
+            # Search for top 8 keywords found in expansion
+            if search_engine.is_ready:
+                exp_ids = search_engine.search(kind, " ".join(exp_keywords[:8]), category=category_name, match_all=False)
+                if exp_ids:
+                    stages.append(id_list_stage(exp_ids, STAGE_EXPANSION))
+            else:
+                exp_query = fulltext_query(exp_keywords[:8], match_all=False)
+                stages.append(fulltext_stage(model, exp_query, category_name, STAGE_EXPANSION))
+
+        if local_vector_index.is_ready:
+            nearest = local_vector_index.search(
+                kind, query_embedding, k=limit, category=category_name, max_distance=SEMANTIC_DISTANCE_THRESHOLD
+            )
+            if nearest:
+                stages.append(id_list_stage([doc_id for doc_id, _ in nearest], STAGE_SEMANTIC))
+        else:
+            stages.append(semantic_stage(model, query_embedding, category_name, limit, STAGE_SEMANTIC))
+            pgvector_stage = True
+    except asyncio.TimeoutError:
+        logger.warning(
+            f"Semantic search for {kind} '{q}' missed the {SEMANTIC_DEADLINE_SECONDS}s deadline, "
+            f"returning keyword results"
+        )
+        pending = ai_task
+    except Exception as e:
+        logger.warning(f"Semantic search for {kind} '{q}' failed, returning keyword results: {e}")
+
+    # 3. Ranked union -> page IDs + total, then hydrate only the requested page
+    if model_keys:
+        await apply_model_match_settings(db)
+    if pgvector_stage:
+        # is_published is covered by the partial HNSW index, only the category is a post-filter
+        await apply_search_settings_async(db, filtered=bool(category_name))
+    page_ids, total = await ranked_page(db, stages, limit, offset)
+    page = await load_page(db, model, page_ids)
+    return page, total, pending
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from apps.backend.app.core.text import fold_text
+from apps.backend.app.services.search_engine import KIND_MODELS, MAX_INDEX_AGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("LOCAL_VECTOR_INDEX", "true").lower() in ("1", "true", "yes")
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class _KindVectors:
+    """Unit-normalized float32 embedding matrix of one catalog table, row i belongs to ids[i]."""
+
+    def __init__(self, ids: List[UUID], categories: List[str], vectors: Optional[np.ndarray], dim: int = 0):
+        self.ids = ids
+        self.categories = np.array(categories, dtype=object)
+        if vectors is None or not len(ids):
+            self.matrix = np.zeros((0, dim), dtype=np.float32)
+        else:
+            self.matrix = np.ascontiguousarray(_normalize_rows(vectors.astype(np.float32, copy=False)))
+        self.positions: Dict[UUID, int] = {doc_id: i for i, doc_id in enumerate(ids)}
+
+    def upsert(self, doc_id: UUID, category: str, vector) -> None:
+        row = _normalize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+        position = self.positions.get(doc_id)
+        if position is not None:
+            self.matrix[position] = row[0]
+            self.categories[position] = category
+            return
+        if self.matrix.shape[0] == 0:
+            self.matrix = np.ascontiguousarray(row)
+        else:
+            self.matrix = np.vstack([self.matrix, row])
+        self.categories = np.append(self.categories, np.array([category], dtype=object))
+        self.positions[doc_id] = len(self.ids)
+        self.ids.append(doc_id)
+
+    def remove(self, doc_id: UUID) -> None:
+        position = self.positions.pop(doc_id, None)
+        if position is None:
+            return
+        # Move the last row into the hole so removal stays O(dim)
+        last = len(self.ids) - 1
+        if position != last:
+            moved = self.ids[last]
+            self.matrix[position] = self.matrix[last]
+            self.categories[position] = self.categories[last]
+            self.ids[position] = moved
+            self.positions[moved] = position
+        self.ids.pop()
+        self.matrix = self.matrix[:last]
+        self.categories = self.categories[:last]
+
+class LocalVectorIndex:
+    """
+    In-process exact cosine search over published product / spare part embeddings.
+    All vectors of a table live in one contiguous float32 matrix, so a query is one
+    matmul plus argpartition. Built like the keyword search engine: once at startup,
+    per item from the /reindex hooks, and fully when older than MAX_INDEX_AGE_SECONDS.
+    Semantic search falls back to pgvector while the index is not ready.
+    """
+
+    def __init__(self, max_age: int = MAX_INDEX_AGE_SECONDS, enabled: bool = ENABLED):
+        self.max_age = max_age
+        self.enabled = enabled
+        self._kinds: Dict[str, _KindVectors] = {}
+        self._lock = threading.RLock()
+        self._built_at: Optional[float] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self.enabled and self._built_at is not None
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.max_age
+
+    def rebuild(self, db: Session) -> None:
+        """Loads all published embeddings. Swaps matrices atomically."""
+        started = time.monotonic()
+        kinds = {}
+        for kind, model in KIND_MODELS.items():
+            rows = db.execute(
+                select(model.id, model.category, model.embedding)
+                .where(model.is_published == True, model.embedding.isnot(None))
+            ).all()
+            vectors = np.vstack([np.asarray(row.embedding, dtype=np.float32) for row in rows]) if rows else None
+            dim = model.embedding.type.dim or 0
+            kinds[kind] = _KindVectors(
+                [row.id for row in rows], [fold_text(row.category or "") for row in rows], vectors, dim
+            )
+
+        with self._lock:
+            self._kinds = kinds
+            self._built_at = time.monotonic()
+        logger.info(
+            f"Vector index rebuilt: {len(kinds['machines'].ids)} machines, "
+            f"{len(kinds['spares'].ids)} spares in {time.monotonic() - started:.2f}s"
+        )
+
+    def refresh(self, db: Session, kind: str, ids: Iterable[UUID]) -> None:
+        """Re-reads the given rows' embeddings. Unpublished, deleted or unembedded rows are dropped."""
+        if not self.is_ready:
+            return
+        ids = [UUID(str(i)) for i in ids]
+        if not ids:
+            return
+        model = KIND_MODELS[kind]
+        rows = db.execute(
+            select(model.id, model.category, model.embedding, model.is_published).where(model.id.in_(ids))
+        ).all()
+        found = {row.id: row for row in rows}
+
+        with self._lock:
+            vectors = self._kinds[kind]
+            for doc_id in ids:
+                row = found.get(doc_id)
+                if row is not None and row.is_published and row.embedding is not None:
+                    vectors.upsert(doc_id, fold_text(row.category or ""), row.embedding)
+                else:
+                    vectors.remove(doc_id)
+
+    def vector(self, kind: str, doc_id: UUID) -> Optional[np.ndarray]:
+        with self._lock:
+            vectors = self._kinds.get(kind)
+            position = vectors.positions.get(doc_id) if vectors else None
+            return None if position is None else vectors.matrix[position].copy()
+
+    def search(
+        self,
+        kind: str,
+        query,
+        k: Optional[int] = None,
+        category: Optional[str] = None,
+        max_distance: Optional[float] = None,
+    ) -> List[Tuple[UUID, float]]:
+        """
+        Top-k (id, cosine distance) pairs, nearest first, same distance as pgvector's <=>.
+        k=None returns every row.
+        """
+        q = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm == 0:
+            return []
+        q = q / norm
+
+        with self._lock:
+            vectors = self._kinds.get(kind)
+            if vectors is None or not vectors.ids:
+                return []
+            distances = 1.0 - vectors.matrix @ q
+            if category:
+                distances[vectors.categories != fold_text(category)] = np.inf
+            ids = vectors.ids
+
+            n = len(ids)
+            if k is None or k >= n:
+                top = np.argsort(distances)
+            else:
+                top = np.argpartition(distances, k)[:k]
+                top = top[np.argsort(distances[top])]
+            result = [(ids[i], float(distances[i])) for i in top]
+
+        limit = np.inf if max_distance is None else max_distance
+        return [(doc_id, d) for doc_id, d in result if d < limit]
+
+    def schedule_rebuild(self) -> None:
+        """Starts a background rebuild on the running loop unless one is already in flight."""
+        if not self.enabled:
+            return
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            return
+        self._rebuild_task = asyncio.get_running_loop().create_task(self._rebuild_in_background())
+
+    def ensure_fresh(self) -> None:
+        if self.is_stale:
+            self.schedule_rebuild()
+
+    async def _rebuild_in_background(self) -> None:
+        from apps.backend.app.core.database import SessionLocal
+
+        def run():
+            db = SessionLocal()
+            try:
+                self.rebuild(db)
+            finally:
+                db.close()
+
+        try:
+            await run_in_threadpool(run)
+        except Exception as e:
+            logger.error(f"Vector index rebuild failed: {e}")
+
+local_vector_index = LocalVectorIndex()
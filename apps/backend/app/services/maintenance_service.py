@@ -1,6 +1,7 @@
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import select, and_
 from packages.database.models import MachineInstance, TelegramUser, Notification, Client, Product
 from apps.backend.app.services.notification import notification_service
@@ -24,7 +25,9 @@ class MaintenanceService:
         
         # SQLAlchemy select with filter for next_maintenance_date
         # Note: Depending on DB timezones, date(target_date) is safer.
-        stmt = select(MachineInstance).where(
+        stmt = select(MachineInstance).options(
+            joinedload(MachineInstance.product), joinedload(MachineInstance.client)
+        ).where(
             func.date(MachineInstance.next_maintenance_date) == target_date.date()
         )
         
@@ -35,11 +38,19 @@ class MaintenanceService:
         instances = result.scalars().all()
         
         logger.info(f"Found {len(instances)} machines for maintenance on {target_date.date()}")
+
+        # Users of all affected clients in one query instead of one per machine
+        client_ids = {i.client_id for i in instances if i.client_id}
+        users_by_client = defaultdict(list)
+        if client_ids:
+            users = self.db.execute(select(TelegramUser).where(TelegramUser.client_id.in_(client_ids))).scalars().all()
+            for user in users:
+                users_by_client[user.client_id].append(user)
         
         for instance in instances:
-            await self._notify_maintenance(instance, days_ahead)
+            await self._notify_maintenance(instance, days_ahead, users_by_client.get(instance.client_id, []))
 
-    async def _notify_maintenance(self, instance: MachineInstance, days_ahead: int):
+    async def _notify_maintenance(self, instance: MachineInstance, days_ahead: int, users: list):
         """
         Create notifications for all users associated with the client.
         """
@@ -47,11 +58,6 @@ class MaintenanceService:
             logger.warning(f"Machine {instance.serial_number} has no client associated.")
             return
 
-        # Find users
-        stmt = select(TelegramUser).where(TelegramUser.client_id == instance.client_id)
-        result = self.db.execute(stmt)
-        users = result.scalars().all()
-        
         for user in users:
             message = (
                 f"🛠 *Плановое ТО*\n\n"
@@ -70,12 +76,7 @@ class MaintenanceService:
 
             # Publish to Redis for immediate bot notification and AmoCRM task creation
             # Try to get machine name if possible
-            machine_name = "Оборудование"
-            if instance.product_id:
-                product_stmt = select(Product).where(Product.id == instance.product_id)
-                product = self.db.execute(product_stmt).scalar_one_or_none()
-                if product:
-                    machine_name = product.name
+            machine_name = instance.product.name if instance.product else "Оборудование"
 
             payload = {
                 "tg_id": user.tg_id,
@@ -0,0 +1,37 @@
+import os
+from typing import List, Optional
+
+from sqlalchemy import func, literal, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# word_similarity a model_key must reach to match ('16к20' vs '16к21' is ~0.5)
+MODEL_MATCH_THRESHOLD = float(os.getenv("MODEL_MATCH_THRESHOLD", "0.5"))
+
+async def apply_model_match_settings(db: AsyncSession, threshold: float = MODEL_MATCH_THRESHOLD) -> None:
+    """Sets the %> threshold for the current transaction only."""
+    await db.execute(
+        text("SELECT set_config('pg_trgm.word_similarity_threshold', :value, true)"),
+        {"value": str(threshold)},
+    )
+
+def model_number_score(model, keys: List[str]):
+    """Best word_similarity of any query key within the row's model_key (1.0 = contained as is)."""
+    scores = [func.word_similarity(literal(key), model.model_key) for key in keys]
+    return scores[0] if len(scores) == 1 else func.greatest(*scores)
+
+def model_number_stage(model, keys: List[str], category_name: Optional[str], stage: int):
+    """
+    Ranked stage of rows whose model_key contains one of the keys or a near-miss
+    of it. `model_key %> key` is answered by the GIN trigram index; ties on the
+    score go to the closest whole-name match, so '16к20' ranks 16К20 above 16К20Т1.
+    """
+    score = model_number_score(model, keys)
+    closeness = func.greatest(*[func.similarity(model.model_key, literal(key)) for key in keys])
+    stmt = select(
+        model.id,
+        literal(stage).label("stage"),
+        func.row_number().over(order_by=(score.desc(), closeness.desc(), model.name)).label("rank"),
+    ).where(model.is_published == True).where(or_(*[model.model_key.op("%>")(key) for key in keys]))
+    if category_name:
+        stmt = stmt.where(model.category.ilike(category_name))
+    return stmt
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import redis
+import redis.asyncio as aioredis
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from apps.backend.app.core.config import settings
+from packages.database.models import MachineInstance, Product, ProductImage
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "passport"
+GENERATION_PREFIX = "passport:gen:"
+# Invalidation is event-driven, the TTL only bounds edits made outside the ORM (Directus, SQL)
+DEFAULT_TTL = int(os.getenv("PASSPORT_CACHE_TTL", str(60 * 60)))
+# Generations only have to outlive the slowest read that loaded a row before an invalidation
+GENERATION_TTL = 60 * 60 * 24
+_PENDING_KEY = "passport_invalidations"
+
+# Stores the entry only if no invalidation happened since its row was read
+_SET_IF_CURRENT_SCRIPT = """
+if (redis.call('get', KEYS[2]) or '0') == ARGV[2] then
+    redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+class PassportCache:
+    """
+    Read model of the digital passport (GET /catalog/instances/{serial}): the
+    serialized MachineInstanceSchema JSON, stored in Redis per serial number and
+    returned without re-validation.
+
+    Entries are dropped after any committed ORM change to a MachineInstance or to
+    the product (and its images) it points to, so the AmoCRM webhooks, the
+    integrations router and scripts all invalidate without calling this class.
+    Each invalidation also bumps the serial's generation; a read stores its entry
+    only under the generation it started with, so a row loaded before an
+    invalidation is never cached after it.
+    """
+
+    def __init__(self, redis_url: str = settings.REDIS_URL, ttl: int = DEFAULT_TTL):
+        self.redis = aioredis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+        # For commits made off the event loop (sync sessions in the threadpool, scripts)
+        self._sync_redis = redis.from_url(redis_url, decode_responses=True)
+        # Invalidations scheduled on the loop, referenced until they finish
+        self._tasks: Set[asyncio.Task] = set()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(serial_number: str) -> str:
+        return f"{KEY_PREFIX}:{serial_number}"
+
+    @staticmethod
+    def generation_key(serial_number: str) -> str:
+        return f"{GENERATION_PREFIX}{serial_number}"
+
+    async def get(self, serial_number: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        The cached payload and the serial's current generation, in one round trip.
+        On a miss, pass the generation to `set` once the row is loaded; it is None
+        when Redis is unavailable, and `set` then skips the write.
+        """
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(self.make_key(serial_number))
+            pipe.get(self.generation_key(serial_number))
+            payload, generation = await pipe.execute()
+        except Exception as e:
+            logger.error(f"Passport cache Redis error (Get): {e}")
+            self.misses += 1
+            return None, None
+        if payload is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload, generation or "0"
+
+    async def set(self, serial_number: str, payload: str, generation: Optional[str]) -> None:
+        """Stores the payload unless the serial was invalidated after `generation` was read."""
+        if generation is None:
+            return
+        try:
+            await self.redis.eval(
+                _SET_IF_CURRENT_SCRIPT, 2,
+                self.make_key(serial_number), self.generation_key(serial_number),
+                payload, generation, self.ttl,
+            )
+        except Exception as e:
+            logger.error(f"Passport cache Redis error (Set): {e}")
+
+    def invalidate(self, serial_numbers: Iterable[str]) -> None:
+        """
+        Drops the entries of the given serial numbers. Commit hooks also fire for
+        AsyncSession commits, on the event loop thread: there the delete is scheduled
+        on the async client instead of blocking the loop. Off the loop (threadpool,
+        scripts) it runs on the sync client.
+        """
+        serials = [s for s in set(serial_numbers) if s]
+        if not serials:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            task = loop.create_task(self._invalidate_async(serials))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return
+        try:
+            self._queue_invalidation(self._sync_redis.pipeline(transaction=False), serials).execute()
+            self.invalidations += len(serials)
+        except Exception as e:
+            logger.error(f"Passport cache Redis error (Invalidate): {e}")
+
+    async def _invalidate_async(self, serials: List[str]) -> None:
+        try:
+            await self._queue_invalidation(self.redis.pipeline(transaction=False), serials).execute()
+            self.invalidations += len(serials)
+        except Exception as e:
+            logger.error(f"Passport cache Redis error (Invalidate): {e}")
+
+    def _queue_invalidation(self, pipe, serials: List[str]):
+        """Bumps each serial's generation before deleting its entry, so in-flight reads cannot store it again."""
+        for serial in serials:
+            pipe.incr(self.generation_key(serial))
+            pipe.expire(self.generation_key(serial), GENERATION_TTL)
+        pipe.delete(*[self.make_key(s) for s in serials])
+        return pipe
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+        }
+
+passport_cache = PassportCache()
+
+@event.listens_for(Session, "after_flush")
+def _collect_passport_changes(session: Session, flush_context) -> None:
+    serials = session.info.setdefault(_PENDING_KEY, set())
+    product_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, MachineInstance):
+            serials.add(obj.serial_number)
+            # A renamed serial must also drop the entry under the old one
+            serials.update(inspect(obj).attrs.serial_number.history.deleted or ())
+        elif isinstance(obj, Product):
+            product_ids.add(obj.id)
+        elif isinstance(obj, ProductImage):
+            product_ids.add(obj.product_id)
+
+    product_ids.discard(None)
+    if product_ids:
+        rows = session.connection().execute(
+            select(MachineInstance.serial_number).where(MachineInstance.product_id.in_(product_ids))
+        )
+        serials.update(row.serial_number for row in rows)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_passports(session: Session) -> None:
+    serials = session.info.pop(_PENDING_KEY, None)
+    if serials:
+        passport_cache.invalidate(serials)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_passport_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,61 @@
+from typing import Dict, List, Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+from apps.backend.app.schemas import (
+    ProductListSchema, ProductMiniSchema, ProductSchema, SparePartListSchema, SparePartMiniSchema, SparePartSchema,
+)
+from packages.database.models import Product, SparePart
+
+# Columns read by the indexing paths (reindex hooks, embedding text). The embedding
+# itself is deferred on the models and only selected explicitly where it is needed.
+INTERNAL_COLUMNS = ("id", "name", "category", "description", "specs", "is_published")
+
+# Response schema per profile and model. "card" is the compact item nested in other
+# responses (compatible parts), "list" a search/listing row, "detail" the product page.
+PROFILE_SCHEMAS: Dict[str, Dict[type, Type[BaseModel]]] = {
+    "card": {Product: ProductMiniSchema, SparePart: SparePartMiniSchema},
+    "list": {Product: ProductListSchema, SparePart: SparePartListSchema},
+    "detail": {Product: ProductSchema, SparePart: SparePartSchema},
+}
+
+# Relationship serialized by the detail schemas, with the model on the other side
+_COMPATIBLE: Dict[type, Tuple[str, type]] = {
+    Product: ("compatible_parts", SparePart),
+    SparePart: ("compatible_products", Product),
+}
+
+def schema_columns(model, schema: Type[BaseModel]) -> List:
+    """Column attributes of `model` that `schema` reads; relationships and computed fields are left out."""
+    columns = inspect(model).column_attrs
+    return [getattr(model, key) for key in schema.model_fields if key in columns]
+
+def profile_columns(model, profile: str) -> List:
+    if profile == "internal":
+        return [getattr(model, key) for key in INTERNAL_COLUMNS]
+    return schema_columns(model, PROFILE_SCHEMAS[profile][model])
+
+def load_options(model, profile: str) -> list:
+    """
+    Loader options that fetch only the columns a profile serializes, plus the
+    relationships its schema reads, eagerly. An AsyncSession cannot lazy-load
+    during serialization, so every relationship the schema touches is covered.
+    """
+    options = [load_only(*profile_columns(model, profile))]
+    if profile == "internal":
+        return options
+
+    options.append(joinedload(model.images))
+    relation, related = _COMPATIBLE[model]
+    if relation not in PROFILE_SCHEMAS[profile][model].model_fields:
+        return options
+
+    options.append(
+        selectinload(getattr(model, relation)).options(
+            load_only(*profile_columns(related, "card")),
+            selectinload(related.images),
+        )
+    )
+    return options
@@ -0,0 +1,112 @@
+import logging
+from typing import Iterable, List, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from apps.backend.app.services.local_vector_index import local_vector_index
+from apps.backend.app.services.projections import load_options
+from apps.backend.app.services.vector_index import apply_search_settings
+from packages.database.models import MachineInstance, Product, ProductSpareRecommendation, SparePart
+
+logger = logging.getLogger(__name__)
+
+# Spares stored per product, also the size of the endpoint response
+RECOMMENDATION_DEPTH = 6
+
+def nearest_spares(db: Session, vector, k: int = RECOMMENDATION_DEPTH) -> List[Tuple[UUID, float]]:
+    """Nearest published spares to an embedding, from the in-process index when it is built."""
+    if local_vector_index.is_ready:
+        return local_vector_index.search("spares", vector, k=k)
+    distance_expr = SparePart.embedding.cosine_distance(vector).label("distance")
+    apply_search_settings(db)
+    rows = db.execute(
+        select(SparePart.id, distance_expr)
+        .where(SparePart.is_published == True, SparePart.embedding.isnot(None))
+        .order_by(distance_expr)
+        .limit(k)
+    ).all()
+    return [(row.id, float(row.distance)) for row in rows]
+
+def refresh_products(db: Session, product_ids: Iterable[UUID]) -> int:
+    """Recomputes and commits the stored top-K spares of the given products."""
+    product_ids = [UUID(str(i)) for i in product_ids]
+    if not product_ids:
+        return 0
+    rows = db.execute(select(Product.id, Product.embedding).where(Product.id.in_(product_ids))).all()
+
+    db.execute(delete(ProductSpareRecommendation).where(ProductSpareRecommendation.product_id.in_(product_ids)))
+    values = []
+    for row in rows:
+        if row.embedding is None:
+            continue
+        for rank, (spare_id, distance) in enumerate(nearest_spares(db, row.embedding), start=1):
+            values.append({"product_id": row.id, "rank": rank, "spare_part_id": spare_id, "distance": distance})
+    if values:
+        db.execute(insert(ProductSpareRecommendation), values)
+    db.commit()
+    return len(rows)
+
+def refresh_spares(db: Session, spare_ids: Iterable[UUID]) -> int:
+    """
+    Updates the table after spares changed. Only products whose top-K can change are
+    recomputed: those that list one of the spares now, and those the spare's new
+    embedding would enter (closer than their current K-th spare, or fewer than K stored).
+    """
+    spare_ids = [UUID(str(i)) for i in spare_ids]
+    if not spare_ids:
+        return 0
+
+    affected = set(db.execute(
+        select(ProductSpareRecommendation.product_id)
+        .where(ProductSpareRecommendation.spare_part_id.in_(spare_ids))
+        .distinct()
+    ).scalars().all())
+
+    spares = db.execute(
+        select(SparePart.embedding)
+        .where(SparePart.id.in_(spare_ids), SparePart.is_published == True, SparePart.embedding.isnot(None))
+    ).scalars().all()
+    if spares:
+        worst = (
+            select(
+                ProductSpareRecommendation.product_id,
+                func.max(ProductSpareRecommendation.distance).label("worst"),
+                func.count().label("stored"),
+            )
+            .group_by(ProductSpareRecommendation.product_id)
+            .subquery("worst")
+        )
+        for vector in spares:
+            affected.update(db.execute(
+                select(Product.id)
+                .outerjoin(worst, worst.c.product_id == Product.id)
+                .where(Product.embedding.isnot(None))
+                .where(or_(
+                    worst.c.stored.is_(None),
+                    worst.c.stored < RECOMMENDATION_DEPTH,
+                    Product.embedding.cosine_distance(vector) < worst.c.worst,
+                ))
+            ).scalars().all())
+
+    return refresh_products(db, affected)
+
+def rebuild_all(db: Session, chunk_size: int = 200) -> int:
+    """Fills the table for every product with an embedding."""
+    ids = db.execute(select(Product.id).where(Product.embedding.isnot(None)).order_by(Product.id)).scalars().all()
+    for i in range(0, len(ids), chunk_size):
+        refresh_products(db, ids[i:i + chunk_size])
+    return len(ids)
+
+def recommended_spares(db: Session, serial_number: str) -> List[SparePart]:
+    """Stored recommendations of a machine instance, with images, in one query."""
+    stmt = (
+        select(SparePart)
+        .join(ProductSpareRecommendation, ProductSpareRecommendation.spare_part_id == SparePart.id)
+        .join(MachineInstance, MachineInstance.product_id == ProductSpareRecommendation.product_id)
+        .where(MachineInstance.serial_number == serial_number, SparePart.is_published == True)
+        .options(*load_options(SparePart, "list"))
+        .order_by(ProductSpareRecommendation.rank)
+    )
+    return db.execute(stmt).unique().scalars().all()
@@ -0,0 +1,288 @@
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from apps.backend.app.core.text import fold_text, flatten_specs
+from packages.database.models import Product, SparePart
+
+logger = logging.getLogger(__name__)
+
+KIND_MODELS = {"machines": Product, "spares": SparePart}
+
+# Field weights: a hit in the name outranks a hit in the category or specs
+FIELD_WEIGHTS = {"name": 3.0, "category": 1.5, "specs": 1.0}
+
+# Match quality of a query token against an indexed token
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.8
+SUBSTRING_MATCH = 0.6
+FUZZY_WEIGHT = 0.5
+FUZZY_MIN_SIMILARITY = 0.3 # pg_trgm default similarity_threshold
+
+# Full rebuild interval, catches edits that bypass the /reindex hooks
+MAX_INDEX_AGE_SECONDS = 600
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into folded index tokens.
+    Model numbers typed with separators ('16К-20') also yield a compacted token ('16к20').
+    """
+    folded = fold_text(text)
+    tokens = [t for t in _TOKEN_RE.findall(folded) if len(t) > 1]
+    for chunk in folded.split():
+        parts = _TOKEN_RE.findall(chunk)
+        if len(parts) > 1:
+            compact = "".join(parts)
+            if any(c.isdigit() for c in compact):
+                tokens.append(compact)
+    return list(dict.fromkeys(tokens))
+
+def _index_grams(token: str) -> Set[str]:
+    grams = set()
+    for n in (2, 3):
+        grams.update(token[i:i + n] for i in range(len(token) - n + 1))
+    return grams
+
+def _query_grams(token: str) -> Set[str]:
+    if len(token) < 3:
+        return {token}
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+def _similarity(a: str, b: str) -> float:
+    """Trigram similarity with pg_trgm-style padding."""
+    ta = {f"  {a} "[i:i + 3] for i in range(len(a) + 1)}
+    tb = {f"  {b} "[i:i + 3] for i in range(len(b) + 1)}
+    return len(ta & tb) / len(ta | tb)
+
+class _KindIndex:
+    """Inverted token index plus gram -> token index for one catalog table."""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[UUID, float]] = defaultdict(dict)
+        self.grams: Dict[str, Set[str]] = defaultdict(set)
+        self.doc_tokens: Dict[UUID, Dict[str, float]] = {}
+        self.doc_category: Dict[UUID, str] = {}
+        self.doc_name: Dict[UUID, str] = {}
+
+    def add(self, doc_id: UUID, name: str, category: Optional[str], specs) -> None:
+        self.remove(doc_id)
+        weights: Dict[str, float] = {}
+        for field, text in (("name", name), ("category", category), ("specs", flatten_specs(specs))):
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text or ""):
+                if weights.get(token, 0) < weight:
+                    weights[token] = weight
+
+        for token, weight in weights.items():
+            if token not in self.postings:
+                for gram in _index_grams(token):
+                    self.grams[gram].add(token)
+            self.postings[token][doc_id] = weight
+
+        self.doc_tokens[doc_id] = weights
+        self.doc_category[doc_id] = fold_text(category or "")
+        self.doc_name[doc_id] = name or ""
+
+    def remove(self, doc_id: UUID) -> None:
+        weights = self.doc_tokens.pop(doc_id, None)
+        self.doc_category.pop(doc_id, None)
+        self.doc_name.pop(doc_id, None)
+        if not weights:
+            return
+        for token in weights:
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[token]
+                for gram in _index_grams(token):
+                    bucket = self.grams.get(gram)
+                    if bucket is not None:
+                        bucket.discard(token)
+                        if not bucket:
+                            del self.grams[gram]
+
+    def expand(self, query_token: str) -> Dict[str, float]:
+        """
+        Maps a query token to indexed tokens with a match quality:
+        exact, prefix or substring hits first, trigram near-misses only if there are none.
+        """
+        matches: Dict[str, float] = {}
+        if query_token in self.postings:
+            matches[query_token] = EXACT_MATCH
+
+        grams = _query_grams(query_token)
+        buckets = sorted((self.grams.get(g, set()) for g in grams), key=len)
+        candidates = set.intersection(*buckets) if buckets and buckets[0] else set()
+        for token in candidates:
+            if token != query_token and query_token in token:
+                matches[token] = PREFIX_MATCH if token.startswith(query_token) else SUBSTRING_MATCH
+
+        if not matches and len(query_token) >= 3:
+            shared: Dict[str, int] = defaultdict(int)
+            for gram in grams:
+                for token in self.grams.get(gram, ()):
+                    shared[token] += 1
+            min_shared = max(1, len(grams) // 2)
+            for token, count in shared.items():
+                if count < min_shared:
+                    continue
+                similarity = _similarity(query_token, token)
+                if similarity >= FUZZY_MIN_SIMILARITY:
+                    matches[token] = similarity * FUZZY_WEIGHT
+        return matches
+
+    def score_token(self, query_token: str) -> Dict[UUID, float]:
+        scores: Dict[UUID, float] = {}
+        for token, quality in self.expand(query_token).items():
+            for doc_id, weight in self.postings[token].items():
+                score = quality * weight
+                if scores.get(doc_id, 0) < score:
+                    scores[doc_id] = score
+        return scores
+
+class CatalogSearchEngine:
+    """
+    In-process keyword search over published products and spare parts.
+    Built from Postgres once, refreshed per item by the /reindex hooks and
+    rebuilt in the background when older than MAX_INDEX_AGE_SECONDS.
+    Returns ranked IDs only; hydration stays in the router.
+    """
+
+    def __init__(self, max_age: int = MAX_INDEX_AGE_SECONDS):
+        self.max_age = max_age
+        self._indexes: Dict[str, _KindIndex] = {}
+        self._lock = threading.RLock()
+        self._built_at: Optional[float] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._built_at is not None
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.max_age
+
+    def rebuild(self, db: Session) -> None:
+        """Full rebuild from the products/spare_parts tables. Swaps indexes atomically."""
+        started = time.monotonic()
+        indexes = {}
+        for kind, model in KIND_MODELS.items():
+            index = _KindIndex()
+            rows = db.execute(
+                select(model.id, model.name, model.category, model.specs).where(model.is_published == True)
+            ).all()
+            for row in rows:
+                index.add(row.id, row.name, row.category, row.specs)
+            indexes[kind] = index
+
+        with self._lock:
+            self._indexes = indexes
+            self._built_at = time.monotonic()
+        logger.info(
+            f"Search index rebuilt: {len(indexes['machines'].doc_tokens)} machines, "
+            f"{len(indexes['spares'].doc_tokens)} spares in {time.monotonic() - started:.2f}s"
+        )
+
+    def refresh(self, db: Session, kind: str, ids: Iterable[UUID]) -> None:
+        """Re-reads the given rows and updates the index in place. Unpublished or deleted rows are dropped."""
+        if not self.is_ready:
+            return
+        ids = [UUID(str(i)) for i in ids]
+        if not ids:
+            return
+        model = KIND_MODELS[kind]
+        rows = db.execute(
+            select(model.id, model.name, model.category, model.specs, model.is_published).where(model.id.in_(ids))
+        ).all()
+        found = {row.id: row for row in rows}
+
+        with self._lock:
+            index = self._indexes[kind]
+            for doc_id in ids:
+                row = found.get(doc_id)
+                if row is not None and row.is_published:
+                    index.add(row.id, row.name, row.category, row.specs)
+                else:
+                    index.remove(doc_id)
+
+    def search(
+        self,
+        kind: str,
+        query: str,
+        category: Optional[str] = None,
+        match_all: bool = True,
+    ) -> List[UUID]:
+        """
+        Ranks IDs of `kind` ('machines' or 'spares') for the query.
+        With match_all every query token must hit (like the old AND of ILIKEs),
+        otherwise any token is enough.
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+        category_key = fold_text(category) if category else None
+
+        with self._lock:
+            index = self._indexes.get(kind)
+            if index is None:
+                return []
+
+            totals: Dict[UUID, float] = defaultdict(float)
+            hits: Dict[UUID, int] = defaultdict(int)
+            for token in query_tokens:
+                for doc_id, score in index.score_token(token).items():
+                    totals[doc_id] += score
+                    hits[doc_id] += 1
+
+            ranked = []
+            for doc_id, score in totals.items():
+                if match_all and hits[doc_id] < len(query_tokens):
+                    continue
+                if category_key is not None and index.doc_category.get(doc_id) != category_key:
+                    continue
+                name = index.doc_name.get(doc_id, "")
+                ranked.append((-score, len(name), name, doc_id))
+
+        ranked.sort()
+        return [doc_id for _, _, _, doc_id in ranked]
+
+    def schedule_rebuild(self) -> None:
+        """Starts a background rebuild on the running loop unless one is already in flight."""
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            return
+        self._rebuild_task = asyncio.get_running_loop().create_task(self._rebuild_in_background())
+
+    def ensure_fresh(self) -> None:
+        if self.is_stale:
+            self.schedule_rebuild()
+
+    async def _rebuild_in_background(self) -> None:
+        from apps.backend.app.core.database import SessionLocal
+
+        def run():
+            db = SessionLocal()
+            try:
+                self.rebuild(db)
+            finally:
+                db.close()
+
+        try:
+            await run_in_threadpool(run)
+        except Exception as e:
+            logger.error(f"Search index rebuild failed: {e}")
+
+search_engine = CatalogSearchEngine()
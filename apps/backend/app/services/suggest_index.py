@@ -0,0 +1,363 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from apps.backend.app.core.text import model_key, model_number_keys, name_key
+from apps.backend.app.services.search_engine import KIND_MODELS, MAX_INDEX_AGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Completion weights: the start of a name beats a model number inside it, which
+# beats a later word of the name; categories rank by how many items they hold
+NAME_WEIGHT = 3.0
+MODEL_NUMBER_WEIGHT = 2.5
+INNER_WORD_WEIGHT = 2.0
+CATEGORY_WEIGHT = 1.5
+
+# Shorter prefixes match too much of the catalog to be useful
+MIN_PREFIX_LENGTH = 2
+# Prefixes up to this length match a large share of the keys; their best completions
+# are ranked when the index is built instead of per keystroke. Longer prefixes scan
+# their whole (short) key range.
+TOP_PREFIX_LENGTH = 3
+# Completions kept per precomputed prefix and kind, the largest limit they can serve
+TOP_PER_PREFIX = 20
+# Completed prefixes kept between keystrokes (users share the first letters)
+RESULT_CACHE_SIZE = 2048
+
+@dataclass(frozen=True)
+class Suggestion:
+    text: str
+    kind: str # "machines", "spares" or "category"
+    id: Optional[str] = None
+    slug: Optional[str] = None
+
+def _completion_keys(name: str) -> List[Tuple[str, float]]:
+    """
+    Prefix keys for one name: the whole folded name, every later word onward
+    (so '16к' completes 'Станок 16К20') and compacted model numbers
+    (so '16к-2' and '16k2' complete it as well).
+    """
+    key = name_key(name)
+    if not key:
+        return []
+    keys = [(key, NAME_WEIGHT)]
+    words = key.split(" ")
+    for i in range(1, len(words)):
+        keys.append((" ".join(words[i:]), INNER_WORD_WEIGHT))
+    for number in model_number_keys(name):
+        keys.append((number, MODEL_NUMBER_WEIGHT))
+    return keys
+
+def _category_weight(count: int) -> float:
+    # Bigger categories first, always below a name hit
+    return CATEGORY_WEIGHT + min(count, 1000) / 1000
+
+def _short_prefixes(key: str) -> List[str]:
+    return [key[:n] for n in range(MIN_PREFIX_LENGTH, min(len(key), TOP_PREFIX_LENGTH) + 1)]
+
+class _SortedKeys:
+    """Folded keys in sorted order with a weight and a suggestion reference per key."""
+
+    def __init__(self, entries: List[Tuple[str, float, int]]):
+        entries.sort(key=lambda entry: entry[0])
+        self.keys = [key for key, _, _ in entries]
+        self.weights = [weight for _, weight, _ in entries]
+        self.refs = [ref for _, _, ref in entries]
+
+    def insert(self, key: str, weight: float, ref: int) -> None:
+        i = bisect.bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.weights.insert(i, weight)
+        self.refs.insert(i, ref)
+
+    def remove(self, key: str, ref: int) -> None:
+        """Removes one entry of `ref` under `key`."""
+        keys = self.keys
+        i = bisect.bisect_left(keys, key)
+        while i < len(keys) and keys[i] == key:
+            if self.refs[i] == ref:
+                del keys[i], self.weights[i], self.refs[i]
+                return
+            i += 1
+
+    def scan(self, prefix: str, best: Dict[int, float]) -> None:
+        """Keeps the best score per reference over the keys starting with `prefix`."""
+        keys, weights, refs = self.keys, self.weights, self.refs
+        for i in range(bisect.bisect_left(keys, prefix), len(keys)):
+            key = keys[i]
+            if not key.startswith(prefix):
+                break
+            # Exact key matches rank above longer completions of the same weight
+            score = weights[i] + 0.5 if key == prefix else weights[i]
+            ref = refs[i]
+            if best.get(ref, 0) < score:
+                best[ref] = score
+
+@dataclass
+class _Arrays:
+    names: _SortedKeys
+    categories: _SortedKeys
+    # Indexed by reference; entries of removed items are None until the next rebuild
+    suggestions: List[Optional[Suggestion]]
+    # (kind, id) of an item or ("category", name) -> reference
+    refs: Dict[tuple, int]
+    category_counts: Counter
+    # Short prefix -> its best (reference, score) pairs, TOP_PER_PREFIX per kind
+    top: Dict[str, List[Tuple[int, float]]]
+
+    def rank(self, best: Dict[int, float]) -> List[Tuple[int, float]]:
+        suggestions = self.suggestions
+        return sorted(best.items(), key=lambda item: (-item[1], len(suggestions[item[0]].text), suggestions[item[0]].text))
+
+    def rank_prefix(self, prefix: str) -> List[Tuple[int, float]]:
+        """
+        The prefix's completions in rank order, cut to TOP_PER_PREFIX per kind: every
+        kind filter and every limit up to TOP_PER_PREFIX is served from the cut list.
+        """
+        best: Dict[int, float] = {}
+        self.names.scan(prefix, best)
+        self.categories.scan(prefix, best)
+        kept, per_kind = [], Counter()
+        for ref, score in self.rank(best):
+            kind = self.suggestions[ref].kind
+            if per_kind[kind] < TOP_PER_PREFIX:
+                per_kind[kind] += 1
+                kept.append((ref, score))
+        return kept
+
+    def update_top(self, keys: Iterable[str]) -> None:
+        for prefix in {p for key in keys for p in _short_prefixes(key)}:
+            ranked = self.rank_prefix(prefix)
+            if ranked:
+                self.top[prefix] = ranked
+            else:
+                self.top.pop(prefix, None)
+
+    def add_item(self, kind: str, doc_id: UUID, doc: Tuple[str, Optional[str], Optional[str]]) -> List[str]:
+        """Adds one item's keys and counts its category; returns the keys touched."""
+        name, category, slug = doc
+        ref = len(self.suggestions)
+        self.suggestions.append(Suggestion(text=name, kind=kind, id=str(doc_id), slug=slug))
+        self.refs[(kind, doc_id)] = ref
+        touched = []
+        for key, weight in _completion_keys(name):
+            self.names.insert(key, weight, ref)
+            touched.append(key)
+        if category:
+            touched.extend(self._count_category(category, 1))
+        return touched
+
+    def remove_item(self, kind: str, doc_id: UUID, doc: Tuple[str, Optional[str], Optional[str]]) -> List[str]:
+        """Removes the keys `add_item` added for the same item; returns the keys touched."""
+        name, category, _ = doc
+        ref = self.refs.pop((kind, doc_id))
+        self.suggestions[ref] = None
+        touched = []
+        for key, _ in _completion_keys(name):
+            self.names.remove(key, ref)
+            touched.append(key)
+        if category:
+            touched.extend(self._count_category(category, -1))
+        return touched
+
+    def _count_category(self, category: str, delta: int) -> List[str]:
+        count = self.category_counts[category] + delta
+        if count > 0:
+            self.category_counts[category] = count
+        else:
+            del self.category_counts[category]
+        key = name_key(category)
+        if not key:
+            return []
+        ref = self.refs.get(("category", category))
+        if ref is not None:
+            self.categories.remove(key, ref)
+        if count > 0:
+            if ref is None:
+                ref = self.refs[("category", category)] = len(self.suggestions)
+                self.suggestions.append(Suggestion(text=category, kind="category"))
+            self.categories.insert(key, _category_weight(count), ref)
+        elif ref is not None:
+            del self.refs[("category", category)]
+            self.suggestions[ref] = None
+        return [key]
+
+class SuggestIndex:
+    """
+    In-memory typeahead over published product and spare part names, their model
+    numbers and category names. A sorted array of folded keys is searched by
+    bisection, and the best completions of short prefixes are ranked ahead of time,
+    so a keystroke never touches Postgres or the AI service.
+    Rebuilt from Postgres like the search engine, updated per item by the
+    /reindex hooks.
+    """
+
+    def __init__(self, max_age: int = MAX_INDEX_AGE_SECONDS):
+        self.max_age = max_age
+        # (kind, id) -> (name, category, slug)
+        self._docs: Dict[Tuple[str, UUID], Tuple[str, Optional[str], Optional[str]]] = {}
+        self._arrays = self._compile({})
+        # Completed prefixes, dropped whenever the arrays change
+        self._results: "OrderedDict[tuple, List[Suggestion]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._built_at: Optional[float] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._built_at is not None
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.max_age
+
+    def _compile(self, docs) -> _Arrays:
+        names, categories = [], []
+        counts: Counter = Counter()
+        suggestions: List[Optional[Suggestion]] = []
+        refs: Dict[tuple, int] = {}
+        for (kind, doc_id), (name, category, slug) in docs.items():
+            ref = refs[(kind, doc_id)] = len(suggestions)
+            suggestions.append(Suggestion(text=name, kind=kind, id=str(doc_id), slug=slug))
+            for key, weight in _completion_keys(name):
+                names.append((key, weight, ref))
+            if category:
+                counts[category] += 1
+
+        for category, count in counts.items():
+            key = name_key(category)
+            if key:
+                ref = refs[("category", category)] = len(suggestions)
+                suggestions.append(Suggestion(text=category, kind="category"))
+                categories.append((key, _category_weight(count), ref))
+
+        arrays = _Arrays(_SortedKeys(names), _SortedKeys(categories), suggestions, refs, counts, {})
+        arrays.update_top(arrays.names.keys + arrays.categories.keys)
+        return arrays
+
+    def rebuild(self, db: Session) -> None:
+        """Full rebuild from the products/spare_parts tables. Swaps arrays atomically."""
+        started = time.monotonic()
+        docs = {}
+        for kind, model in KIND_MODELS.items():
+            rows = db.execute(
+                select(model.id, model.name, model.category, model.slug).where(model.is_published == True)
+            ).all()
+            for row in rows:
+                docs[(kind, row.id)] = (row.name, row.category, row.slug)
+
+        arrays = self._compile(docs)
+        with self._lock:
+            self._docs, self._arrays = docs, arrays
+            self._results.clear()
+            self._built_at = time.monotonic()
+        logger.info(
+            f"Suggest index rebuilt: {len(docs)} items, {len(arrays.names.keys)} keys in {time.monotonic() - started:.2f}s"
+        )
+
+    def refresh(self, db: Session, kind: str, ids: Iterable[UUID]) -> None:
+        """
+        Re-reads the given rows and replaces only their keys, re-ranking the short
+        prefixes those keys fall under. Unpublished or deleted rows are dropped.
+        """
+        if not self.is_ready:
+            return
+        ids = [UUID(str(i)) for i in ids]
+        if not ids:
+            return
+        model = KIND_MODELS[kind]
+        rows = db.execute(
+            select(model.id, model.name, model.category, model.slug, model.is_published).where(model.id.in_(ids))
+        ).all()
+        found = {row.id: row for row in rows}
+
+        with self._lock:
+            arrays = self._arrays
+            touched: List[str] = []
+            for doc_id in ids:
+                old = self._docs.pop((kind, doc_id), None)
+                if old is not None:
+                    touched.extend(arrays.remove_item(kind, doc_id, old))
+                row = found.get(doc_id)
+                if row is not None and row.is_published:
+                    doc = self._docs[(kind, doc_id)] = (row.name, row.category, row.slug)
+                    touched.extend(arrays.add_item(kind, doc_id, doc))
+            arrays.update_top(touched)
+            self._results.clear()
+
+    def suggest(self, prefix: str, limit: int = 8, kind: Optional[str] = None) -> List[Suggestion]:
+        """
+        Top `limit` completions of `prefix` by weight, optionally of one kind
+        (categories are always included). Each item is suggested once.
+        """
+        key = name_key(prefix)
+        if len(key) < MIN_PREFIX_LENGTH:
+            return []
+        # A model number typed with separators ('16к-2') is looked up compacted as well
+        compact = model_key(prefix)
+        prefixes = {key, compact} if len(compact) >= MIN_PREFIX_LENGTH else {key}
+
+        cache_key = (key, compact, kind, limit)
+        with self._lock:
+            cached = self._results.get(cache_key)
+            if cached is not None:
+                self._results.move_to_end(cache_key)
+                return cached
+
+            arrays = self._arrays
+            best: Dict[int, float] = {}
+            for p in prefixes:
+                if len(p) <= TOP_PREFIX_LENGTH and limit <= TOP_PER_PREFIX:
+                    for ref, score in arrays.top.get(p, ()):
+                        if best.get(ref, 0) < score:
+                            best[ref] = score
+                else:
+                    arrays.names.scan(p, best)
+                    arrays.categories.scan(p, best)
+            suggestions = arrays.suggestions
+            if kind:
+                best = {ref: score for ref, score in best.items() if suggestions[ref].kind in (kind, "category")}
+            result = [suggestions[ref] for ref, _ in arrays.rank(best)[:limit]]
+
+            self._results[cache_key] = result
+            if len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        return result
+
+    def schedule_rebuild(self) -> None:
+        """Starts a background rebuild on the running loop unless one is already in flight."""
+        if self._rebuild_task is not None and not self._rebuild_task.done():
+            return
+        self._rebuild_task = asyncio.get_running_loop().create_task(self._rebuild_in_background())
+
+    def ensure_fresh(self) -> None:
+        if self.is_stale:
+            self.schedule_rebuild()
+
+    async def _rebuild_in_background(self) -> None:
+        from apps.backend.app.core.database import SessionLocal
+
+        def run():
+            db = SessionLocal()
+            try:
+                self.rebuild(db)
+            finally:
+                db.close()
+
+        try:
+            await run_in_threadpool(run)
+        except Exception as e:
+            logger.error(f"Suggest index rebuild failed: {e}")
+
+suggest_index = SuggestIndex()
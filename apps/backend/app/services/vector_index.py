@@ -0,0 +1,105 @@
+import logging
+import os
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# HNSW candidate list size. pgvector's default (40) loses recall once a filter
+# discards part of the candidates, so filtered queries get a wider list.
+EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "64"))
+EF_SEARCH_FILTERED = int(os.getenv("VECTOR_EF_SEARCH_FILTERED", "200"))
+# IVFFlat lists probed, only used if an index is switched back to IVFFlat
+IVFFLAT_PROBES = int(os.getenv("VECTOR_IVFFLAT_PROBES", "10"))
+# Upper bound on tuples visited by an iterative scan (pgvector >= 0.8)
+MAX_SCAN_TUPLES = int(os.getenv("VECTOR_MAX_SCAN_TUPLES", "20000"))
+
+# ANN indexes managed by the migrations, checked by `index_status`
+INDEXES: Dict[str, str] = {
+    "products": "idx_products_embedding_hnsw",
+    "spare_parts": "idx_spare_parts_embedding_hnsw",
+}
+
+_pgvector_version: Optional[tuple] = None
+_VERSION_SQL = text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+_SET_CONFIG_SQL = text("SELECT set_config(:name, :value, true)")
+
+def _parse_version(raw: Optional[str]) -> tuple:
+    return tuple(int(p) for p in (raw or "0").split(".") if p.isdigit())
+
+def pgvector_version(db: Session) -> tuple:
+    """Installed pgvector version, queried once per process."""
+    global _pgvector_version
+    if _pgvector_version is None:
+        _pgvector_version = _parse_version(db.execute(_VERSION_SQL).scalar())
+    return _pgvector_version
+
+async def pgvector_version_async(db: AsyncSession) -> tuple:
+    global _pgvector_version
+    if _pgvector_version is None:
+        _pgvector_version = _parse_version((await db.execute(_VERSION_SQL)).scalar())
+    return _pgvector_version
+
+def _search_settings(version: tuple, filtered: bool, ef_search: Optional[int], probes: Optional[int]) -> Dict[str, str]:
+    settings = {
+        "hnsw.ef_search": ef_search or (EF_SEARCH_FILTERED if filtered else EF_SEARCH),
+        "ivfflat.probes": probes or IVFFLAT_PROBES,
+    }
+    if filtered and version >= (0, 8):
+        settings["hnsw.iterative_scan"] = "relaxed_order"
+        settings["hnsw.max_scan_tuples"] = MAX_SCAN_TUPLES
+    return {name: str(value) for name, value in settings.items()}
+
+def apply_search_settings(
+    db: Session,
+    filtered: bool = False,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> None:
+    """
+    Sets the ANN search parameters for the current transaction only (SET LOCAL),
+    so pooled connections never leak them to other requests.
+
+    With pgvector >= 0.8 filtered queries use an iterative index scan: the index
+    keeps producing candidates until LIMIT rows pass the is_published/category
+    filters, instead of returning fewer rows or falling back to an exact scan.
+    """
+    version = pgvector_version(db) if filtered else ()
+    for name, value in _search_settings(version, filtered, ef_search, probes).items():
+        db.execute(_SET_CONFIG_SQL, {"name": name, "value": value})
+
+async def apply_search_settings_async(
+    db: AsyncSession,
+    filtered: bool = False,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> None:
+    """`apply_search_settings` for an AsyncSession."""
+    version = await pgvector_version_async(db) if filtered else ()
+    for name, value in _search_settings(version, filtered, ef_search, probes).items():
+        await db.execute(_SET_CONFIG_SQL, {"name": name, "value": value})
+
+def index_status(db: Session) -> List[Dict[str, object]]:
+    """Managed ANN indexes with their definition and size; missing ones are reported too."""
+    rows = db.execute(
+        text(
+            "SELECT tablename, indexname, indexdef, pg_relation_size(quote_ident(indexname)::regclass) AS size "
+            "FROM pg_indexes WHERE indexname = ANY(:names)"
+        ),
+        {"names": list(INDEXES.values())},
+    ).all()
+    found = {row.indexname: row for row in rows}
+    status = []
+    for table, name in INDEXES.items():
+        row = found.get(name)
+        status.append({
+            "table": table,
+            "index": name,
+            "present": row is not None,
+            "definition": row.indexdef if row else None,
+            "size_bytes": row.size if row else 0,
+        })
+    return status
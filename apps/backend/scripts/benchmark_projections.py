@@ -0,0 +1,91 @@
+import argparse
+import logging
+import sys
+import os
+import time
+import tracemalloc
+from sqlalchemy import func, select
+from sqlalchemy.orm import load_only, undefer
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Ensure apps module is found
+sys.path.append(os.getcwd())
+
+from apps.backend.app.core.database import SessionLocal
+from apps.backend.app.services.projections import profile_columns
+from packages.database.models import Product, SparePart
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODELS = {"machines": Product, "spares": SparePart}
+PROFILES = ["full", "detail", "list", "card", "internal"]
+
+def columns_for(model, profile: str) -> list:
+    if profile == "full":
+        return [getattr(model, c.key) for c in model.__table__.columns]
+    return profile_columns(model, profile)
+
+def bytes_per_row(db, model, columns: list, ids: list) -> float:
+    """Average stored size of the selected columns (pg_column_size), close to what goes over the wire."""
+    size = sum(func.coalesce(func.pg_column_size(c), 0) for c in columns)
+    return float(db.execute(select(func.avg(size)).where(model.id.in_(ids))).scalar() or 0)
+
+def load_rows(db, model, profile: str, ids: list):
+    """Loads the rows as ORM objects with the profile's columns; returns (seconds, peak bytes allocated)."""
+    if profile == "full":
+        option = undefer(model.embedding)
+    else:
+        option = load_only(*columns_for(model, profile))
+    db.expunge_all()
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = db.execute(select(model).options(option).where(model.id.in_(ids))).scalars().all()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.rollback()
+    return len(rows), elapsed, peak
+
+def benchmark(kind: str, rows: int, repeats: int):
+    """
+    Bytes per row and ORM load cost of each projection profile, against loading
+    every column including the embedding (what select(Model) did before deferral).
+    """
+    model = MODELS[kind]
+    db = SessionLocal()
+    try:
+        ids = db.execute(select(model.id).where(model.is_published == True).order_by(func.random()).limit(rows)).scalars().all()
+        if not ids:
+            logger.error(f"No published {kind} to benchmark.")
+            return
+
+        print(f"\n{kind}: {len(ids)} rows, best of {repeats}")
+        print(f"{'profile':>9} | {'columns':>7} | {'bytes/row':>9} | {'saved':>6} | {'load ms':>8} | {'alloc KiB':>9}")
+        print("-" * 64)
+        baseline = None
+        for profile in PROFILES:
+            columns = columns_for(model, profile)
+            size = bytes_per_row(db, model, columns, ids)
+            baseline = baseline or size
+            timings = [load_rows(db, model, profile, ids) for _ in range(repeats)]
+            best = min(t[1] for t in timings)
+            peak = min(t[2] for t in timings)
+            saved = 1 - size / baseline if baseline else 0.0
+            print(
+                f"{profile:>9} | {len(columns):>7} | {size:>9.0f} | {saved:>6.0%} | "
+                f"{best * 1000:>8.2f} | {peak / 1024:>9.0f}"
+            )
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bytes per row and load cost of the catalog projection profiles.")
+    parser.add_argument("--kind", choices=sorted(MODELS), default="machines")
+    parser.add_argument("--rows", type=int, default=200, help="Number of sampled rows")
+    parser.add_argument("--repeats", type=int, default=5, help="Load repetitions per profile")
+    args = parser.parse_args()
+    benchmark(args.kind, args.rows, args.repeats)
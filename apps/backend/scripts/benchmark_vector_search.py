@@ -0,0 +1,105 @@
+import argparse
+import logging
+import statistics
+import sys
+import os
+import time
+from sqlalchemy import func, select, text
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Ensure apps module is found
+sys.path.append(os.getcwd())
+
+from apps.backend.app.core.database import SessionLocal
+from apps.backend.app.services.vector_index import apply_search_settings, index_status
+from packages.database.models import Product, SparePart
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODELS = {"machines": Product, "spares": SparePart}
+
+def top_k(db, model, vector, k: int, category, exact: bool, ef_search: int):
+    """One nearest-neighbour query in its own transaction; returns (ids, seconds)."""
+    distance = model.embedding.cosine_distance(vector)
+    stmt = select(model.id).where(model.is_published == True)
+    if category:
+        stmt = stmt.where(model.category.ilike(category))
+    stmt = stmt.order_by(distance).limit(k)
+
+    if exact:
+        # Ground truth: forbid index scans so Postgres computes every distance
+        db.execute(text("SET LOCAL enable_indexscan = off"))
+    else:
+        apply_search_settings(db, filtered=bool(category), ef_search=ef_search)
+    started = time.perf_counter()
+    ids = db.execute(stmt).scalars().all()
+    elapsed = time.perf_counter() - started
+    db.rollback()
+    return ids, elapsed
+
+def benchmark(kind: str, queries: int, k: int, ef_values: list, by_category: bool):
+    """
+    Recall@k and latency of the HNSW path against an exact scan, for each ef_search.
+    Query vectors are embeddings of random catalog rows, so no API calls are made.
+    """
+    model = MODELS[kind]
+    db = SessionLocal()
+    try:
+        for status in index_status(db):
+            state = f"{status['size_bytes'] / 1024:.0f} KiB" if status["present"] else "MISSING"
+            logger.info(f"Index {status['index']} on {status['table']}: {state}")
+
+        sample = db.execute(
+            select(model.embedding, model.category)
+            .where(model.embedding.isnot(None), model.is_published == True)
+            .order_by(func.random())
+            .limit(queries)
+        ).all()
+        db.rollback()
+        if not sample:
+            logger.error(f"No published {kind} with embeddings to benchmark.")
+            return
+
+        truth = []
+        exact_times = []
+        for vector, category in sample:
+            ids, elapsed = top_k(db, model, vector, k, category if by_category else None, True, 0)
+            truth.append(set(ids))
+            exact_times.append(elapsed)
+
+        print(f"\n{kind}: {len(sample)} queries, k={k}, category filter={'on' if by_category else 'off'}")
+        print(f"{'mode':>12} | {'recall@k':>8} | {'p50 ms':>8} | {'p95 ms':>8}")
+        print("-" * 46)
+        print(f"{'exact':>12} | {1.0:>8.3f} | {_ms(exact_times, 50):>8.2f} | {_ms(exact_times, 95):>8.2f}")
+
+        for ef in ef_values:
+            recalls = []
+            times = []
+            for (vector, category), expected in zip(sample, truth):
+                ids, elapsed = top_k(db, model, vector, k, category if by_category else None, False, ef)
+                times.append(elapsed)
+                if expected:
+                    recalls.append(len(expected.intersection(ids)) / len(expected))
+            recall = statistics.mean(recalls) if recalls else 0.0
+            print(f"{'ef=' + str(ef):>12} | {recall:>8.3f} | {_ms(times, 50):>8.2f} | {_ms(times, 95):>8.2f}")
+    finally:
+        db.close()
+
+def _ms(samples: list, percentile: int) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+    return ordered[index] * 1000
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall vs latency of the pgvector ANN indexes.")
+    parser.add_argument("--kind", choices=sorted(MODELS), default="machines")
+    parser.add_argument("--queries", type=int, default=100, help="Number of sampled query vectors")
+    parser.add_argument("-k", type=int, default=12, help="Neighbours per query")
+    parser.add_argument("--ef", type=int, action="append", help="ef_search value to test (repeatable)")
+    parser.add_argument("--category", action="store_true", help="Filter each query by its row's category")
+    args = parser.parse_args()
+    benchmark(args.kind, args.queries, args.k, args.ef or [20, 40, 64, 100, 200], args.category)
@@ -0,0 +1,88 @@
+import argparse
+import logging
+import sys
+import os
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Ensure apps module is found
+sys.path.append(os.getcwd())
+
+from apps.backend.app.core.database import SessionLocal
+from apps.backend.services.expansion_dictionary import MAX_TERMS, catalog_vocabulary, terms
+from packages.database.models import QueryExpansion, SearchSynonym
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def harvest(expansion: str, query: str, vocabulary) -> list:
+    """
+    Terms of an LLM expansion worth keeping as synonyms: the query itself and
+    terms with a word the catalog does not contain (typo variants, generic words)
+    would never match anything, so they are dropped.
+    """
+    kept = []
+    for term in expansion.split(","):
+        words = terms(term)
+        phrase = " ".join(words)
+        if not words or phrase == query or not all(w in vocabulary for w in words):
+            continue
+        kept.append(phrase)
+    return list(dict.fromkeys(kept))[:MAX_TERMS]
+
+def build_search_synonyms(min_hits: int, dry_run: bool):
+    """
+    Harvests the synonym table of the local expansion dictionary from the LLM
+    expansions warmed into query_expansions (see warm_query_expansions.py).
+    Workers pick the table up on their next start.
+    """
+    db = SessionLocal()
+    try:
+        vocabulary = catalog_vocabulary(db)
+        logger.info(f"Catalog vocabulary: {len(vocabulary)} words.")
+
+        rows = db.execute(
+            select(QueryExpansion.query_key, QueryExpansion.expansion, QueryExpansion.hits)
+            .where(QueryExpansion.hits >= min_hits)
+        ).all()
+        written = 0
+        for row in rows:
+            term = " ".join(terms(row.query_key))
+            if not term:
+                continue
+            synonyms = harvest(row.expansion, term, vocabulary)
+            if not synonyms:
+                continue
+            logger.info(f"'{term}' -> {synonyms}")
+            written += 1
+            if dry_run:
+                continue
+            stmt = insert(SearchSynonym).values(term=term, synonyms=synonyms, source="llm", hits=row.hits or 0)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[SearchSynonym.term],
+                set_={"synonyms": stmt.excluded.synonyms, "hits": stmt.excluded.hits},
+                # Hand-curated entries are never overwritten by harvested ones
+                where=SearchSynonym.source == "llm",
+            )
+            db.execute(stmt)
+
+        if not dry_run:
+            db.commit()
+        logger.info(f"{len(rows)} expansions read, {written} synonym entries {'found' if dry_run else 'written'}.")
+
+    except Exception as e:
+        logger.error(f"Error in build_search_synonyms: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Harvest the search synonym table from past LLM query expansions.")
+    parser.add_argument("--min-hits", type=int, default=0, help="Only harvest queries requested at least this often")
+    parser.add_argument("--dry-run", action="store_true", help="Print the entries without writing them")
+    args = parser.parse_args()
+    build_search_synonyms(args.min_hits, args.dry_run)
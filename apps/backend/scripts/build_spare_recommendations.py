@@ -0,0 +1,38 @@
+import logging
+import sys
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Ensure apps module is found
+sys.path.append(os.getcwd())
+
+from apps.backend.app.core.database import SessionLocal
+from apps.backend.app.services.local_vector_index import local_vector_index
+from apps.backend.app.services.recommendations import rebuild_all
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def build_spare_recommendations():
+    """
+    Fills product_spare_recommendations for every product with an embedding.
+    Run once after the migration and after bulk embedding changes;
+    the /reindex hooks keep it current afterwards.
+    """
+    db = SessionLocal()
+    try:
+        if local_vector_index.enabled:
+            local_vector_index.rebuild(db)
+        count = rebuild_all(db)
+        logger.info(f"Stored spare recommendations for {count} products.")
+    except Exception as e:
+        logger.error(f"Error in build_spare_recommendations: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    build_spare_recommendations()
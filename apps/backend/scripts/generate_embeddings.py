@@ -1,9 +1,11 @@
+import argparse
 import asyncio
+import json
 import logging
 import sys
 import os
-from sqlalchemy import select
-from tqdm.asyncio import tqdm
+from sqlalchemy import select, text
+from tqdm import tqdm
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -15,54 +17,125 @@ sys.path.append(os.getcwd())
 from apps.backend.app.core.database import SessionLocal
 from packages.database.models import Product, SparePart
 from apps.backend.services.ai_service import AIService
+from apps.backend.services.circuit_breaker import BULKHEAD_LIMITS
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def process_batch(db, ai_service, items, model_name):
-    if not items:
-        logger.info(f"No {model_name} found without embeddings.")
-        return
-
-    logger.info(f"Found {len(items)} {model_name} to process.")
-    
-    for item in tqdm(items, desc=f"Generating {model_name} Embeddings"):
-        # Construct text representation
-        specs = item.specs or {}
-        if isinstance(specs, list):
-            # Handle Directus repeater format [{key: ..., value: ...}]
-            specs_str = ", ".join([f"{s.get('key')}: {s.get('value')}" for s in specs if isinstance(s, dict)])
-        else:
-            specs_str = ", ".join([f"{k}: {v}" for k, v in specs.items()])
-            
-        text_to_embed = f"{item.name} Category: {getattr(item, 'category', 'N/A')}. Specs: {specs_str}. {getattr(item, 'description', '')}"
-        
-        try:
-            embedding = await ai_service.get_embedding(text_to_embed)
-            item.embedding = embedding
-        except Exception as e:
-            logger.error(f"Failed to generate embedding for {item.name}: {e}")
-            continue
-    
-    db.commit()
-
-async def generate_embeddings():
+# Inputs per embeddings API call
+BATCH_SIZE = 64
+# Rows embedded and written back per committed chunk
+CHUNK_SIZE = 512
+# Embedding requests in flight at once, at most the embedding bulkhead limit
+CONCURRENCY = 4
+# Seconds a batch queues for an embedding slot before it is given up for the next run
+SLOT_WAIT_SECONDS = 120
+CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embeddings_checkpoint.json")
+
+def build_text(item) -> str:
+    # Construct text representation
+    specs = item.specs or {}
+    if isinstance(specs, list):
+        # Handle Directus repeater format [{key: ..., value: ...}]
+        specs_str = ", ".join([f"{s.get('key')}: {s.get('value')}" for s in specs if isinstance(s, dict)])
+    elif isinstance(specs, dict):
+        specs_str = ", ".join([f"{k}: {v}" for k, v in specs.items()])
+    else:
+        specs_str = str(specs)
+
+    return f"{item.name} Category: {item.category or 'N/A'}. Specs: {specs_str}. {item.description or ''}"
+
+def load_checkpoint() -> dict:
+    try:
+        with open(CHECKPOINT_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_checkpoint(checkpoint: dict) -> None:
+    tmp = CHECKPOINT_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, CHECKPOINT_FILE)
+
+def bulk_update_embeddings(db, table: str, rows: list) -> None:
+    """One UPDATE ... FROM (VALUES ...) statement for the whole chunk."""
+    values = ", ".join(f"(CAST(:id{i} AS uuid), CAST(:emb{i} AS vector))" for i in range(len(rows)))
+    params = {}
+    for i, (item_id, vector) in enumerate(rows):
+        params[f"id{i}"] = str(item_id)
+        params[f"emb{i}"] = "[" + ",".join(map(str, vector)) + "]"
+    db.execute(
+        text(f"UPDATE {table} AS t SET embedding = v.embedding FROM (VALUES {values}) AS v(id, embedding) WHERE t.id = v.id"),
+        params,
+    )
+
+async def embed_chunk(ai_service, items, semaphore) -> list:
+    """Embeds a chunk in batches; failed batches are logged and left for the next run."""
+    async def run(batch):
+        async with semaphore:
+            try:
+                vectors = await ai_service.get_embeddings([build_text(item) for item in batch], wait=SLOT_WAIT_SECONDS)
+                return [(item.id, vector) for item, vector in zip(batch, vectors)]
+            except Exception as e:
+                logger.error(f"Failed to embed batch starting at {batch[0].name}: {e}")
+                return []
+
+    batches = [items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+    results = await asyncio.gather(*(run(batch) for batch in batches))
+    return [row for rows in results for row in rows]
+
+async def process_model(db, ai_service, model, checkpoint: dict, reembed: bool):
+    table = model.__tablename__
+    last_id = checkpoint.get(table)
+    if last_id:
+        logger.info(f"Resuming {table} after {last_id}")
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    columns = [model.id, model.name, model.category, model.specs, model.description]
+    done = failed = 0
+    progress = tqdm(desc=f"Generating {table} embeddings", unit="row")
+
+    while True:
+        # Keyset scan in id order so a crash resumes from the last committed chunk
+        stmt = select(*columns).order_by(model.id).limit(CHUNK_SIZE)
+        if not reembed:
+            stmt = stmt.where(model.embedding.is_(None))
+        if last_id:
+            stmt = stmt.where(model.id > last_id)
+        items = db.execute(stmt).all()
+        if not items:
+            break
+
+        rows = await embed_chunk(ai_service, items, semaphore)
+        if rows:
+            bulk_update_embeddings(db, table, rows)
+        db.commit()
+
+        last_id = str(items[-1].id)
+        checkpoint[table] = last_id
+        save_checkpoint(checkpoint)
+
+        done += len(rows)
+        failed += len(items) - len(rows)
+        progress.update(len(items))
+
+    progress.close()
+    checkpoint.pop(table, None)
+    save_checkpoint(checkpoint)
+    logger.info(f"{table}: {done} embedded, {failed} failed.")
+
+async def generate_embeddings(reembed: bool = False, restart: bool = False):
     db = SessionLocal()
     ai_service = AIService()
-    
+    checkpoint = {} if restart else load_checkpoint()
+
     try:
-        # 1. Process Products
-        logger.info("Fetching products without embeddings...")
-        stmt_p = select(Product).where(Product.embedding.is_(None))
-        products = db.execute(stmt_p).scalars().all()
-        await process_batch(db, ai_service, products, "Products")
-
-        # 2. Process Spare Parts
-        logger.info("Fetching spare parts without embeddings...")
-        stmt_s = select(SparePart).where(SparePart.embedding.is_(None))
-        spares = db.execute(stmt_s).scalars().all()
-        await process_batch(db, ai_service, spares, "Spare Parts")
+        for model in (Product, SparePart):
+            await process_model(db, ai_service, model, checkpoint, reembed)
 
+        if os.path.exists(CHECKPOINT_FILE):
+            os.remove(CHECKPOINT_FILE)
         logger.info("Successfully updated all embeddings.")
 
     except Exception as e:
@@ -72,4 +145,16 @@ async def generate_embeddings():
         db.close()
 
 if __name__ == "__main__":
-    asyncio.run(generate_embeddings())
+    parser = argparse.ArgumentParser(description="Generate embeddings for products and spare parts.")
+    parser.add_argument("--all", action="store_true", help="Re-embed rows that already have an embedding")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted run")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Inputs per embeddings API call")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Embedding requests in flight")
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    BATCH_SIZE = args.batch_size
+    CONCURRENCY = min(args.concurrency, BULKHEAD_LIMITS["embedding"])
+    if CONCURRENCY < args.concurrency:
+        logger.warning(f"--concurrency {args.concurrency} exceeds the embedding bulkhead, using {CONCURRENCY}")
+    asyncio.run(generate_embeddings(args.all, args.restart))
@@ -10,6 +10,7 @@ sys.path.append(os.getcwd())
 from apps.backend.app.core.database import SessionLocal
 from packages.database.models import Product
 from apps.backend.services.ai_service import AIService
+from apps.backend.app.services.local_vector_index import LocalVectorIndex
 
 async def test_distances():
     db = SessionLocal()
@@ -23,22 +24,15 @@ async def test_distances():
     # 2. Get embedding
     emb = await ai.get_embedding(expanded_q)
     
-    # 3. Get all products and calculate manual distance
-    items = db.query(Product).all()
-    distances = []
+    # 3. Distances to every published product in one vectorized pass
+    # (same cosine distance as pgvector's <=>, without a query per product)
+    index = LocalVectorIndex(enabled=True)
+    index.rebuild(db)
+    names = dict(db.execute(select(Product.id, Product.name)).all())
+    distances = [(names.get(doc_id, doc_id), d) for doc_id, d in index.search("machines", emb)]
     
     print("\nDistances (Lower is closer):")
     print("-" * 50)
-    for p in items:
-        if p.embedding:
-            # We use the same distance as pgvector (cosine)
-            # dist = 1 - (A . B) / (||A|| ||B||)
-            # But here we can just use the db's calculation for accuracy
-            stmt = select(Product.embedding.cosine_distance(emb)).where(Product.id == p.id)
-            dist = db.execute(stmt).scalar()
-            distances.append((p.name, dist))
-    
-    distances.sort(key=lambda x: x[1])
     for name, d in distances:
         print(f"{d:.4f} | {name}")
     
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import logging
+import sys
+import os
+from sqlalchemy.dialects.postgresql import insert
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Ensure apps module is found
+sys.path.append(os.getcwd())
+
+from apps.backend.app.core.database import SessionLocal
+from packages.database.models import QueryExpansion
+from apps.backend.services.ai_service import AIService
+from apps.backend.services.expansion_cache import expansion_cache, query_key
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def warm_query_expansions(limit: int, extra_queries: list, refresh: bool):
+    """
+    Precomputes LLM expansions for the most popular search queries
+    (tracked by the backend in Redis) and stores them in query_expansions.
+    """
+    db = SessionLocal()
+    ai_service = AIService()
+
+    try:
+        popular = await expansion_cache.top_queries(limit)
+        hits = {key: int(score) for key, score in popular}
+        for q in extra_queries:
+            hits.setdefault(query_key(q), 0)
+
+        existing = {row.query_key for row in db.query(QueryExpansion.query_key).all()}
+        todo = [key for key in hits if refresh or key not in existing]
+        logger.info(f"{len(hits)} candidate queries, {len(todo)} to expand.")
+
+        for key in todo:
+            try:
+                expansion = await ai_service._request_expansion(key)
+            except Exception as e:
+                logger.error(f"Failed to expand '{key}': {e}")
+                continue
+
+            stmt = insert(QueryExpansion).values(
+                query_key=key,
+                query=key,
+                expansion=expansion,
+                model=ai_service.chat_model,
+                hits=hits[key],
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[QueryExpansion.query_key],
+                set_={"expansion": stmt.excluded.expansion, "model": stmt.excluded.model, "hits": stmt.excluded.hits},
+            )
+            db.execute(stmt)
+            db.commit()
+            await expansion_cache.store(ai_service.chat_model, key, expansion)
+            logger.info(f"Expanded '{key}' -> '{expansion}'")
+
+        # Keep hit counters of already warmed queries up to date
+        for key in set(hits) - set(todo):
+            db.query(QueryExpansion).filter(QueryExpansion.query_key == key).update({"hits": hits[key]})
+        db.commit()
+
+    except Exception as e:
+        logger.error(f"Error in warm_query_expansions: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the precomputed query expansion table.")
+    parser.add_argument("--limit", type=int, default=200, help="Number of most popular queries to warm")
+    parser.add_argument("--query", action="append", default=[], help="Extra query to warm (repeatable)")
+    parser.add_argument("--refresh", action="store_true", help="Re-expand queries already in the table")
+    args = parser.parse_args()
+    asyncio.run(warm_query_expansions(args.limit, args.query, args.refresh))
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from apps.backend.services.circuit_breaker import (
+    DEFAULT_BULKHEAD_LIMIT, Bulkhead, CircuitBreaker, bulkheads, counts_as_failure,
+)
+
+logger = logging.getLogger(__name__)
+
+# Keep-alive pool sized for the upstream rate limit, not for the number of requests we serve
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+# Concurrent upstream calls allowed per worker; extra callers wait for a slot
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+
+# Read timeout per endpoint, in seconds
+ENDPOINT_TIMEOUTS: Dict[str, float] = {
+    "embedding": float(os.getenv("OPENAI_TIMEOUT_EMBEDDING", "10")),
+    "expansion": float(os.getenv("OPENAI_TIMEOUT_EXPANSION", "8")),
+    "diagnosis": float(os.getenv("OPENAI_TIMEOUT_DIAGNOSIS", "30")),
+    "description": float(os.getenv("OPENAI_TIMEOUT_DESCRIPTION", "60")),
+}
+DEFAULT_TIMEOUT = 30.0
+
+class AIClientRegistry:
+    """
+    Application-scoped OpenAI-compatible client: one AsyncOpenAI over one keep-alive
+    httpx pool, shared by every AIService in the worker. Opened in the FastAPI lifespan
+    (scripts get it lazily on first use) and closed on shutdown.
+    A semaphore bounds concurrent upstream calls. In front of it every call passes its
+    operation's bulkhead and the shared circuit breaker, which reject it immediately
+    (AICallRejected) when the operation is saturated or the upstream is failing;
+    batch callers may queue for a bulkhead slot instead (`slot(endpoint, wait=...)`).
+    `stats()` reports pool saturation and breaker state.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._client: Optional[AsyncOpenAI] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.peak_in_flight = 0
+        self.peak_waiting = 0
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.saturated_calls = 0
+        self.wait_seconds = 0.0
+        self.breaker = CircuitBreaker()
+        self.bulkheads: Dict[str, Bulkhead] = bulkheads()
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self.start()
+        return self._client
+
+    def start(self) -> None:
+        if self._client is not None:
+            return
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+        self._client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL"),
+            http_client=self._http,
+            # Retries are handled by tenacity in AIService
+            max_retries=0,
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self) -> None:
+        if self._client is None:
+            return
+        try:
+            await self._client.close()
+        except Exception as e:
+            logger.error(f"Failed to close AI client: {e}")
+        self._client = None
+        self._http = None
+        self._semaphore = None
+
+    def timeout(self, endpoint: str) -> httpx.Timeout:
+        return httpx.Timeout(ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT), connect=CONNECT_TIMEOUT)
+
+    def _bulkhead(self, endpoint: str) -> Bulkhead:
+        bulkhead = self.bulkheads.get(endpoint)
+        if bulkhead is None:
+            bulkhead = self.bulkheads[endpoint] = Bulkhead(endpoint, DEFAULT_BULKHEAD_LIMIT)
+        return bulkhead
+
+    @asynccontextmanager
+    async def slot(self, endpoint: str, wait: Optional[float] = None):
+        """
+        Holds one of the upstream concurrency slots for the duration of a call.
+        Raises AICallRejected without waiting when the endpoint's bulkhead is full
+        or the circuit breaker is open; the call's outcome feeds the breaker.
+        Batch callers pass `wait` to queue up to that many seconds for a bulkhead slot.
+        """
+        if self._semaphore is None:
+            self.start()
+        async with self._bulkhead(endpoint).acquire(wait):
+            self.breaker.before_call(endpoint)
+            settled = False
+            try:
+                semaphore = self._semaphore
+                if semaphore.locked():
+                    self.saturated_calls += 1
+                self.waiting += 1
+                self.peak_waiting = max(self.peak_waiting, self.waiting)
+                started = time.monotonic()
+                try:
+                    await semaphore.acquire()
+                finally:
+                    self.waiting -= 1
+                self.wait_seconds += time.monotonic() - started
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+                try:
+                    yield
+                except Exception as e:
+                    self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+                    # A rejected request still proves the upstream is answering
+                    if counts_as_failure(e):
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                    settled = True
+                    raise
+                finally:
+                    self.in_flight -= 1
+                    semaphore.release()
+                self.breaker.record_success()
+                settled = True
+            finally:
+                if not settled:
+                    self.breaker.release_probe()
+
+    def stats(self) -> Dict[str, object]:
+        pool = {}
+        transport = getattr(self._http, "_transport", None)
+        connections = getattr(getattr(transport, "_pool", None), "connections", None)
+        if connections is not None:
+            pool = {
+                "open": len(connections),
+                "idle": sum(1 for c in connections if c.is_idle()),
+                "max": MAX_CONNECTIONS,
+            }
+        return {
+            "started": self._client is not None,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak_in_flight": self.peak_in_flight,
+            "peak_waiting": self.peak_waiting,
+            "saturated_calls": self.saturated_calls,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "calls": dict(self.calls),
+            "errors": dict(self.errors),
+            "pool": pool,
+            "breaker": self.breaker.stats(),
+            "bulkheads": {name: bulkhead.stats() for name, bulkhead in self.bulkheads.items()},
+        }
+
+ai_clients = AIClientRegistry()
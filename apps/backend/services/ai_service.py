@@ -1,31 +1,77 @@
+import logging
 import os
-from typing import List, Dict, Any
-from openai import AsyncOpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
+from typing import List, Dict, Any, Optional
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+
+from apps.backend.services.ai_client import AIClientRegistry, ai_clients
+from apps.backend.services.circuit_breaker import AICallRejected
+from apps.backend.services.embedding_cache import embedding_cache
+from apps.backend.services.expansion_cache import expansion_cache
+from apps.backend.services.expansion_dictionary import expansion_dictionary
+
+logger = logging.getLogger(__name__)
 
 class AIService:
-    def __init__(self):
-        # Explicitly load from env or let OpenAI client handle it if standard vars are used.
-        # However, prioritizing explicit passed args from our specific env vars.
-        self.client = AsyncOpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_BASE_URL")
-        )
+    def __init__(self, clients: AIClientRegistry = ai_clients):
+        # The client and its connection pool are application-scoped, see ai_client.py
+        self.clients = clients
         self.embedding_model = os.getenv("OPENAI_MODEL_EMBEDDING", "text-embedding-3-small")
         self.chat_model = os.getenv("OPENAI_MODEL_CHAT", "gpt-4o")
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @property
+    def client(self):
+        return self.clients.client
+
     async def get_embedding(self, text: str) -> List[float]:
         """
         Generates embedding for the given text using OpenAI API.
+        Served from the embedding cache when the same text was embedded before.
+        """
+        cached = await embedding_cache.get(self.embedding_model, text)
+        if cached is not None:
+            return cached
+
+        embedding = await self._create_embedding(text)
+        await embedding_cache.set(self.embedding_model, text, embedding)
+        return embedding
+
+    async def get_embeddings(self, texts: List[str], wait: Optional[float] = None) -> List[List[float]]:
+        """
+        Batched get_embedding: cached texts are skipped, the rest go upstream in one request.
+        Vectors are returned in input order. Batch jobs pass `wait` to queue for an
+        embedding slot instead of being rejected while the bulkhead is full.
         """
-        response = await self.client.embeddings.create(
-            input=text,
-            model=self.embedding_model
-        )
+        vectors = await embedding_cache.get_many(self.embedding_model, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            created = await self._create_embeddings([texts[i] for i in missing], wait)
+            for i, vector in zip(missing, created):
+                vectors[i] = vector
+            await embedding_cache.set_many(self.embedding_model, [texts[i] for i in missing], created)
+        return vectors
+
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=retry_if_not_exception_type(AICallRejected))
+    async def _create_embeddings(self, texts: List[str], wait: Optional[float] = None) -> List[List[float]]:
+        async with self.clients.slot("embedding", wait):
+            response = await self.client.embeddings.create(
+                input=texts,
+                model=self.embedding_model,
+                timeout=self.clients.timeout("embedding")
+            )
+        # The API does not guarantee response order, `index` does
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=retry_if_not_exception_type(AICallRejected))
+    async def _create_embedding(self, text: str) -> List[float]:
+        async with self.clients.slot("embedding"):
+            response = await self.client.embeddings.create(
+                input=text,
+                model=self.embedding_model,
+                timeout=self.clients.timeout("embedding")
+            )
         return response.data[0].embedding
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), retry=retry_if_not_exception_type(AICallRejected))
     async def generate_description(self, data: Dict[str, Any], role: str) -> str:
         """
         Generates product description based on data and target audience role.
@@ -34,14 +80,16 @@ class AIService:
         
         user_content = f"Product Data:\nName: {data.get('name')}\nSpecs: {data.get('specs')}\nCategory: {data.get('category')}\n"
         
-        response = await self.client.chat.completions.create(
-            model=self.chat_model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content}
-            ],
-            temperature=0.7
-        )
+        async with self.clients.slot("description"):
+            response = await self.client.chat.completions.create(
+                model=self.chat_model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content}
+                ],
+                temperature=0.7,
+                timeout=self.clients.timeout("description")
+            )
         return response.choices[0].message.content
 
     def _get_system_prompt_by_role(self, role: str) -> str:
@@ -56,7 +104,7 @@ class AIService:
         else:
             return f"{base_prompt} Write a balanced description highlighting key features and benefits."
 
-    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=2, max=5))
+    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=2, max=5), retry=retry_if_not_exception_type(AICallRejected))
     async def generate_diagnosis_recommendation(
         self, 
         machine_type: str, 
@@ -104,15 +152,17 @@ class AIService:
 Дай профессиональную оценку состояния."""
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.chat_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3,
-                response_format={"type": "json_object"}
-            )
+            async with self.clients.slot("diagnosis"):
+                response = await self.client.chat.completions.create(
+                    model=self.chat_model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=0.3,
+                    response_format={"type": "json_object"},
+                    timeout=self.clients.timeout("diagnosis")
+                )
             
             import json
             result = json.loads(response.choices[0].message.content)
@@ -164,11 +214,27 @@ class AIService:
             "next_steps": recommendations[:3]
         }
 
-    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=2, max=5))
     async def expand_query(self, query: str) -> str:
         """
         Expands a short user search query into a richer technical context for better semantic matching.
+        Queries the local dictionary can place (catalog words, typos of them, harvested
+        synonyms) never reach the LLM. The rest are cached per normalized query and
+        concurrent identical queries share one LLM call.
         """
+        local = expansion_dictionary.expand(query)
+        if local is not None:
+            return f"{query} {local}".rstrip()
+        try:
+            expanded = await expansion_cache.get_or_compute(
+                self.chat_model, query, lambda: self._request_expansion(query)
+            )
+            return f"{query} {expanded}"
+        except Exception as e:
+            logger.warning(f"Query expansion failed: {e}")
+            return query
+
+    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=2, max=5), retry=retry_if_not_exception_type(AICallRejected))
+    async def _request_expansion(self, query: str) -> str:
         system_prompt = """You are an expert in industrial metalworking equipment. 
 Your goal is to expand a user search query into a set of technical terms, synonyms, and related categories.
 
@@ -187,7 +253,7 @@ Input: 'винторезный'
 Output: 'токарно-винторезный, резьбонарезной, нарезка резьбы, металлорежущий станок, токарный станок'
 """
 
-        try:
+        async with self.clients.slot("expansion"):
             response = await self.client.chat.completions.create(
                 model=self.chat_model,
                 messages=[
@@ -195,10 +261,17 @@ Output: 'токарно-винторезный, резьбонарезной, н
                     {"role": "user", "content": f"Search query: '{query}'"}
                 ],
                 temperature=0.3,
-                max_tokens=150
+                max_tokens=150,
+                timeout=self.clients.timeout("expansion")
             )
-            expanded = response.choices[0].message.content.strip()
-            return f"{query} {expanded}"
-        except Exception as e:
-            print(f"Query expansion failed: {e}")
-            return query
+        return response.choices[0].message.content.strip()
+
+
+_shared_service: Optional[AIService] = None
+
+def get_ai_service() -> AIService:
+    """Process-wide AIService bound to the shared client registry."""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = AIService()
+    return _shared_service
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Consecutive upstream failures that open the breaker
+FAILURE_THRESHOLD = int(os.getenv("AI_BREAKER_FAILURE_THRESHOLD", "5"))
+# Seconds the breaker stays open before letting a probe call through
+RESET_TIMEOUT = float(os.getenv("AI_BREAKER_RESET_SECONDS", "30"))
+# Probe calls allowed at once while half-open
+HALF_OPEN_CALLS = int(os.getenv("AI_BREAKER_HALF_OPEN_CALLS", "1"))
+
+# Concurrent calls per operation; a call over the limit is rejected instead of queued,
+# so a slow operation cannot take every upstream slot from the others.
+# Batch callers may opt into waiting for a slot instead, see Bulkhead.acquire
+BULKHEAD_LIMITS: Dict[str, int] = {
+    "embedding": int(os.getenv("AI_BULKHEAD_EMBEDDING", "8")),
+    "expansion": int(os.getenv("AI_BULKHEAD_EXPANSION", "4")),
+    "diagnosis": int(os.getenv("AI_BULKHEAD_DIAGNOSIS", "4")),
+    "description": int(os.getenv("AI_BULKHEAD_DESCRIPTION", "2")),
+}
+DEFAULT_BULKHEAD_LIMIT = 4
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class AICallRejected(Exception):
+    """An AI call refused before reaching the upstream; callers fall back as for any failure."""
+
+class CircuitOpenError(AICallRejected):
+    pass
+
+class BulkheadFullError(AICallRejected):
+    pass
+
+class CircuitBreaker:
+    """
+    Shared breaker over the OpenAI-compatible upstream. Opens after FAILURE_THRESHOLD
+    consecutive failures, rejects every call for RESET_TIMEOUT seconds, then lets
+    HALF_OPEN_CALLS probe calls through: a success closes it, a failure reopens it.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        half_open_calls: int = HALF_OPEN_CALLS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self._state = CLOSED
+        self._opened_at: Optional[float] = None
+        self._probes = 0
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.rejections: Dict[str, int] = {}
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def before_call(self, operation: str) -> None:
+        """Raises CircuitOpenError unless the call may go upstream."""
+        state = self.state
+        if state == CLOSED:
+            return
+        if state == HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return
+        self.rejections[operation] = self.rejections.get(operation, 0) + 1
+        raise CircuitOpenError(f"AI circuit breaker is {state}, {operation} call rejected")
+
+    def release_probe(self) -> None:
+        """A probe call that ended without an outcome (cancelled) frees its place."""
+        if self._state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record_success(self) -> None:
+        if self._state != CLOSED:
+            logger.info("AI circuit breaker closed")
+        self._state = CLOSED
+        self._probes = 0
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._state == HALF_OPEN or (self._state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+            logger.warning(
+                f"AI circuit breaker opened after {self.consecutive_failures} consecutive failures, "
+                f"retrying in {self.reset_timeout:.0f}s"
+            )
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejections": dict(self.rejections),
+        }
+
+class Bulkhead:
+    """
+    Per-operation concurrency limit. Rejects instead of queueing by default;
+    a caller passing `wait` queues for up to that many seconds first.
+    """
+
+    def __init__(self, operation: str, limit: int):
+        self.operation = operation
+        self.limit = limit
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejections = 0
+        # Created on first wait, so the bulkhead can be built outside an event loop
+        self._freed: Optional[asyncio.Condition] = None
+
+    def _reject(self) -> BulkheadFullError:
+        self.rejections += 1
+        return BulkheadFullError(f"{self.operation} bulkhead full ({self.limit} calls in flight)")
+
+    async def _wait_for_slot(self, timeout: float) -> None:
+        if self._freed is None:
+            self._freed = asyncio.Condition()
+        self.waiting += 1
+        try:
+            async with self._freed:
+                await asyncio.wait_for(self._freed.wait_for(lambda: self.in_flight < self.limit), timeout)
+                self.in_flight += 1
+        except asyncio.TimeoutError:
+            raise self._reject() from None
+        finally:
+            self.waiting -= 1
+
+    @asynccontextmanager
+    async def acquire(self, wait: Optional[float] = None):
+        if self.in_flight < self.limit:
+            self.in_flight += 1
+        elif wait:
+            await self._wait_for_slot(wait)
+        else:
+            raise self._reject()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self.waiting:
+                async with self._freed:
+                    self._freed.notify()
+
+    def stats(self) -> Dict[str, object]:
+        return {"limit": self.limit, "in_flight": self.in_flight, "waiting": self.waiting, "rejections": self.rejections}
+
+def bulkheads() -> Dict[str, Bulkhead]:
+    return {operation: Bulkhead(operation, limit) for operation, limit in BULKHEAD_LIMITS.items()}
+
+def counts_as_failure(error: Exception) -> bool:
+    """
+    Whether an error says the upstream is unhealthy: connection errors, timeouts,
+    5xx and rate limiting do; a request the upstream rejected as invalid does not.
+    """
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status >= 500 or status == 429
+    return not isinstance(error, AICallRejected)
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import os
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+import redis.asyncio as redis
+
+from apps.backend.app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "emb"
+# Embeddings of a given model never change, the TTL only bounds Redis memory
+DEFAULT_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", str(60 * 60 * 24 * 30)))
+DEFAULT_L1_SIZE = int(os.getenv("EMBEDDING_CACHE_L1_SIZE", "2048"))
+
+def normalize_text(text: str) -> str:
+    """Unicode NFC + collapsed whitespace, so cosmetic differences share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+def pack_vector(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+def unpack_vector(data: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache: in-process LRU in front of Redis.
+    Keys are model name + SHA-256 of the normalized text, values are packed float32 bytes.
+    Redis errors degrade to a miss, never to a failed request.
+    """
+
+    def __init__(self, redis_url: str = settings.REDIS_URL, ttl: int = DEFAULT_TTL, l1_size: int = DEFAULT_L1_SIZE):
+        self.redis = redis.from_url(redis_url, decode_responses=False)
+        self.ttl = ttl
+        self.l1_size = l1_size
+        self._l1: "OrderedDict[str, bytes]" = OrderedDict()
+        self.hits_l1 = 0
+        self.hits_l2 = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{model}:{digest}"
+
+    def _remember(self, key: str, data: bytes) -> None:
+        self._l1[key] = data
+        self._l1.move_to_end(key)
+        while len(self._l1) > self.l1_size:
+            self._l1.popitem(last=False)
+
+    async def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Looks up several texts at once (one MGET for the L1 misses)."""
+        keys = [self.make_key(model, t) for t in texts]
+        found: List[Optional[bytes]] = [None] * len(keys)
+
+        missing = []
+        for i, key in enumerate(keys):
+            data = self._l1.get(key)
+            if data is not None:
+                self._l1.move_to_end(key)
+                found[i] = data
+                self.hits_l1 += 1
+            else:
+                missing.append(i)
+
+        if missing:
+            try:
+                values = await self.redis.mget([keys[i] for i in missing])
+            except Exception as e:
+                logger.error(f"Embedding cache Redis error (Get): {e}")
+                values = [None] * len(missing)
+            for i, data in zip(missing, values):
+                if data is not None:
+                    self._remember(keys[i], data)
+                    found[i] = data
+                    self.hits_l2 += 1
+                else:
+                    self.misses += 1
+
+        return [unpack_vector(data) if data is not None else None for data in found]
+
+    async def get(self, model: str, text: str) -> Optional[List[float]]:
+        return (await self.get_many(model, [text]))[0]
+
+    async def set_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        if not texts:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(model, text)
+                data = pack_vector(vector)
+                self._remember(key, data)
+                pipe.set(key, data, ex=self.ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Embedding cache Redis error (Set): {e}")
+
+    async def set(self, model: str, text: str, vector: List[float]) -> None:
+        await self.set_many(model, [text], [vector])
+
+embedding_cache = EmbeddingCache()
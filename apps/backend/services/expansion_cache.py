@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from apps.backend.app.core.config import settings
+from apps.backend.app.core.text import fold_text
+from packages.database.models import QueryExpansion
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "qexp"
+POPULARITY_KEY = "qexp:popularity"
+# Expansions of a query are stable for a given chat model
+DEFAULT_TTL = int(os.getenv("QUERY_EXPANSION_CACHE_TTL", str(60 * 60 * 24 * 7)))
+L1_TTL = 600
+L1_SIZE = 1024
+# Popularity is counted in process and flushed to Redis at most this often
+POPULARITY_FLUSH_SECONDS = float(os.getenv("QUERY_EXPANSION_POPULARITY_FLUSH_SECONDS", "30"))
+
+def query_key(query: str) -> str:
+    """Cache key of a query: homoglyph-normalized, case-folded, whitespace-collapsed."""
+    return " ".join(fold_text(query).split())
+
+class QueryExpansionCache:
+    """
+    Cache for AIService.expand_query results.
+    Lookup order: precomputed table (loaded in memory) -> per-worker L1 -> Redis -> LLM.
+    Concurrent misses for the same key share one in-flight LLM call (single-flight).
+    Only successful expansions are stored; fallbacks are never cached.
+    """
+
+    def __init__(self, redis_url: str = settings.REDIS_URL, ttl: int = DEFAULT_TTL):
+        self.redis = redis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+        self.ttl = ttl
+        self._precomputed: Dict[str, str] = {}
+        self._l1: Dict[str, Tuple[float, str]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._popularity: Counter = Counter()
+        self._popularity_flushed_at = time.monotonic()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _redis_key(self, model: str, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{model}:{digest}"
+
+    def load_precomputed(self, db: Session) -> int:
+        """Loads the offline-warmed expansion table into memory."""
+        rows = db.execute(select(QueryExpansion.query_key, QueryExpansion.expansion)).all()
+        self._precomputed = {row.query_key: row.expansion for row in rows}
+        return len(self._precomputed)
+
+    def _l1_get(self, key: str) -> Optional[str]:
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > L1_TTL:
+            self._l1.pop(key, None)
+            return None
+        return value
+
+    def _l1_set(self, key: str, value: str) -> None:
+        if len(self._l1) >= L1_SIZE:
+            # Drop the oldest entry; insertion order is storage order
+            self._l1.pop(next(iter(self._l1)), None)
+        self._l1[key] = (time.monotonic(), value)
+
+    async def _lookup(self, model: str, key: str) -> Optional[str]:
+        self._count_popularity(key)
+        value = self._precomputed.get(key) or self._l1_get(key)
+        if value is not None:
+            return value
+        try:
+            value = await self.redis.get(self._redis_key(model, key))
+            if value:
+                self._l1_set(key, value)
+        except Exception as e:
+            logger.error(f"Query expansion cache Redis error (Get): {e}")
+        return value
+
+    def _count_popularity(self, key: str) -> None:
+        """
+        Popularity feeds the offline warm-up of the precomputed table. It is counted
+        in memory and flushed in the background, so a precomputed or L1 hit does no I/O.
+        """
+        self._popularity[key] += 1
+        if time.monotonic() - self._popularity_flushed_at < POPULARITY_FLUSH_SECONDS:
+            return
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        self._flush_task = asyncio.get_running_loop().create_task(self.flush_popularity())
+
+    async def flush_popularity(self) -> None:
+        """Adds the counts collected since the last flush to the Redis ZSET."""
+        counts, self._popularity = self._popularity, Counter()
+        self._popularity_flushed_at = time.monotonic()
+        if not counts:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, count in counts.items():
+                pipe.zincrby(POPULARITY_KEY, count, key)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Query expansion cache Redis error (Popularity): {e}")
+
+    async def store(self, model: str, key: str, expansion: str) -> None:
+        self._l1_set(key, expansion)
+        try:
+            await self.redis.set(self._redis_key(model, key), expansion, ex=self.ttl)
+        except Exception as e:
+            logger.error(f"Query expansion cache Redis error (Set): {e}")
+
+    async def get_or_compute(self, model: str, query: str, compute: Callable[[], Awaitable[str]]) -> str:
+        """
+        Returns the cached expansion for the query, or runs `compute` once for all
+        concurrent callers with the same key. Exceptions from `compute` propagate
+        to every waiting caller.
+        """
+        key = query_key(query)
+        cached = await self._lookup(model, key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            self.misses += 1
+            # The call runs as its own task so a disconnecting caller does not cancel it for the others
+            inflight = asyncio.get_running_loop().create_task(self._compute_and_store(model, key, compute))
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda task: self._finish(key, task))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(inflight)
+
+    async def _compute_and_store(self, model: str, key: str, compute: Callable[[], Awaitable[str]]) -> str:
+        expansion = await compute()
+        await self.store(model, key, expansion)
+        return expansion
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        # Retrieve the exception so an unawaited failure is not logged as "never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    async def top_queries(self, limit: int) -> List[Tuple[str, float]]:
+        """Most requested query keys, used by the offline warm-up script."""
+        return await self.redis.zrevrange(POPULARITY_KEY, 0, limit - 1, withscores=True)
+
+expansion_cache = QueryExpansionCache()
@@ -0,0 +1,183 @@
+import bisect
+import logging
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from apps.backend.app.core.text import fold_text
+from apps.backend.services.expansion_cache import query_key
+from packages.database.models import Product, SearchSynonym, SparePart
+
+logger = logging.getLogger(__name__)
+
+# Words shorter than this are never corrected; longer ones allow two edits
+MIN_CORRECTION_LENGTH = 4
+TWO_EDITS_LENGTH = 8
+# Word forms sharing a stem ('ролик' -> 'ролики', 'роликовый') added per query word
+MAX_WORD_FORMS = 4
+# Terms in one expansion, the LLM prompt asks for 5-10
+MAX_TERMS = 10
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def terms(text: str) -> List[str]:
+    """Folded words of a text, the vocabulary unit of the dictionary."""
+    return [t for t in _TOKEN_RE.findall(fold_text(text)) if len(t) > 1 and not t.isdigit()]
+
+def catalog_vocabulary(db: Session) -> Counter:
+    """Word frequencies over the names and categories of published products and spare parts."""
+    vocabulary: Counter = Counter()
+    for model in (Product, SparePart):
+        rows = db.execute(select(model.name, model.category).where(model.is_published == True)).all()
+        for row in rows:
+            vocabulary.update(terms(row.name or ""))
+            vocabulary.update(terms(row.category or ""))
+    return vocabulary
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """All strings reachable from `word` by removing up to `distance` characters."""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+def _max_distance(word: str) -> int:
+    if len(word) < MIN_CORRECTION_LENGTH:
+        return 0
+    return 2 if len(word) >= TWO_EDITS_LENGTH else 1
+
+def edit_distance(a: str, b: str) -> int:
+    """Damerau-Levenshtein distance (optimal string alignment), adjacent swaps cost one edit."""
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+class ExpansionDictionary:
+    """
+    Local replacement for most AIService.expand_query calls.
+    Combines a SymSpell-style index (precomputed deletions of every catalog word,
+    so a typo is corrected with a few dictionary lookups instead of a scan),
+    word forms sharing a stem and the synonym table harvested from past LLM
+    expansions. A query containing a word it cannot place is left to the LLM.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vocabulary: Dict[str, int] = {}
+        self._sorted_words: List[str] = []
+        self._deletes: Dict[str, List[str]] = {}
+        self._synonyms: Dict[str, List[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def is_ready(self) -> bool:
+        return bool(self._vocabulary)
+
+    def build(self, vocabulary: Dict[str, int], synonyms: Dict[str, Iterable[str]]) -> None:
+        deletes: Dict[str, List[str]] = defaultdict(list)
+        for word in vocabulary:
+            for variant in _deletes(word, _max_distance(word)):
+                deletes[variant].append(word)
+        with self._lock:
+            self._vocabulary = dict(vocabulary)
+            self._sorted_words = sorted(vocabulary)
+            self._deletes = dict(deletes)
+            self._synonyms = {term: list(values) for term, values in synonyms.items()}
+
+    def load(self, db: Session) -> int:
+        """Builds the index from the catalog vocabulary and the search_synonyms table. Returns the word count."""
+        synonyms = {row.term: row.synonyms for row in db.execute(select(SearchSynonym.term, SearchSynonym.synonyms)).all()}
+        self.build(catalog_vocabulary(db), synonyms)
+        return len(self._vocabulary)
+
+    def correct(self, word: str) -> Optional[str]:
+        """Closest catalog word within the allowed edit distance, the most frequent one on ties."""
+        if word in self._vocabulary:
+            return word
+        distance = _max_distance(word)
+        if not distance:
+            return None
+        best, best_key = None, None
+        for variant in _deletes(word, distance):
+            for candidate in self._deletes.get(variant, ()):
+                if abs(len(candidate) - len(word)) > distance:
+                    continue
+                d = edit_distance(word, candidate)
+                if d > distance:
+                    continue
+                key = (d, -self._vocabulary[candidate], candidate)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+        return best
+
+    def word_forms(self, word: str) -> List[str]:
+        """Most frequent catalog words sharing the word's stem (its first len-2 letters, at least 4)."""
+        if len(word) < MIN_CORRECTION_LENGTH + 1:
+            return []
+        stem = word[:max(MIN_CORRECTION_LENGTH, len(word) - 2)]
+        start = bisect.bisect_left(self._sorted_words, stem)
+        forms = []
+        for candidate in self._sorted_words[start:]:
+            if not candidate.startswith(stem):
+                break
+            if candidate != word:
+                forms.append(candidate)
+        forms.sort(key=lambda w: -self._vocabulary[w])
+        return forms[:MAX_WORD_FORMS]
+
+    def expand(self, query: str) -> Optional[str]:
+        """
+        Comma-separated expansion terms for the query, like the LLM returns them,
+        or None when a word is out of vocabulary and the LLM has to be asked.
+        Model numbers are skipped: the model number stage of the search covers them.
+        """
+        if not self.is_ready:
+            return None
+        key = query_key(query)
+        # Multi-word queries harvested as a whole; single words go through the word path
+        phrase = self._synonyms.get(key) if " " in key else None
+        if phrase:
+            self.hits += 1
+            return ", ".join(phrase[:MAX_TERMS])
+
+        words = [w for w in _TOKEN_RE.findall(key) if len(w) > 1 and not any(c.isdigit() for c in w)]
+        expansion: List[str] = []
+        for word in words:
+            known = word if word in self._synonyms else self.correct(word)
+            if known is None:
+                self.misses += 1
+                return None
+            if known != word:
+                expansion.append(known)
+            expansion.extend(self._synonyms.get(known, ()))
+            expansion.extend(self.word_forms(known))
+
+        self.hits += 1
+        unique = [t for t in dict.fromkeys(expansion) if t not in words]
+        return ", ".join(unique[:MAX_TERMS])
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "words": len(self._vocabulary),
+            "synonyms": len(self._synonyms),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+expansion_dictionary = ExpansionDictionary()
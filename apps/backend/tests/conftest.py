@@ -0,0 +1,18 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
+class FakeSession:
+    """Returns the queued row lists in order, one per execute() call."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+
+    def execute(self, stmt):
+        rows = self.results.pop(0)
+        return SimpleNamespace(all=lambda: rows)
+
+def row(name, category=None, specs=None, slug=None, is_published=True, id=None):
+    """A products/spare_parts row with the columns the in-process indexes select."""
+    return SimpleNamespace(
+        id=id or uuid4(), name=name, category=category, specs=specs, slug=slug, is_published=is_published
+    )
@@ -0,0 +1,59 @@
+from uuid import uuid4
+
+import numpy as np
+import pytest
+
+from apps.backend.app.services.local_vector_index import LocalVectorIndex, _KindVectors
+
+def make_index(vectors):
+    index = LocalVectorIndex(enabled=True)
+    index._kinds = {"machines": vectors}
+    index._built_at = 0.0
+    return index
+
+def test_remove_moves_the_last_row_into_the_hole():
+    a, b, c = uuid4(), uuid4(), uuid4()
+    vectors = _KindVectors([a, b, c], ["x", "y", "z"], np.eye(3, dtype=np.float32))
+    vectors.remove(a)
+
+    assert vectors.ids == [c, b]
+    assert vectors.positions == {c: 0, b: 1}
+    assert list(vectors.categories) == ["z", "y"]
+    np.testing.assert_array_equal(vectors.matrix, np.array([[0, 0, 1], [0, 1, 0]], dtype=np.float32))
+
+def test_remove_unknown_and_last_rows():
+    a = uuid4()
+    vectors = _KindVectors([a], ["x"], np.ones((1, 2), dtype=np.float32))
+    vectors.remove(uuid4())
+    vectors.remove(a)
+    assert vectors.ids == [] and vectors.positions == {} and vectors.matrix.shape == (0, 2)
+
+def test_upsert_normalizes_and_replaces_in_place():
+    a, b = uuid4(), uuid4()
+    vectors = _KindVectors([], [], None, dim=2)
+    vectors.upsert(a, "x", [3.0, 4.0])
+    vectors.upsert(b, "y", [0.0, 2.0])
+    vectors.upsert(a, "z", [1.0, 0.0])
+
+    assert vectors.ids == [a, b]
+    assert list(vectors.categories) == ["z", "y"]
+    np.testing.assert_allclose(vectors.matrix, [[1.0, 0.0], [0.0, 1.0]])
+
+def test_search_orders_by_cosine_distance_and_filters_category():
+    a, b, c = uuid4(), uuid4(), uuid4()
+    matrix = np.array([[1, 0], [1, 1], [0, 1]], dtype=np.float32)
+    index = make_index(_KindVectors([a, b, c], ["токарные", "токарные", "фрезерные"], matrix))
+
+    assert [doc_id for doc_id, _ in index.search("machines", [1.0, 0.1])] == [a, b, c]
+    assert [doc_id for doc_id, _ in index.search("machines", [1.0, 0.1], k=1)] == [a]
+    assert [doc_id for doc_id, _ in index.search("machines", [0.0, 1.0], category="Токарные")] == [b, a]
+    distance = index.search("machines", [1.0, 0.0], k=1)[0][1]
+    assert distance == pytest.approx(0.0, abs=1e-6)
+
+def test_search_max_distance_and_degenerate_queries():
+    a, b = uuid4(), uuid4()
+    index = make_index(_KindVectors([a, b], ["", ""], np.eye(2, dtype=np.float32)))
+
+    assert index.search("machines", [1.0, 0.0], max_distance=0.5) == [(a, pytest.approx(0.0, abs=1e-6))]
+    assert index.search("machines", [0.0, 0.0]) == []
+    assert index.search("spares", [1.0, 0.0]) == []
@@ -0,0 +1,181 @@
+from uuid import uuid4
+
+import pytest
+
+from apps.backend.app.services.search_engine import (
+    EXACT_MATCH, FIELD_WEIGHTS, FUZZY_WEIGHT, PREFIX_MATCH, SUBSTRING_MATCH,
+    CatalogSearchEngine, _KindIndex, _similarity, tokenize,
+)
+from apps.backend.tests.conftest import FakeSession, row
+
+def build_engine(machines, spares=()):
+    engine = CatalogSearchEngine()
+    engine.rebuild(FakeSession(list(machines), list(spares)))
+    return engine
+
+def snapshot(index):
+    return {
+        "postings": {token: dict(docs) for token, docs in index.postings.items()},
+        "grams": {gram: set(tokens) for gram, tokens in index.grams.items()},
+        "doc_tokens": dict(index.doc_tokens),
+    }
+
+# tokenize
+
+def test_tokenize_folds_case_and_homoglyphs():
+    assert tokenize("Станок 16K20") == tokenize("станок 16к20") == ["станок", "16к20"]
+
+def test_tokenize_compacts_model_numbers_with_separators():
+    assert tokenize("Станок 16К-20") == ["станок", "16к", "20", "16к20"]
+
+def test_tokenize_drops_single_characters_and_duplicates():
+    assert tokenize("Винт М 5 винт") == ["винт"]
+
+def test_tokenize_does_not_compact_words_without_digits():
+    assert tokenize("токарно-винторезный") == ["токарно", "винторезный"]
+
+# _KindIndex match tiers
+
+@pytest.fixture
+def index():
+    index = _KindIndex()
+    index.add(uuid4(), "Токарный станок", None, None)
+    return index
+
+def test_expand_exact(index):
+    assert index.expand("станок") == {"станок": EXACT_MATCH}
+
+def test_expand_prefix(index):
+    assert index.expand("тока") == {"токарный": PREFIX_MATCH}
+
+def test_expand_substring(index):
+    assert index.expand("карн") == {"токарный": SUBSTRING_MATCH}
+
+def test_expand_fuzzy(index):
+    matches = index.expand("станк")
+    assert list(matches) == ["станок"]
+    assert matches["станок"] == pytest.approx(_similarity("станк", "станок") * FUZZY_WEIGHT)
+    assert matches["станок"] < SUBSTRING_MATCH
+
+def test_expand_skips_fuzzy_when_a_token_contains_the_query(index):
+    index.add(uuid4(), "Станковый пулемёт", None, None)
+    assert index.expand("станк") == {"станковый": PREFIX_MATCH}
+
+def test_expand_unknown_token(index):
+    assert index.expand("шпиндель") == {}
+
+# _KindIndex.remove
+
+def test_remove_prunes_postings_and_grams():
+    kept, removed = uuid4(), uuid4()
+    index = _KindIndex()
+    index.add(kept, "Токарный станок", "Станки", None)
+    index.add(removed, "Фрезерный станок", "Станки", {"Мощность": "7 кВт"})
+    index.remove(removed)
+
+    expected = _KindIndex()
+    expected.add(kept, "Токарный станок", "Станки", None)
+    assert snapshot(index) == snapshot(expected)
+    assert removed not in index.doc_name and removed not in index.doc_category
+    assert index.expand("фрез") == {}
+
+def test_remove_last_document_empties_the_index():
+    doc_id = uuid4()
+    index = _KindIndex()
+    index.add(doc_id, "Токарный станок 16К-20", "Станки", {"Мощность": "11 кВт"})
+    index.remove(doc_id)
+    assert snapshot(index) == {"postings": {}, "grams": {}, "doc_tokens": {}}
+
+def test_remove_unknown_document_is_a_no_op(index):
+    before = snapshot(index)
+    index.remove(uuid4())
+    assert snapshot(index) == before
+
+def test_add_replaces_previous_tokens():
+    doc_id = uuid4()
+    index = _KindIndex()
+    index.add(doc_id, "Фрезерный станок", None, None)
+    index.add(doc_id, "Токарный станок", None, None)
+
+    expected = _KindIndex()
+    expected.add(doc_id, "Токарный станок", None, None)
+    assert snapshot(index) == snapshot(expected)
+
+# CatalogSearchEngine.search
+
+LATHE = row("Токарный станок 16К20", "Токарные станки", {"Мощность": "11 кВт"})
+MILL = row("Фрезерный станок 6Р12", "Фрезерные станки")
+CHUCK = row("Патрон токарный", "Оснастка")
+BELT = row("Ремень приводной", "Ремни")
+
+@pytest.fixture
+def engine():
+    return build_engine([LATHE, MILL, CHUCK], [BELT])
+
+def test_search_ranks_name_hits_above_category_hits():
+    lathe = row("Станок 16К20", "Токарные станки")
+    named = row("Токарные тиски", "Оснастка")
+    engine = build_engine([lathe, named])
+    assert engine.search("machines", "токарные") == [named.id, lathe.id]
+
+def test_search_ranks_exact_above_prefix_and_shorter_names_first():
+    exact = row("Патрон", None)
+    longer = row("Патрон кулачковый", None)
+    prefix = row("Патронодержатель", None)
+    engine = build_engine([prefix, longer, exact])
+    assert engine.search("machines", "патрон") == [exact.id, longer.id, prefix.id]
+
+def test_search_finds_model_numbers_typed_with_separators(engine):
+    assert engine.search("machines", "16к-20") == [LATHE.id]
+    assert engine.search("machines", "16K20") == [LATHE.id]
+
+def test_search_match_all(engine):
+    assert engine.search("machines", "токарный станок") == [LATHE.id]
+    assert engine.search("machines", "токарный станок", match_all=False) == [LATHE.id, CHUCK.id, MILL.id]
+
+def test_search_category_filter_is_folded(engine):
+    assert engine.search("machines", "станок", category="ТОКАРНЫЕ СТАНКИ") == [LATHE.id]
+    assert engine.search("machines", "станок", category="Оснастка") == []
+
+def test_search_searches_specs(engine):
+    assert engine.search("machines", "мощность") == [LATHE.id]
+
+def test_search_keeps_kinds_apart(engine):
+    assert engine.search("spares", "ремень") == [BELT.id]
+    assert engine.search("machines", "ремень") == []
+
+def test_search_empty_query_and_unknown_kind(engine):
+    assert engine.search("machines", "   ") == []
+    assert engine.search("tools", "станок") == []
+
+def test_search_scores_use_field_weights():
+    doc = row("Патрон", "Токарный")
+    engine = build_engine([doc])
+    index = engine._indexes["machines"]
+    assert index.score_token("патрон") == {doc.id: EXACT_MATCH * FIELD_WEIGHTS["name"]}
+    assert index.score_token("токарный") == {doc.id: EXACT_MATCH * FIELD_WEIGHTS["category"]}
+
+# CatalogSearchEngine.rebuild / refresh
+
+def test_rebuild_indexes_every_row(engine):
+    assert engine.is_ready and not engine.is_stale
+    assert set(engine._indexes["machines"].doc_tokens) == {LATHE.id, MILL.id, CHUCK.id}
+
+def test_refresh_before_rebuild_is_a_no_op():
+    engine = CatalogSearchEngine()
+    engine.refresh(FakeSession(), "machines", [uuid4()])
+    assert not engine.is_ready
+
+def test_refresh_updates_drops_unpublished_and_deleted(engine):
+    renamed = row("Фрезерный центр 6Р13", "Фрезерные станки", id=MILL.id)
+    unpublished = row(CHUCK.name, CHUCK.category, is_published=False, id=CHUCK.id)
+    engine.refresh(FakeSession([renamed, unpublished]), "machines", [str(MILL.id), CHUCK.id, LATHE.id])
+
+    assert set(engine._indexes["machines"].doc_tokens) == {MILL.id}
+    assert engine.search("machines", "центр") == [MILL.id]
+    assert engine.search("machines", "токарный") == []
+    assert engine.search("machines", "патрон") == []
+
+    expected = build_engine([renamed])
+    assert snapshot(engine._indexes["machines"]) == snapshot(expected._indexes["machines"])
+    assert engine.search("spares", "ремень") == [BELT.id]
@@ -0,0 +1,86 @@
+from uuid import uuid4
+
+import pytest
+
+from apps.backend.app.services.suggest_index import MIN_PREFIX_LENGTH, TOP_PER_PREFIX, SuggestIndex
+from apps.backend.tests.conftest import FakeSession, row
+
+LATHE = row("Станок токарный 16К20", "Станки токарные")
+CHUCK = row("Патрон для станка", "Оснастка")
+BELT = row("Ремень станочный", "Ремни")
+
+def build_index(machines, spares=()):
+    index = SuggestIndex()
+    index.rebuild(FakeSession(list(machines), list(spares)))
+    return index
+
+@pytest.fixture
+def index():
+    return build_index([LATHE, CHUCK], [BELT])
+
+def texts(suggestions):
+    return [s.text for s in suggestions]
+
+def test_suggest_ranks_name_start_inner_word_then_category(index):
+    # Equal inner-word hits rank the shorter name first
+    assert texts(index.suggest("ста")) == [LATHE.name, BELT.name, CHUCK.name, "Станки токарные"]
+
+def test_suggest_filters_by_kind_but_keeps_categories(index):
+    assert texts(index.suggest("ста", kind="spares")) == [BELT.name, "Станки токарные"]
+    assert texts(index.suggest("ста", kind="machines")) == [LATHE.name, CHUCK.name, "Станки токарные"]
+
+def test_suggest_completes_model_numbers_typed_with_separators(index):
+    assert texts(index.suggest("16к-2")) == [LATHE.name]
+    assert texts(index.suggest("16K2")) == [LATHE.name]
+
+def test_suggest_returns_ids_and_kinds(index):
+    suggestion = index.suggest("ремень")[0]
+    assert (suggestion.kind, suggestion.id) == ("spares", str(BELT.id))
+    assert index.suggest("оснастка")[0].kind == "category"
+
+def test_suggest_respects_limit_and_minimum_prefix(index):
+    assert len(index.suggest("ста", limit=2)) == 2
+    assert index.suggest("с" * (MIN_PREFIX_LENGTH - 1)) == []
+
+def test_refresh_drops_unpublished_rows_and_cached_results(index):
+    assert texts(index.suggest("16к")) == [LATHE.name]
+    unpublished = row(LATHE.name, LATHE.category, is_published=False, id=LATHE.id)
+    index.refresh(FakeSession([unpublished]), "machines", [str(LATHE.id)])
+
+    assert index.suggest("16к") == []
+    # The category disappears with its last item
+    assert texts(index.suggest("ста")) == [BELT.name, CHUCK.name]
+
+def test_refresh_renames_in_place(index):
+    renamed = row("Станок фрезерный 6Р12", "Станки фрезерные", id=LATHE.id)
+    index.refresh(FakeSession([renamed]), "machines", [LATHE.id])
+
+    assert index.suggest("16к") == []
+    assert texts(index.suggest("6р1")) == [renamed.name]
+    assert texts(index.suggest("станки")) == ["Станки фрезерные"]
+
+def test_short_prefix_ranks_by_weight_not_key_order():
+    # Inner-word keys sort before the name key, the name must still win
+    fillers = [row(f"Вал стабилизатора {i}") for i in range(TOP_PER_PREFIX * 3)]
+    chair = row("Стул оператора")
+    index = build_index(fillers + [chair])
+    assert texts(index.suggest("ст", limit=1)) == [chair.name]
+    assert texts(index.suggest("ст", limit=TOP_PER_PREFIX))[0] == chair.name
+
+def test_limit_above_the_precomputed_depth_scans():
+    fillers = [row(f"Вал стабилизатора {i}") for i in range(TOP_PER_PREFIX * 2)]
+    index = build_index(fillers)
+    assert len(index.suggest("ст", limit=TOP_PER_PREFIX + 5)) == TOP_PER_PREFIX + 5
+
+PREFIXES = ["ст", "ста", "стан", "16к", "16к-2", "па", "ре", "ремень", "ос", "фр", "6р1"]
+
+def test_refresh_matches_a_full_rebuild(index):
+    renamed = row("Станок фрезерный 6Р12", "Станки фрезерные", id=LATHE.id)
+    added = row("Патрон цанговый", "Оснастка")
+    index.refresh(FakeSession([renamed, added]), "machines", [LATHE.id, added.id])
+    index.refresh(FakeSession([]), "spares", [BELT.id])
+
+    expected = build_index([renamed, CHUCK, added])
+    for prefix in PREFIXES:
+        for kind in (None, "machines", "spares"):
+            assert index.suggest(prefix, kind=kind) == expected.suggest(prefix, kind=kind), (prefix, kind)
@@ -28,21 +28,22 @@ async def engineer_machines(message: Message):
              await message.answer("⚠️ Вы не привязаны ни к одной компании. Обратитесь к администратору.")
              return
 
-        # Fetch only equipment belonging to this client
-        stmt = select(MachineInstance).where(MachineInstance.client_id == user.client_id).limit(20)
+        # Fetch only equipment belonging to this client, with its product in the same query
+        stmt = (
+            select(MachineInstance, Product)
+            .join(Product, Product.id == MachineInstance.product_id)
+            .where(MachineInstance.client_id == user.client_id)
+            .limit(20)
+        )
         result = await session.execute(stmt)
-        instances = result.scalars().all()
+        rows = result.all()
         
-        if not instances:
+        if not rows:
              await message.answer("В вашем парке пока нет зарегистрированного оборудования.")
              return
 
         response = "🏭 *Ваше Оборудование:*\n\n"
-        for inst in instances:
-             prod_res = await session.execute(select(Product).where(Product.id == inst.product_id))
-             prod = prod_res.scalar_one_or_none()
-             if not prod: continue
-             
+        for inst, prod in rows:
              status_icons = {
                 "operational": "🟢",
                 "maintenance": "🟡",
@@ -7,6 +7,7 @@ from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from apps.bot.handlers import router
+from apps.bot.middlewares import QueryScopeMiddleware
 
 # Configuration
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
@@ -35,6 +36,10 @@ async def main():
         
         # Include main router
         dp.include_router(router)
+
+        # SQL instrumentation per handler call
+        dp.message.middleware(QueryScopeMiddleware())
+        dp.callback_query.middleware(QueryScopeMiddleware())
         
         # Start Background Services
         from apps.bot.poller import start_notification_poller
@@ -0,0 +1,20 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from packages.database.instrumentation import query_scope
+
+class QueryScopeMiddleware(BaseMiddleware):
+    """Groups the SQL of one handler call, so N+1 patterns are reported per handler."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", type(event).__name__)
+        with query_scope(f"bot:{name}"):
+            return await handler(event, data)
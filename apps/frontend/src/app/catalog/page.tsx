@@ -21,6 +21,7 @@ export default function CatalogPage() {
     // Pagination State
     const [limit, setLimit] = useState(40);
     const [offset, setOffset] = useState(0);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [total, setTotal] = useState(0);
 
     // Dynamic Filters State
@@ -32,11 +33,13 @@ export default function CatalogPage() {
         currentLimit: number = limit,
         currentOffset: number = 0,
         append: boolean = false,
-        category: string | null = activeCategory
+        category: string | null = activeCategory,
+        cursor: string | null = null
     ) {
         setLoading(true);
         try {
-            const data = await fetchCatalog(query, type, currentLimit, currentOffset, category || undefined);
+            const data = await fetchCatalog(query, type, currentLimit, currentOffset, category || undefined, cursor);
+            setNextCursor(data.nextCursor);
             if (append) {
                 setProducts(prev => [...prev, ...data.results]);
             } else {
@@ -74,7 +77,7 @@ export default function CatalogPage() {
     const handleLoadMore = () => {
         const newOffset = offset + limit;
         setOffset(newOffset);
-        loadData(searchQuery, activeTab, limit, newOffset, true, activeCategory);
+        loadData(searchQuery, activeTab, limit, newOffset, true, activeCategory, nextCursor);
     };
 
     const handleLimitChange = (newLimit: number) => {
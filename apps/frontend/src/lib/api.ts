@@ -353,8 +353,9 @@ export const fetchCatalog = async (
     type: 'machines' | 'spares' = 'machines',
     limit: number = 20,
     offset: number = 0,
-    category?: string
-): Promise<{ results: Product[], total: number }> => {
+    category?: string,
+    cursor?: string | null
+): Promise<{ results: Product[], total: number, nextCursor: string | null }> => {
     try {
         console.log(`[API] fetchCatalog Request: type=${type}, category=${category}, limit=${limit}`);
         // Catalog search defined as @router.get("/search") -> /catalog/search
@@ -362,21 +363,24 @@ export const fetchCatalog = async (
         if (query) params.append('q', query);
         params.append('type', type);
         params.append('limit', limit.toString());
-        params.append('offset', offset.toString());
+        // Listings page by cursor (keyset); offset is kept for ranked search results
+        if (cursor) params.append('cursor', cursor);
+        else params.append('offset', offset.toString());
         if (category) params.append('category', category);
 
         const url = `/catalog/search?${params.toString()}`;
         const response = await api.get(url);
         console.log(`[API] fetchCatalog Success: ${response.data.results?.length || 0} items found`);
 
-        // Response format: { results: Product[], total: number }
+        // Response format: { results: Product[], total: number, next_cursor: string | null }
         return {
             results: response.data.results || [],
-            total: response.data.total || 0
+            total: response.data.total || 0,
+            nextCursor: response.data.next_cursor || null
         };
     } catch (error) {
         console.error('[API] Error fetching catalog:', error);
-        return { results: [], total: 0 };
+        return { results: [], total: 0, nextCursor: null };
     }
 };
 
@@ -0,0 +1,201 @@
+import contextvars
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger("sql")
+
+# Statements slower than this are candidates for the slow-query log
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+# Share of slow statements actually logged (1.0 = all)
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SQL_SLOW_QUERY_SAMPLE_RATE", "1.0"))
+# Same statement this many times in one scope is reported as an N+1 pattern
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+# Distinct statements kept in the process-wide aggregates
+MAX_FINGERPRINTS = int(os.getenv("SQL_MAX_FINGERPRINTS", "200"))
+
+_WHITESPACE = re.compile(r"\s+")
+# Expanded IN lists differ only by their number of placeholders
+_PLACEHOLDER = r"(?:%\(\w+\)s|\$\d+|\?|%s)(?:::[\w\[\]]+)?"
+_PLACEHOLDER_LIST = re.compile(rf"\((?:\s*{_PLACEHOLDER}\s*,)+\s*{_PLACEHOLDER}\s*\)")
+
+def fingerprint_statement(statement: str) -> str:
+    """SQL text with whitespace collapsed and placeholder lists folded, so repeated shapes compare equal."""
+    return _PLACEHOLDER_LIST.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+def _describe(value: Any) -> str:
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+def fingerprint_parameters(parameters: Any) -> Dict[str, Any]:
+    """
+    Shape of the bound parameters (types and lengths) plus a short hash of the values:
+    identical calls can be correlated in the log without writing the values themselves.
+    """
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        # executemany
+        return {"rows": len(parameters), "shape": fingerprint_parameters(parameters[0])["shape"], "hash": _hash(parameters)}
+    if isinstance(parameters, dict):
+        shape = {k: _describe(v) for k, v in parameters.items()}
+    elif isinstance(parameters, (list, tuple)):
+        shape = [_describe(v) for v in parameters]
+    else:
+        shape = _describe(parameters)
+    return {"shape": shape, "hash": _hash(parameters)}
+
+def _hash(value: Any) -> str:
+    return hashlib.sha1(repr(value).encode("utf-8", "replace")).hexdigest()[:10]
+
+class QueryStats:
+    """Statements issued inside one scope (an HTTP request, a bot update, a job run)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Dict[str, int] = {}
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration * 1000
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration_ms:.1f};desc="{self.count} queries"'
+
+_current: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar("sql_query_stats", default=None)
+
+class _Aggregates:
+    """Process-wide counters, read by the /health/db endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.queries = 0
+        self.duration = 0.0
+        self.slow_queries = 0
+        self.n_plus_one = 0
+        self.scopes = 0
+        self.fingerprints: Dict[str, List[float]] = {}
+
+    def record(self, fingerprint: str, duration: float, slow: bool) -> None:
+        with self._lock:
+            self.queries += 1
+            self.duration += duration
+            if slow:
+                self.slow_queries += 1
+            entry = self.fingerprints.get(fingerprint)
+            if entry is None:
+                if len(self.fingerprints) >= MAX_FINGERPRINTS:
+                    # Drop the least frequent statement to stay bounded
+                    rarest = min(self.fingerprints, key=lambda f: self.fingerprints[f][0])
+                    del self.fingerprints[rarest]
+                entry = self.fingerprints[fingerprint] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+
+    def count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self, top: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            heaviest = sorted(self.fingerprints.items(), key=lambda item: item[1][1], reverse=True)[:top]
+            return {
+                "queries": self.queries,
+                "total_ms": round(self.duration * 1000, 1),
+                "scopes": self.scopes,
+                "avg_queries_per_scope": round(self.queries / self.scopes, 2) if self.scopes else None,
+                "slow_queries": self.slow_queries,
+                "n_plus_one_detected": self.n_plus_one,
+                "top_statements": [
+                    {
+                        "statement": fingerprint[:300],
+                        "calls": calls,
+                        "total_ms": round(total * 1000, 1),
+                        "max_ms": round(worst * 1000, 1),
+                    }
+                    for fingerprint, (calls, total, worst) in heaviest
+                ],
+            }
+
+aggregates = _Aggregates()
+
+def sql_stats() -> Dict[str, Any]:
+    return aggregates.snapshot()
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+@contextmanager
+def query_scope(name: str) -> Iterator[QueryStats]:
+    """Collects every statement run in this context (including threads it hands work to)."""
+    stats = QueryStats(name)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        aggregates.count("scopes")
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    fingerprint = fingerprint_statement(statement)
+    slow = duration * 1000 >= SLOW_QUERY_MS
+    aggregates.record(fingerprint, duration, slow)
+
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += duration
+        seen = stats.statements.get(fingerprint, 0) + 1
+        stats.statements[fingerprint] = seen
+        # Reported once, when the count crosses the threshold
+        if seen == N_PLUS_ONE_THRESHOLD:
+            aggregates.count("n_plus_one")
+            logger.warning(f"Possible N+1 in {stats.name}: statement ran {seen}+ times: {fingerprint[:300]}")
+
+    if slow and random.random() < SLOW_QUERY_SAMPLE_RATE:
+        logger.warning(
+            f"Slow query ({duration * 1000:.1f} ms) in {stats.name if stats else 'no scope'}: "
+            f"{fingerprint[:1000]} params={fingerprint_parameters(parameters)}"
+        )
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    starts = conn.info.get("query_start") if conn is not None else None
+    if starts:
+        starts.pop()
+
+def instrument_engine(engine) -> None:
+    """Attaches the timing hooks to a sync Engine or to an AsyncEngine's sync_engine."""
+    target = getattr(engine, "sync_engine", engine)
+    if event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target, "handle_error", _handle_error)
+
+def echo_enabled() -> bool:
+    """SQL_ECHO=true restores per-statement echo for local debugging."""
+    return os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
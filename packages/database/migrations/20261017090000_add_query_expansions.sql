@@ -0,0 +1,21 @@
+-- Migration: Add precomputed query expansions
+-- Description: Stores LLM query expansions for the most popular catalog searches,
+-- warmed offline by apps/backend/scripts/warm_query_expansions.py and loaded by
+-- the backend at startup so top queries never wait on a chat-completion call.
+-- Created at: 2026-10-17 09:00:00
+
+CREATE TABLE IF NOT EXISTS query_expansions (
+    query_key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    expansion TEXT NOT NULL,
+    model TEXT NOT NULL,
+    hits INTEGER DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+DROP TRIGGER IF EXISTS update_query_expansions_updated_at ON query_expansions;
+CREATE TRIGGER update_query_expansions_updated_at
+    BEFORE UPDATE ON query_expansions
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
@@ -0,0 +1,22 @@
+-- Migration: HNSW indexes for semantic search
+-- Description: Replaces the IVFFlat index on products (built with lists = 100 on a
+-- mostly empty column, so its centroids were useless) with HNSW indexes on both
+-- embedding columns. The indexes are partial on is_published, which every
+-- storefront query filters on; per-query ef_search / iterative scan settings are
+-- applied by apps/backend/app/services/vector_index.py.
+-- Created at: 2026-10-17 10:00:00
+
+DROP INDEX IF EXISTS products_embedding_idx;
+
+CREATE INDEX IF NOT EXISTS idx_products_embedding_hnsw
+    ON products USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64)
+    WHERE is_published = true;
+
+CREATE INDEX IF NOT EXISTS idx_spare_parts_embedding_hnsw
+    ON spare_parts USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64)
+    WHERE is_published = true;
+
+ANALYZE products;
+ANALYZE spare_parts;
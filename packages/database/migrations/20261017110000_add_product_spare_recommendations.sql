@@ -0,0 +1,18 @@
+-- Migration: Materialized spare part recommendations
+-- Description: Top-K nearest published spare parts per product by embedding cosine
+-- distance, maintained incrementally by the /reindex hooks
+-- (apps/backend/app/services/recommendations.py) and filled in bulk by
+-- apps/backend/scripts/build_spare_recommendations.py.
+-- Created at: 2026-10-17 11:00:00
+
+CREATE TABLE IF NOT EXISTS product_spare_recommendations (
+    product_id UUID NOT NULL REFERENCES products(id) ON DELETE CASCADE,
+    rank INTEGER NOT NULL,
+    spare_part_id UUID NOT NULL REFERENCES spare_parts(id) ON DELETE CASCADE,
+    distance NUMERIC NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (product_id, rank)
+);
+
+CREATE INDEX IF NOT EXISTS idx_product_spare_recommendations_spare_part_id
+    ON product_spare_recommendations (spare_part_id);
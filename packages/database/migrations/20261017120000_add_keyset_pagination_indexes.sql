@@ -0,0 +1,16 @@
+-- Migration: Keyset pagination indexes
+-- Description: Composite indexes matching the sort keys of the keyset-paginated
+-- endpoints (apps/backend/app/core/pagination.py), so each page is an index range
+-- scan starting at the cursor instead of an OFFSET scan.
+--   GET /catalog/search without q: published rows by (name, id)
+--   GET /journal?limit=N: articles by (created_at DESC, id DESC)
+-- Created at: 2026-10-17 12:00:00
+
+CREATE INDEX IF NOT EXISTS idx_products_published_name_id
+    ON products (name, id) WHERE is_published = true;
+
+CREATE INDEX IF NOT EXISTS idx_spare_parts_published_name_id
+    ON spare_parts (name, id) WHERE is_published = true;
+
+CREATE INDEX IF NOT EXISTS idx_articles_created_at_id
+    ON articles (created_at DESC, id DESC);
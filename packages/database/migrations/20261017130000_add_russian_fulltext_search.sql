@@ -0,0 +1,34 @@
+-- Migration: Russian full-text search columns
+-- Description: Stored generated tsvector columns on products and spare_parts built
+-- with the 'russian' text search config (Snowball stemming, so 'ролик' and
+-- 'ролики' share a lexeme), weighted name (A) > category (B) > description (C) >
+-- specs values (D), with GIN indexes. Queried by the full-text stage of
+-- apps/backend/app/services/hybrid_search.py and ranked with ts_rank.
+-- The expressions must stay in sync with the Computed columns in
+-- packages/database/models.py.
+-- Created at: 2026-10-17 13:00:00
+
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian'::regconfig, coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('russian'::regconfig, coalesce(category, '')), 'B') ||
+        setweight(to_tsvector('russian'::regconfig, coalesce(description, '')), 'C') ||
+        setweight(jsonb_to_tsvector('russian'::regconfig, coalesce(specs, '{}'::jsonb), '["string", "numeric"]'), 'D')
+    ) STORED;
+
+ALTER TABLE spare_parts ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian'::regconfig, coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('russian'::regconfig, coalesce(category, '')), 'B') ||
+        setweight(to_tsvector('russian'::regconfig, coalesce(description, '')), 'C') ||
+        setweight(jsonb_to_tsvector('russian'::regconfig, coalesce(specs, '{}'::jsonb), '["string", "numeric"]'), 'D')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_products_search_vector
+    ON products USING gin (search_vector);
+
+CREATE INDEX IF NOT EXISTS idx_spare_parts_search_vector
+    ON spare_parts USING gin (search_vector);
+
+ANALYZE products;
+ANALYZE spare_parts;
@@ -0,0 +1,34 @@
+-- Migration: Model number trigram matching
+-- Description: Users type model numbers (16К20, 1М63, ГФ2171) in mixed Latin and
+-- Cyrillic with arbitrary separators. catalog_fold() applies the same folding as
+-- fold_text() in apps/backend/app/core/text.py (lower case, Latin homoglyphs to
+-- Cyrillic, ё to е); model_key is the folded name with every separator removed,
+-- so '16K-20', '16к20' and '16 К 20' share one key. A GIN trigram index on it
+-- answers word_similarity lookups, including near-misses such as 16К20 vs 16К20Т1.
+-- The migration runner executes files through SQLAlchemy text(), which reads a
+-- colon followed by a word as a bind parameter, so POSIX character classes cannot
+-- be used; the explicit class is enough because catalog_fold() output is lower case
+-- without ё.
+-- Created at: 2026-10-17 14:00:00
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Keep in sync with HOMOGLYPHS in apps/backend/app/core/text.py (lower-case keys)
+CREATE OR REPLACE FUNCTION catalog_fold(value text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$ SELECT replace(translate(lower(coalesce(value, '')), 'mhactkxopebyui', 'мнасткхоревууи'), 'ё', 'е') $$;
+
+ALTER TABLE products ADD COLUMN IF NOT EXISTS model_key text
+    GENERATED ALWAYS AS (regexp_replace(catalog_fold(name), '[^0-9a-zа-я]+', '', 'g')) STORED;
+
+ALTER TABLE spare_parts ADD COLUMN IF NOT EXISTS model_key text
+    GENERATED ALWAYS AS (regexp_replace(catalog_fold(name), '[^0-9a-zа-я]+', '', 'g')) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_products_model_key_trgm
+    ON products USING gin (model_key gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_spare_parts_model_key_trgm
+    ON spare_parts USING gin (model_key gin_trgm_ops);
+
+ANALYZE products;
+ANALYZE spare_parts;
@@ -0,0 +1,26 @@
+-- Migration: Normalized name keys
+-- Description: The keyword fallback used to OR every query token against both the
+-- raw and the homoglyph-normalized name with ILIKE, two unindexed predicates per
+-- token. name_key persists the normalized form once per row: catalog_fold() (lower
+-- case, Latin homoglyphs to Cyrillic, ё to е), separators inside words removed and
+-- whitespace collapsed, e.g. 'Станок 16K-20' -> 'станок 16к20'. The query side
+-- applies name_key() from apps/backend/app/core/text.py to each token, so every
+-- token becomes a single LIKE answered by the trigram index.
+-- No POSIX character classes: the migration runner's text() would read them as
+-- bind parameters; catalog_fold() output is lower case without ё.
+-- Created at: 2026-10-17 15:00:00
+
+ALTER TABLE products ADD COLUMN IF NOT EXISTS name_key text
+    GENERATED ALWAYS AS (btrim(regexp_replace(regexp_replace(catalog_fold(name), '[^0-9a-zа-я\s]+', '', 'g'), '\s+', ' ', 'g'))) STORED;
+
+ALTER TABLE spare_parts ADD COLUMN IF NOT EXISTS name_key text
+    GENERATED ALWAYS AS (btrim(regexp_replace(regexp_replace(catalog_fold(name), '[^0-9a-zа-я\s]+', '', 'g'), '\s+', ' ', 'g'))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_products_name_key_trgm
+    ON products USING gin (name_key gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_spare_parts_name_key_trgm
+    ON spare_parts USING gin (name_key gin_trgm_ops);
+
+ANALYZE products;
+ANALYZE spare_parts;
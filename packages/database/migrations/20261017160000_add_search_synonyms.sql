@@ -0,0 +1,22 @@
+-- Migration: Add search synonyms
+-- Description: Synonym table of the local query expansion dictionary, harvested
+-- offline from the LLM expansions in query_expansions by
+-- apps/backend/scripts/build_search_synonyms.py. The backend loads it at startup
+-- together with the catalog vocabulary and only calls the chat model for queries
+-- the dictionary does not cover.
+-- Created at: 2026-10-17 16:00:00
+
+CREATE TABLE IF NOT EXISTS search_synonyms (
+    term TEXT PRIMARY KEY,
+    synonyms TEXT[] NOT NULL,
+    source TEXT NOT NULL DEFAULT 'llm',
+    hits INTEGER DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+DROP TRIGGER IF EXISTS update_search_synonyms_updated_at ON search_synonyms;
+CREATE TRIGGER update_search_synonyms_updated_at
+    BEFORE UPDATE ON search_synonyms
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, DECIMAL, DateTime, func, BigInteger, ARRAY, Enum
-from sqlalchemy.dialects.postgresql import JSONB, UUID
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import Column, Computed, Integer, String, Text, Boolean, ForeignKey, DECIMAL, DateTime, func, BigInteger, ARRAY, Enum
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
+from sqlalchemy.orm import declarative_base, deferred, relationship
 from pgvector.sqlalchemy import Vector
 import uuid
 import enum
@@ -21,6 +21,26 @@ class LeadSource(str, enum.Enum):
     diagnostics_widget = "diagnostics_widget"
     cart_order = "cart_order"
 
+# Weighted Russian full-text document of a catalog row. Must match the generated
+# columns created by 20261017130000_add_russian_fulltext_search.sql.
+CATALOG_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian'::regconfig, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian'::regconfig, coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('russian'::regconfig, coalesce(description, '')), 'C') || "
+    "setweight(jsonb_to_tsvector('russian'::regconfig, coalesce(specs, '{}'::jsonb), '[\"string\", \"numeric\"]'), 'D')"
+)
+
+# Folded name without separators ('16K-20' -> '16к20'), trigram-indexed for model
+# number matching. catalog_fold() is created by 20261017140000_add_model_number_trigram_index.sql.
+CATALOG_MODEL_KEY_SQL = "regexp_replace(catalog_fold(name), '[^0-9a-zа-я]+', '', 'g')"
+
+# Folded name with separators inside words removed ('Станок 16K-20' -> 'станок 16к20'),
+# trigram-indexed for per-token keyword matching. Mirrors name_key() in core/text.py.
+CATALOG_NAME_KEY_SQL = (
+    "btrim(regexp_replace(regexp_replace(catalog_fold(name), '[^0-9a-zа-я\\s]+', '', 'g'), "
+    "'\\s+', ' ', 'g'))"
+)
+
 class ProductCompatiblePart(Base):
     __tablename__ = "product_compatible_parts"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -47,7 +67,11 @@ class Product(Base):
     is_published = Column(Boolean, default=True)
     image_file = Column(UUID(as_uuid=True), nullable=True)
     video_url = Column(String, nullable=True)
-    embedding = Column(Vector(1536))
+    # Never serialized; loaded only where selected explicitly (vector index, recommendations)
+    embedding = deferred(Column(Vector(1536)), group="vectors")
+    search_vector = deferred(Column(TSVECTOR, Computed(CATALOG_SEARCH_VECTOR_SQL, persisted=True)))
+    model_key = deferred(Column(Text, Computed(CATALOG_MODEL_KEY_SQL, persisted=True)))
+    name_key = deferred(Column(Text, Computed(CATALOG_NAME_KEY_SQL, persisted=True)))
 
     images = relationship("ProductImage", back_populates="product")
     compatible_parts = relationship("SparePart", secondary="product_compatible_parts", back_populates="compatible_products")
@@ -79,7 +103,10 @@ class SparePart(Base):
     meta_description = Column(Text, nullable=True)
     is_published = Column(Boolean, default=True)
     image_file = Column(UUID(as_uuid=True), nullable=True)
-    embedding = Column(Vector(1536))
+    embedding = deferred(Column(Vector(1536)), group="vectors")
+    search_vector = deferred(Column(TSVECTOR, Computed(CATALOG_SEARCH_VECTOR_SQL, persisted=True)))
+    model_key = deferred(Column(Text, Computed(CATALOG_MODEL_KEY_SQL, persisted=True)))
+    name_key = deferred(Column(Text, Computed(CATALOG_NAME_KEY_SQL, persisted=True)))
 
     images = relationship("SparePartImage", back_populates="spare_part")
     compatible_products = relationship("Product", secondary="product_compatible_parts", back_populates="compatible_parts")
@@ -324,3 +351,35 @@ class AmoCRMSettings(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class QueryExpansion(Base):
+    __tablename__ = "query_expansions"
+
+    query_key = Column(String, primary_key=True)
+    query = Column(String, nullable=False)
+    expansion = Column(Text, nullable=False)
+    model = Column(String, nullable=False)
+    hits = Column(Integer, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class SearchSynonym(Base):
+    __tablename__ = "search_synonyms"
+
+    term = Column(String, primary_key=True)
+    synonyms = Column(ARRAY(String), nullable=False)
+    source = Column(String, nullable=False, default="llm")
+    hits = Column(Integer, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class ProductSpareRecommendation(Base):
+    __tablename__ = "product_spare_recommendations"
+
+    product_id = Column(UUID(as_uuid=True), ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)
+    spare_part_id = Column(UUID(as_uuid=True), ForeignKey("spare_parts.id", ondelete="CASCADE"), nullable=False, index=True)
+    distance = Column(DECIMAL, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -22,7 +22,7 @@ def create_flow():
         "name": "Cache Invalidation Webhook",
         "icon": "refresh",
         "color": "#6644FF",
-        "description": "Triggered on any content change to clear frontend cache.",
+        "description": "Triggered on any content change to invalidate the cache entries of the changed items.",
         "status": "active",
         "trigger": "event",
         "options": {
@@ -51,7 +51,9 @@ def create_flow():
             "url": WEBHOOK_URL,
             "headers": [
                 {"header": "X-Webhook-Secret", "value": WEBHOOK_SECRET}
-            ]
+            ],
+            # Collection and keys of the changed items, so only their cache entries are dropped
+            "body": "{{$trigger}}"
         }
     }
     